@@ -0,0 +1,644 @@
+# coding: utf8
+import main as m
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+################################################################################################################
+# Benchmarks für einzelne Schritte der Preisberechnung. Alle Benchmarks laufen mit synthetischen Daten, also ohne
+# SmartRoadSense-csv, Queensland-API oder GraphHopper-API.
+#
+# Aufruf z.B.:
+#   python benchmark.py                       -> alle Benchmarks
+#   python benchmark.py srs_range_query       -> nur ein Benchmark
+#   python benchmark.py srs_range_query --points 5000000
+#   python benchmark.py import_time           -> Endet mit Exit-Code 1, wenn der Import von main.py zu lange dauert
+#   python benchmark.py pipeline --save-baseline   -> Messwerte als Vergleichsbasis speichern
+#   python benchmark.py pipeline              -> Endet mit Exit-Code 1, wenn ein Schritt langsamer als die
+#                                                Vergleichsbasis ist oder mehr Speicher braucht
+################################################################################################################
+
+# Obergrenze für die Dauer des Imports von main.py in ms (inkl. numpy, ohne pandas/requests)
+IMPORT_TIME_THRESHOLD_MS = 400
+
+# Module, die main.py erst bei Bedarf importieren soll (siehe LazyModule)
+LAZY_MODULES = ["pandas", "matplotlib", "mplleaflet", "requests", "config"]
+
+# Größen für den Pipeline-Benchmark: Länge der Route in km und Anzahl synthetischer SmartRoadSense-Punkte
+PIPELINE_SCALES = {
+    "small": (50, 300000),
+    "medium": (400, 1000000),
+    "large": (1500, 3000000)
+}
+
+# Vergleichsbasis für den Pipeline-Benchmark (siehe benchmark_pipeline)
+PIPELINE_BASELINE_PATH = "internal/benchmark_baseline.json"
+
+# Zulässige Abweichung von der Vergleichsbasis (0.3 = 30 %), zusätzlich ein fester Spielraum für sehr kurze Schritte
+# (in ms) und kleine Speicher-Spitzen (in MiB)
+PIPELINE_TOLERANCE = 0.3
+PIPELINE_TIME_SLACK_MS = 0.5
+PIPELINE_MEMORY_SLACK_MIB = 1.0
+
+
+def generate_srs_dataset(point_count, seed=0):
+    ################################################################################################################
+    # Eingabeparameter:     Anzahl der Datensätze, optional: Seed für den Zufallsgenerator
+    # Rückgabe:             Tupel aus Breitengraden, Längengraden und ppe (numpy-Arrays)
+    #
+    # Beschreibung:
+    # Erzeugt einen SmartRoadSense-ähnlichen Datensatz: Die Punkte liegen, wie echte Messungen, dicht entlang von
+    # zufälligen "Straßen" (Polylinien) in einem Gebiet von der Größe Italiens. Die ppe-Werte sind, wie in den echten
+    # Daten, stark rechtsschief verteilt. Die Reihenfolge der Punkte ist zufällig, wie in der csv.
+    ################################################################################################################
+    rng = np.random.default_rng(seed)
+
+    road_count = max(1, point_count // 2000)
+    road_starts = np.stack([rng.uniform(37.0, 46.5, road_count), rng.uniform(7.0, 18.0, road_count)], axis=1)
+    road_directions = rng.normal(0, 1, (road_count, 2))
+    road_directions /= np.linalg.norm(road_directions, axis=1)[:, None]
+    road_lengths = rng.uniform(0.05, 1.5, road_count)
+
+    road_of_point = rng.integers(0, road_count, point_count)
+    position = rng.uniform(0, 1, point_count) * road_lengths[road_of_point]
+    noise = rng.normal(0, 0.0002, (point_count, 2))
+    points = road_starts[road_of_point] + road_directions[road_of_point] * position[:, None] + noise
+
+    ppe = rng.lognormal(-2.2, 0.9, point_count)
+    return points[:, 0], points[:, 1], ppe
+
+
+def generate_route(length_km, seed=0):
+    ################################################################################################################
+    # Eingabeparameter:     ungefähre Länge der Route in km, optional: Seed für den Zufallsgenerator
+    # Rückgabe:             RatedRoute ohne Ratings
+    #
+    # Beschreibung:
+    # Erzeugt eine Route, wie sie von der GraphHopper-API zurückkommt: Die Wegpunkte liegen in Ortschaften und Kurven
+    # dicht beieinander (einige 10 m), auf Autobahnen und Landstraßen oft mehrere km auseinander. Die Richtung ändert
+    # sich langsam, wie bei einer Fahrt quer durch ein Land.
+    ################################################################################################################
+    rng = np.random.default_rng(seed)
+
+    segment_lengths = []
+    while sum(segment_lengths) < length_km:
+        if rng.random() < 0.3:
+            segment_lengths.append(rng.uniform(0.5, 3.0))
+        else:
+            segment_lengths.append(rng.uniform(0.01, 0.3))
+    segment_lengths = np.array(segment_lengths)
+
+    headings = np.cumsum(rng.normal(0, 0.15, len(segment_lengths))) + rng.uniform(0, 2 * np.pi)
+    lat = 44.0 + np.concatenate([[0], np.cumsum(segment_lengths * np.cos(headings) / 111.3)])
+    long = 11.0 + np.concatenate([[0], np.cumsum(segment_lengths * np.sin(headings)
+                                                / (111.3 * np.cos(np.radians(44.0))))])
+    return m.RatedRoute(lat=lat, long=long)
+
+
+def generate_quantile_table(srs_ppes, seed=0):
+    ################################################################################################################
+    # Eingabeparameter:     ppe-Werte eines (synthetischen) SmartRoadSense-Datensatzes, optional: Seed
+    # Rückgabe:             dict mit den Quantilen je Datenquelle, wie von load_database_standardizer
+    #
+    # Beschreibung:
+    # Die SmartRoadSense-Quantile werden aus den übergebenen ppe-Werten berechnet, die Queensland-Quantile aus
+    # synthetischen IRIRoughness-Werten (um 2-3 m/km, rechtsschief wie in den echten Daten).
+    ################################################################################################################
+    rng = np.random.default_rng(seed)
+    iri_roughness = rng.lognormal(1.0, 0.35, 100000)
+    return {
+        "srs": np.sort(np.quantile(srs_ppes, m.STANDARDIZER_QUANTILES)),
+        "ql": np.sort(np.quantile(iri_roughness, m.STANDARDIZER_QUANTILES))
+    }
+
+
+def timed(function, repetitions):
+    # Liefert die durchschnittliche Laufzeit in ms und das Ergebnis des letzten Aufrufs
+    result = None
+    timer = time.perf_counter()
+    for _ in range(repetitions):
+        result = function()
+    return (time.perf_counter() - timer) / repetitions * 1000, result
+
+
+def benchmark_srs_range_query(points=3000000, repetitions=20):
+    ################################################################################################################
+    # Vergleicht die Rechteck-Abfrage auf der gekachelten SmartRoadSense-Datenbank (give_rated_area_srs_arrays) mit
+    # dem bisherigen Vorgehen, bei dem alle Datensätze über vier boolesche Masken gefiltert werden.
+    # Die Rechtecke entsprechen in ihrer Größe den Sektionen aus give_ratings_near_path (ca. 5 km bis 150 km).
+    ################################################################################################################
+    latitudes, longitudes, ppes = generate_srs_dataset(points)
+
+    with tempfile.TemporaryDirectory() as store_directory:
+        timer = time.perf_counter()
+        m.write_database_srs_store(latitudes, longitudes, ppes, store_directory)
+        print("  Datenbank mit {} Punkten geschrieben in {:.2f} s".format(points, time.perf_counter() - timer))
+        store = m.load_database_srs(store_directory)
+
+        rng = np.random.default_rng(1)
+        print("  {:>12} {:>10} {:>14} {:>14} {:>10}".format("Rechteck km", "Treffer", "Scan ms", "Kacheln ms",
+                                                            "Faktor"))
+        for size_km in [5, 40, 150]:
+            size_degrees = size_km / 111.3
+            lat_from, long_from = rng.uniform(40, 44), rng.uniform(10, 15)
+            point_a = m.Coordinate(lat_from, long_from)
+            point_b = m.Coordinate(lat_from + size_degrees, long_from + size_degrees * 1.4)
+
+            def scan():
+                in_area = ((latitudes >= point_a.lat) & (latitudes <= point_b.lat) &
+                           (longitudes >= point_a.long) & (longitudes <= point_b.long))
+                return latitudes[in_area], longitudes[in_area], ppes[in_area]
+
+            scan_ms, scan_result = timed(scan, repetitions)
+            tiled_ms, tiled_result = timed(lambda: m.give_rated_area_srs_arrays(point_a, point_b, store), repetitions)
+
+            assert np.array_equal(scan_result[2], tiled_result[2])
+            print("  {:>12} {:>10} {:>14.3f} {:>14.3f} {:>9.1f}x".format(size_km, len(tiled_result[0]), scan_ms,
+                                                                         tiled_ms, scan_ms / tiled_ms))
+
+        m._srs_stores.pop(store_directory, None)
+
+
+def benchmark_densify(route_lengths_km=(100, 400, 800), maximum_point_distance=0.11, repetitions=3):
+    ################################################################################################################
+    # Vergleicht das Einfügen von Zwischenpunkten in einem Durchlauf (densify_route) mit dem bisherigen Vorgehen in
+    # find_path, bei dem 'interpoint' so lange aufgerufen wird, bis kein Abstand mehr zu groß ist. Das bisherige
+    # Vorgehen wird sowohl mit Listen von Coordinate-Objekten als auch mit RatedRoutes gemessen.
+    ################################################################################################################
+    def repeated_interpoint(path):
+        all_distances_above_min = False
+        while all_distances_above_min is False:
+            path = m.interpoint(path, maximum_point_distance)
+            if isinstance(path, m.RatedRoute):
+                all_distances_above_min = not (path.calc_segment_distances() > maximum_point_distance).any()
+            else:
+                all_distances_above_min = all(path[i].calc_distance_to_other_point(path[i + 1])
+                                              <= maximum_point_distance for i in range(len(path) - 1))
+        return path
+
+    print("  {:>8} {:>8} {:>22} {:>22} {:>22}".format("km", "Punkte", "interpoint (Liste) ms",
+                                                      "interpoint (Route) ms", "densify_route ms"))
+    for length_km in route_lengths_km:
+        route = generate_route(length_km)
+        coordinates = route.to_coordinates()
+
+        list_ms, list_result = timed(lambda: repeated_interpoint(coordinates), 1)
+        route_ms, route_result = timed(lambda: repeated_interpoint(route), repetitions)
+        densify_ms, densify_result = timed(lambda: m.densify_route(route, maximum_point_distance), repetitions)
+
+        assert densify_result.calc_segment_distances().max() <= maximum_point_distance
+        print("  {:>8} {:>8} {:>22} {:>22} {:>22}".format(
+            length_km, len(route), "{:.1f} ({} P.)".format(list_ms, len(list_result)),
+            "{:.1f} ({} P.)".format(route_ms, len(route_result)),
+            "{:.1f} ({} P.)".format(densify_ms, len(densify_result))))
+
+
+def load_cached_routes(maximum_point_distance=0.11):
+    # Liefert alle Routen aus dem Routen-Cache von find_path (also echte, früher abgefragte Routen) als RatedRoutes
+    if not os.path.exists(m.ROUTE_CACHE_PATH):
+        return []
+    cache = m.get_route_cache()
+    with sqlite3.connect(m.ROUTE_CACHE_PATH) as connection:
+        values = [row[0] for row in connection.execute('SELECT value FROM "routes"')]
+    routes = []
+    for value in values:
+        points = cache.decode(value)
+        routes.append(m.densify_route(m.RatedRoute(lat=points[:, 0], long=points[:, 1]), maximum_point_distance))
+    return routes
+
+
+def benchmark_corridor(points=3000000, route_lengths_km=(100, 400, 800), local=False, splitter=380):
+    ################################################################################################################
+    # Vergleicht die Anzahl der Ratings, die für eine Sektion abgefragt und beim Snapping verarbeitet werden:
+    # Rechteck um die Sektion + 1.5 km (bisher) gegenüber dem Korridor von 1.5 km um die Sektion (give_rated_corridor).
+    # Gemessen werden die Abfrage in der binären Datenbank und das Snapping (RatingIndex aufbauen und abfragen).
+    # Für jeden Routenpunkt, dessen nächstes Rating höchstens 1.5 km entfernt ist, wird geprüft, dass der Korridor
+    # dasselbe Ergebnis liefert.
+    #
+    # Ohne 'local' werden synthetische Routen und ein synthetischer Datensatz genommen, bei dem zusätzlich Ratings
+    # entlang der Routen liegen (wie bei echten Routen, die über gemessene Straßen führen). Mit 'local' werden die
+    # echte SmartRoadSense-Datenbank und alle Routen aus dem Routen-Cache genommen.
+    ################################################################################################################
+    corridor_km = m.RATING_CORRIDOR_KM
+    if local:
+        store = m.load_database_srs()
+        routes = load_cached_routes()
+        store_directory = None
+    else:
+        routes = [m.densify_route(generate_route(length_km, seed=i), 0.11)
+                  for i, length_km in enumerate(route_lengths_km)]
+        latitudes, longitudes, ppes = generate_srs_dataset(points)
+        rng = np.random.default_rng(2)
+        along_routes = [(route.lat + rng.normal(0, 0.0003, len(route)), route.long + rng.normal(0, 0.0003, len(route)),
+                         rng.lognormal(-2.2, 0.9, len(route))) for route in routes]
+        latitudes, longitudes, ppes = [np.concatenate([column] + [along[i] for along in along_routes])
+                                       for i, column in enumerate((latitudes, longitudes, ppes))]
+        store_directory = tempfile.mkdtemp()
+        m.write_database_srs_store(latitudes, longitudes, ppes, store_directory)
+        store = m.load_database_srs(store_directory)
+
+    print("  {:>8} {:>9} {:>14} {:>14} {:>8} {:>12} {:>12} {:>12} {:>12}".format(
+        "km", "Sektionen", "Rechteck Pkt.", "Korridor Pkt.", "Faktor", "Rechteck ms", "Korridor ms", "Snap R. ms",
+        "Snap K. ms"))
+    for route in routes:
+        sections = m.split_route(route, splitter)
+
+        counts, times = np.zeros(2, dtype=np.int64), np.zeros(4)
+        for section in sections:
+            lat1, long1 = float(section.lat.min()), float(section.long.min())
+            lat2, long2 = float(section.lat.max()), float(section.long.max())
+            safety_long = corridor_km / (math.cos(math.radians(lat1)) * 111.3)
+
+            timer = time.perf_counter()
+            rectangle = m.give_area_indices_srs(store, lat1 - corridor_km / 111.3, lat2 + corridor_km / 111.3,
+                                                long1 - safety_long, long2 + safety_long)
+            times[0] += time.perf_counter() - timer
+            timer = time.perf_counter()
+            corridor = m.give_corridor_indices_srs(section, corridor_km, store)
+            times[1] += time.perf_counter() - timer
+            counts += len(rectangle), len(corridor)
+
+            results = []
+            for position, selected in enumerate((rectangle, corridor)):
+                if len(selected) == 0:
+                    results.append(None)
+                    continue
+                timer = time.perf_counter()
+                index = m.RatingIndex([m.Coordinate(lat, long) for lat, long in
+                                       zip(store["latitude"][selected].tolist(), store["longitude"][selected].tolist())])
+                closest_indices, closest_distances = index.query(section.lat, section.long)
+                times[2 + position] += time.perf_counter() - timer
+                results.append((selected[closest_indices], closest_distances))
+
+            if results[0] is not None:
+                within = results[0][1] <= corridor_km
+                assert within.sum() == 0 or np.array_equal(results[0][0][within], results[1][0][within])
+
+        length_km = route.calc_segment_distances().sum()
+        print("  {:>8.0f} {:>9} {:>14} {:>14} {:>7.1f}x {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+            length_km, len(sections), counts[0], counts[1], counts[0] / max(counts[1], 1), *(times * 1000)))
+
+    if store_directory is not None:
+        m._srs_stores.pop(store_directory, None)
+
+
+def benchmark_import_time(threshold_ms=IMPORT_TIME_THRESHOLD_MS, repetitions=5):
+    ################################################################################################################
+    # Misst mit "python -X importtime" in einem neuen Interpreter, wie lange der Import von main.py dauert (kumuliert,
+    # also inkl. aller dabei importierten Module). Gewertet wird der schnellste von 'repetitions' Durchläufen, da
+    # langsamere Durchläufe meist nur durch andere Last auf dem Rechner entstehen.
+    # Außerdem wird geprüft, dass keines der Module aus LAZY_MODULES schon beim Import geladen wird.
+    #
+    # Rückgabe:             False, wenn die Obergrenze überschritten oder ein Modul zu früh geladen wurde
+    ################################################################################################################
+    check = "import main, sys; print(','.join(name for name in {!r} if name in sys.modules))".format(LAZY_MODULES)
+
+    import_times_ms = []
+    loaded_modules = ""
+    for _ in range(repetitions):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", check], capture_output=True, text=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        loaded_modules = process.stdout.strip()
+        for line in process.stderr.splitlines():
+            # Format: "import time: <self [us]> | <cumulative [us]> | <Modul>", main ist nicht eingerückt
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].rstrip() == " main":
+                import_times_ms.append(int(fields[1]) / 1000)
+
+    import_time_ms = min(import_times_ms)
+    print("  Import von main.py: {:.1f} ms (Obergrenze {} ms, langsamster Durchlauf {:.1f} ms)"
+          .format(import_time_ms, threshold_ms, max(import_times_ms)))
+
+    passed = True
+    if loaded_modules:
+        print("  FEHLER: beim Import geladen:", loaded_modules)
+        passed = False
+    if import_time_ms > threshold_ms:
+        print("  FEHLER: Import dauert länger als {} ms".format(threshold_ms))
+        passed = False
+    return passed
+
+
+def measure(function, repetitions):
+    ################################################################################################################
+    # Eingabeparameter:     Funktion ohne Parameter, Anzahl der Wiederholungen
+    # Rückgabe:             Tupel aus schnellster Laufzeit in ms, Speicher-Spitze in MiB und Ergebnis des letzten
+    #                       Aufrufs
+    #
+    # Beschreibung:
+    # Die Laufzeit wird ohne tracemalloc gemessen (tracemalloc verlangsamt jede Speicherreservierung), die
+    # Speicher-Spitze in einem zusätzlichen Aufruf mit tracemalloc. Gezählt wird nur der von Python und numpy
+    # während des Aufrufs reservierte Speicher, nicht die memory-mapped Datenbank.
+    ################################################################################################################
+    times = []
+    result = None
+    for _ in range(repetitions):
+        timer = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - timer)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times) * 1000, peak / 2 ** 20, result
+
+
+def benchmark_pipeline(scales=("small", "medium"), repetitions=5, baseline_path=PIPELINE_BASELINE_PATH,
+                       save_baseline=False, tolerance=PIPELINE_TOLERANCE, require_baseline=False):
+    ################################################################################################################
+    # Misst die einzelnen Schritte der Preisberechnung für eine Route auf synthetischen Daten in verschiedenen
+    # Größen (siehe PIPELINE_SCALES):
+    #   - interpoint:               ein Durchlauf von 'interpoint' auf der Route, wie sie von GraphHopper kommt
+    #   - densify_split:            Teil 2 und 3 von find_path (densify_route und split_route)
+    #   - give_rated_area_srs:      Abfrage der Ratings im Rechteck um eine Sektion als Coordinate-Objekte
+    #   - standardize:              'standardize' für 10000 einzelne Coordinate-Objekte
+    #   - standardize_ratings:      Standardisieren aller ppe-Werte der Datenbank auf einmal
+    #   - snap_ratings_to_route:    Snapping Sektion für Sektion (wie bisher)
+    #   - snap_route:               Snapping der ganzen Route auf einmal
+    #   - price_rated_route:        Bepreisung der gesnappten Route
+    #   - plot_prepare:             GeoJSON der Karte mit Debug-Informationen (siehe give_map_geojson)
+    # Die Route ist GraphHopper-ähnlich (siehe generate_route), die Datenbank SmartRoadSense-ähnlich (siehe
+    # generate_srs_dataset, zusätzlich mit Ratings entlang der Route), die Quantile werden aus den Daten berechnet
+    # (siehe generate_quantile_table). Die Route liegt außerhalb von Queensland, es gibt also keine API-Aufrufe.
+    #
+    # Für jeden Schritt werden die schnellste Laufzeit und die Speicher-Spitze (siehe measure) ausgegeben. Mit
+    # 'save_baseline' werden die Messwerte unter 'baseline_path' gespeichert, sonst (falls vorhanden) damit
+    # verglichen: Ist ein Schritt um mehr als 'tolerance' langsamer oder braucht er mehr Speicher, wird er markiert.
+    # Die Vergleichsbasis gilt nur für den Rechner, auf dem sie gemessen wurde, und wird deshalb nicht mitgeliefert.
+    # Mit 'require_baseline' (wenn der Benchmark ausdrücklich als Prüfung aufgerufen wird) gilt eine fehlende
+    # Vergleichsbasis, auch für einzelne Schritte, als Fehler, statt dass die Prüfung ohne Vergleich besteht.
+    #
+    # Rückgabe:             False, wenn ein Schritt schlechter als die Vergleichsbasis ist oder (mit
+    #                       'require_baseline') keine hat
+    ################################################################################################################
+    baseline = {}
+    if not save_baseline and os.path.exists(baseline_path):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    regressions = []
+    missing = []
+    previous_store_directory, previous_standardizer = m.SRS_STORE_DIRECTORY, m._standardizer
+    try:
+        for scale in scales:
+            length_km, points = PIPELINE_SCALES[scale]
+            raw_route = generate_route(length_km)
+            route = m.densify_route(raw_route, 0.11)
+
+            rng = np.random.default_rng(2)
+            latitudes, longitudes, ppes = generate_srs_dataset(points)
+            latitudes, longitudes, ppes = [np.concatenate([column, along]) for column, along in zip(
+                (latitudes, longitudes, ppes),
+                (route.lat[::3] + rng.normal(0, 0.0003, len(route.lat[::3])),
+                 route.long[::3] + rng.normal(0, 0.0003, len(route.lat[::3])),
+                 rng.lognormal(-2.2, 0.9, len(route.lat[::3]))))]
+
+            with tempfile.TemporaryDirectory() as store_directory:
+                m.write_database_srs_store(latitudes, longitudes, ppes, store_directory)
+                m.SRS_STORE_DIRECTORY = store_directory
+                m._standardizer = generate_quantile_table(ppes)
+
+                sections = m.split_route(route, 380)
+                section = sections[len(sections) // 2]
+                coordinates = [m.Coordinate(lat, long, ppe, "srs")
+                               for lat, long, ppe in zip(latitudes[:10000], longitudes[:10000], ppes[:10000])]
+                snapped_route, statistics, rectangles = m.snap_route(sections)
+
+                steps = [
+                    ("interpoint", len(raw_route), lambda: m.interpoint(raw_route, 0.11)),
+                    ("densify_split", len(route), lambda: m.split_route(m.densify_route(raw_route, 0.11), 380)),
+                    ("give_rated_area_srs", len(section),
+                     lambda: m.give_rated_area_srs(m.Coordinate(section.lat.min(), section.long.min()),
+                                                   m.Coordinate(section.lat.max(), section.long.max()))),
+                    ("standardize", len(coordinates), lambda: [m.standardize(c) for c in coordinates]),
+                    ("standardize_ratings", len(ppes), lambda: m.standardize_ratings(ppes, "srs")),
+                    ("snap_ratings_to_route", len(route),
+                     lambda: [m.snap_ratings_to_route(section) for section in sections]),
+                    ("snap_route", len(route), lambda: m.snap_route(sections)),
+                    ("price_rated_route", len(snapped_route),
+                     lambda: m.price_rated_route(snapped_route, 4, 300, 75000, 10000, 0.3)),
+                    ("plot_prepare", len(snapped_route),
+                     lambda: json.dumps(m.give_map_geojson(snapped_route, rectangles, debug=True)))
+                ]
+
+                print("  {} ({} km, {} Routenpunkte, {} Datensätze)".format(scale, length_km, len(route),
+                                                                           len(latitudes)))
+                print("  {:>24} {:>10} {:>12} {:>12} {:>12} {:>12}".format("Schritt", "Einträge", "ms",
+                                                                            "Basis ms", "MiB", "Basis MiB"))
+                for name, items, function in steps:
+                    key = "{}/{}".format(scale, name)
+                    milliseconds, peak_mib, _ = measure(function, repetitions)
+                    results[key] = {"ms": milliseconds, "peak_mib": peak_mib, "items": items}
+
+                    reference = baseline.get(key)
+                    marker = ""
+                    if reference is None:
+                        missing.append(key)
+                    else:
+                        if milliseconds > reference["ms"] * (1 + tolerance) + PIPELINE_TIME_SLACK_MS:
+                            marker += " LANGSAMER"
+                        if peak_mib > reference["peak_mib"] * (1 + tolerance) + PIPELINE_MEMORY_SLACK_MIB:
+                            marker += " MEHR SPEICHER"
+                        if marker:
+                            regressions.append(key)
+                    print("  {:>24} {:>10} {:>12.2f} {:>12} {:>12.2f} {:>12}{}".format(
+                        name, items, milliseconds, "-" if reference is None else "{:.2f}".format(reference["ms"]),
+                        peak_mib, "-" if reference is None else "{:.2f}".format(reference["peak_mib"]), marker))
+
+                m._srs_stores.pop(store_directory, None)
+    finally:
+        m.SRS_STORE_DIRECTORY, m._standardizer = previous_store_directory, previous_standardizer
+
+    if save_baseline:
+        baseline = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)
+        baseline.update(results)
+        with open(baseline_path, "w") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print("  Vergleichsbasis gespeichert unter", baseline_path)
+    elif missing:
+        print("  {}Keine Vergleichsbasis unter {} für: {} (mit --save-baseline erstellen)".format(
+            "FEHLER: " if require_baseline else "", baseline_path, ", ".join(missing)))
+
+    if regressions:
+        print("  FEHLER: schlechter als die Vergleichsbasis:", ", ".join(regressions))
+    return not regressions and not (require_baseline and missing and not save_baseline)
+
+
+def benchmark_raster(route_lengths_km=(100, 400), cells_per_tile=(100, 200), rating_errors_km=(0.0, 0.2),
+                     repetitions=3):
+    ################################################################################################################
+    # Vergleicht snap_route mit und ohne vorberechnetes Raster (siehe build_rating_raster) auf synthetischen Daten:
+    # GraphHopper-ähnliche Routen (siehe generate_route) mit SmartRoadSense-ähnlichen Ratings entlang der Routen (wie
+    # im Pipeline-Benchmark). Für jede Rastergröße werden Bauzeit und Größe des Rasters ausgegeben, für jeden
+    # erlaubten Rating-Fehler (siehe RATING_RASTER_MAX_RATING_ERROR_KM) der Anteil der Routenpunkte aus dem Raster,
+    # die Laufzeit von snap_route, der Anteil der Routenpunkte mit demselben Rating wie bei der exakten Suche und die
+    # Abweichung des Preises.
+    #
+    # Rückgabe:             False, wenn ohne erlaubten Rating-Fehler ein Rating von der exakten Suche abweicht
+    ################################################################################################################
+    routes = [m.densify_route(generate_route(length_km, seed=seed), 0.11)
+              for seed, length_km in enumerate(route_lengths_km)]
+
+    rng = np.random.default_rng(3)
+    along_lat = np.concatenate([route.lat[::3] for route in routes])
+    along_long = np.concatenate([route.long[::3] for route in routes])
+    latitudes = along_lat + rng.normal(0, 0.0003, len(along_lat))
+    longitudes = along_long + rng.normal(0, 0.0003, len(along_lat))
+    ppes = rng.lognormal(-2.2, 0.9, len(along_lat))
+
+    passed = True
+    previous_store_directory, previous_standardizer = m.SRS_STORE_DIRECTORY, m._standardizer
+    previous_rating_error = m.RATING_RASTER_MAX_RATING_ERROR_KM
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            store_directory = os.path.join(directory, "store")
+            m.write_database_srs_store(latitudes, longitudes, ppes, store_directory)
+            m.SRS_STORE_DIRECTORY = store_directory
+            m._standardizer = generate_quantile_table(ppes)
+
+            exact = []
+            for route in routes:
+                milliseconds, (snapped_route, _, _) = timed(lambda: m.snap_route(route, raster=False), repetitions)
+                exact.append((milliseconds, snapped_route,
+                              m.price_rated_route(snapped_route, 4, 300, 75000, 10000, 0.3)[0][0]))
+
+            for cells in cells_per_tile:
+                raster_directory = os.path.join(directory, "raster_{}".format(cells))
+                timer = time.perf_counter()
+                metadata = m.build_rating_raster(raster_directory, store_directory, cells_per_tile=cells)
+                build_seconds = time.perf_counter() - timer
+                size_mib = sum(os.path.getsize(os.path.join(raster_directory, name))
+                               for name in os.listdir(raster_directory)) / 2 ** 20
+                raster = m.load_rating_raster(raster_directory, store_directory)
+                print("  {} Zellen pro Kachelkante: {} Kacheln, gebaut in {:.1f} s, {:.1f} MiB".format(
+                    cells, metadata["tiles"], build_seconds, size_mib))
+
+                for rating_error_km in rating_errors_km:
+                    m.RATING_RASTER_MAX_RATING_ERROR_KM = rating_error_km
+                    for length_km, route, (exact_ms, exact_route, exact_price) in zip(route_lengths_km, routes, exact):
+                        milliseconds, (snapped_route, statistics, _) = timed(
+                            lambda: m.snap_route(route, raster=raster), repetitions)
+                        price = m.price_rated_route(snapped_route, 4, 300, 75000, 10000, 0.3)[0][0]
+                        same = np.mean(snapped_route.rating_standardised == exact_route.rating_standardised)
+                        raster_share = statistics["raster_points"] / len(route)
+                        print("    Fehler {:.2f} km, {:>4} km ({:>5} Punkte): {:5.1f} % aus dem Raster, {:7.1f} ms "
+                              "(exakt {:7.1f} ms), {:5.1f} % gleiche Ratings, Preis {:+.3f} %".format(
+                                  rating_error_km, length_km, len(route), raster_share * 100, milliseconds, exact_ms,
+                                  same * 100, (price / exact_price - 1) * 100))
+                        if rating_error_km == 0 and same < 1:
+                            print("    FEHLER: Ratings weichen von der exakten Suche ab")
+                            passed = False
+
+            m._srs_stores.pop(store_directory, None)
+    finally:
+        m.SRS_STORE_DIRECTORY, m._standardizer = previous_store_directory, previous_standardizer
+        m.RATING_RASTER_MAX_RATING_ERROR_KM = previous_rating_error
+    return passed
+
+
+def benchmark_integrated(route_lengths_km=(100, 400, 800), points=300000, repetitions=3):
+    ################################################################################################################
+    # Vergleicht die bisherige Bepreisung (Zwischenpunkte alle 110 m, snap_route, price_rated_route) mit der exakten
+    # Bepreisung über die Segmente (price_route_integrated) auf synthetischen Daten wie im Pipeline-Benchmark.
+    # Als Referenz dient die bisherige Bepreisung mit Zwischenpunkten alle 10 m. Ausgegeben werden für jede Variante
+    # die Anzahl der Routenpunkte, die Laufzeit und die Abweichung des Durchschnittsratings von der Referenz.
+    ################################################################################################################
+    previous_store_directory, previous_standardizer = m.SRS_STORE_DIRECTORY, m._standardizer
+    try:
+        for seed, length_km in enumerate(route_lengths_km):
+            raw_route = generate_route(length_km, seed=seed)
+            route = m.densify_route(raw_route, 0.11)
+
+            rng = np.random.default_rng(2)
+            latitudes, longitudes, ppes = generate_srs_dataset(points)
+            latitudes, longitudes, ppes = [np.concatenate([column, along]) for column, along in zip(
+                (latitudes, longitudes, ppes),
+                (route.lat[::3] + rng.normal(0, 0.0003, len(route.lat[::3])),
+                 route.long[::3] + rng.normal(0, 0.0003, len(route.lat[::3])),
+                 rng.lognormal(-2.2, 0.9, len(route.lat[::3]))))]
+
+            with tempfile.TemporaryDirectory() as store_directory:
+                m.write_database_srs_store(latitudes, longitudes, ppes, store_directory)
+                m.SRS_STORE_DIRECTORY = store_directory
+                m._standardizer = generate_quantile_table(ppes)
+
+                def densified(maximum_point_distance):
+                    snapped_route = m.snap_route(m.densify_route(raw_route, maximum_point_distance), raster=False)[0]
+                    return m.price_rated_route(snapped_route, 4, 300, 75000, 10000, 0.3)[1][0]
+
+                reference = densified(0.01)
+                variants = [
+                    ("Zwischenpunkte 110 m", len(route), lambda: densified(0.11)),
+                    ("exakt über Segmente", len(raw_route),
+                     lambda: m.price_route_integrated(raw_route, 4, 300, 75000, 10000, 0.3)[0][1][0])
+                ]
+                print("  {} km (Referenz: Rating {:.4f} mit Zwischenpunkten alle 10 m)".format(length_km, reference))
+                for name, items, function in variants:
+                    milliseconds, rating = timed(function, repetitions)
+                    print("    {:>22}: {:>6} Routenpunkte, {:8.1f} ms, Rating {:.4f} ({:+.4f})".format(
+                        name, items, milliseconds, rating, rating - reference))
+
+                m._srs_stores.pop(store_directory, None)
+    finally:
+        m.SRS_STORE_DIRECTORY, m._standardizer = previous_store_directory, previous_standardizer
+
+
+# Name -> Aufruf des Benchmarks mit den Kommandozeilen-Argumenten
+BENCHMARKS = {
+    "srs_range_query": lambda arguments: benchmark_srs_range_query(points=arguments.points),
+    "densify": lambda arguments: benchmark_densify(),
+    "corridor": lambda arguments: benchmark_corridor(points=arguments.points, local=arguments.local),
+    "import_time": lambda arguments: benchmark_import_time(threshold_ms=arguments.import_threshold),
+    "pipeline": lambda arguments: benchmark_pipeline(scales=arguments.scales, baseline_path=arguments.baseline,
+                                                     save_baseline=arguments.save_baseline,
+                                                     tolerance=arguments.tolerance,
+                                                     require_baseline="pipeline" in arguments.benchmarks),
+    "raster": lambda arguments: benchmark_raster(),
+    "integrated": lambda arguments: benchmark_integrated()
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline-Benchmarks für die Preisberechnung")
+    parser.add_argument("benchmarks", nargs="*", help="Auswahl aus: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--points", type=int, default=3000000, help="Anzahl synthetischer SmartRoadSense-Punkte")
+    parser.add_argument("--local", action="store_true",
+                        help="echte Daten (SmartRoadSense-Datenbank und Routen-Cache) statt synthetischer Daten nutzen")
+    parser.add_argument("--import-threshold", type=float, default=IMPORT_TIME_THRESHOLD_MS,
+                        help="Obergrenze für die Dauer des Imports von main.py in ms")
+    parser.add_argument("--scales", nargs="+", choices=list(PIPELINE_SCALES), default=["small", "medium"],
+                        help="Größen für den Pipeline-Benchmark")
+    parser.add_argument("--baseline", default=PIPELINE_BASELINE_PATH, help="Datei der Vergleichsbasis")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Messwerte des Pipeline-Benchmarks als Vergleichsbasis speichern")
+    parser.add_argument("--tolerance", type=float, default=PIPELINE_TOLERANCE,
+                        help="zulässige Abweichung von der Vergleichsbasis (0.3 = 30 %%)")
+    arguments = parser.parse_args()
+
+    failed = []
+    for name in arguments.benchmarks or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            parser.error("unbekannter Benchmark: {}".format(name))
+        print(name)
+        if BENCHMARKS[name](arguments) is False:
+            failed.append(name)
+
+    if failed:
+        sys.exit("Fehlgeschlagen: " + ", ".join(failed))
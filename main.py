@@ -1,16 +1,73 @@
 # coding: utf8
 
-from config import GRAPHHOPPER_API_KEY
-
-import requests
+from urllib.parse import urlsplit
 import json
+import csv
 import math
+import random
 from zipfile import ZipFile
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import mplleaflet
+import sys
+import shutil
+import tempfile
+import sqlite3
+import threading
+import multiprocessing
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import importlib
+import functools
+from contextlib import contextmanager, nullcontext, ExitStack
+import numpy as np
 import time
+import zlib
+import hashlib
+
+
+class LazyModule:
+    ################################################################################################################
+    # Platzhalter für ein Modul, das erst beim ersten Zugriff auf eines seiner Attribute importiert wird.
+    # pandas und requests brauchen zusammen ca. 0,5 s zum Importieren, werden aber z.B. zum Bepreisen bereits
+    # gesnappter Routen nicht gebraucht. So zahlen nur die Programmteile, die sie wirklich nutzen,
+    # für den Import (die Dauer des Imports von main.py lässt sich mit "python benchmark.py import_time" prüfen).
+    #
+    # Verwendung wie das Modul selbst, z.B. pd = LazyModule("pandas") und danach pd.read_csv(...)
+    #################################################################################################################
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        # wird nur für Attribute aufgerufen, die der Platzhalter selbst nicht hat, also für alle des Moduls
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        return "<LazyModule {!r} ({})>".format(self._name, "geladen" if self._module is not None else "nicht geladen")
+
+
+pd = LazyModule("pandas")
+requests = LazyModule("requests")
+
+# Rechteck (z.B. abgefragter Bereich) für die Karte (siehe plot):
+# xy = (Längengrad, Breitengrad) der unteren linken Ecke, Breite/Höhe in Grad, ec = Randfarbe
+Rectangle = namedtuple("Rectangle", ["xy", "width", "height", "ec"])
+
+
+def get_graphhopper_api_key():
+    # Der API-Key wird erst bei der ersten Anfrage an GraphHopper aus config.py gelesen, sodass main.py auch ohne
+    # config.py importiert werden kann
+    from config import GRAPHHOPPER_API_KEY
+    return GRAPHHOPPER_API_KEY
+
+
+def __getattr__(name):
+    # Für Skripte, die noch main.GRAPHHOPPER_API_KEY verwenden
+    if name == "GRAPHHOPPER_API_KEY":
+        return get_graphhopper_api_key()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 class Coordinate:
@@ -115,94 +172,1382 @@ class Coordinate:
         return distance
 
 
+class RatedRoute:
+    ################################################################################################################
+    # Die RatedRoute-Klasse speichert eine ganze Route (also das, was sonst eine Liste von Coordinate-Objekten wäre)
+    # spaltenweise in numpy-Arrays. Für jeden Routenpunkt gibt es also keinen eigenen Coordinate-Eintrag mehr, sondern
+    # nur noch einen Eintrag in jeder Spalte:
+    #   - "lat", "long": Breiten- und Längengrad
+    #   - "rating_raw", "rating_raw_data_source", "rating_standardised": wie beim Coordinate-Objekt
+    #   - "rating_is_snapped", "snapping_distance": wie beim Coordinate-Objekt
+    #   - "snapped_lat", "snapped_long": Koordinaten des Punktes, dessen Rating übernommen wurde (sonst NaN)
+    #
+    # Fehlende Werte werden wie beim Coordinate-Objekt mit -1 bzw. "-1" gekennzeichnet.
+    #
+    # Aus Gründen der Rückwärtskompatibilität verhält sich eine RatedRoute wie eine Liste von Coordinate-Objekten:
+    # route[i] und das Iterieren über die Route liefern Coordinate-Objekte (Kopien der jeweiligen Zeile), route[a:b]
+    # liefert eine neue RatedRoute und mit '+' können Routen (oder Listen von Coordinate-Objekten) aneinander
+    # gehängt werden.
+    #################################################################################################################
+
+    COLUMNS = ["lat", "long", "rating_raw", "rating_raw_data_source", "rating_standardised", "rating_is_snapped",
+               "snapping_distance", "snapped_lat", "snapped_long"]
+
+    def __init__(self, lat=(), long=(), rating_raw=None, rating_raw_data_source=None, rating_standardised=None,
+                 rating_is_snapped=None, snapping_distance=None, snapped_lat=None, snapped_long=None):
+
+        self.lat = np.array(lat, dtype=float).reshape(-1)
+        self.long = np.array(long, dtype=float).reshape(-1)
+        if len(self.lat) != len(self.long):
+            raise AttributeError("lat and long need the same length")
+
+        def column(values, default, dtype):
+            if values is None:
+                return np.full(len(self.lat), default, dtype=dtype)
+            values = np.array(values, dtype=dtype).reshape(-1)
+            if len(values) != len(self.lat):
+                raise AttributeError("all columns need the same length")
+            return values
+
+        self.rating_raw = column(rating_raw, -1.0, float)
+        self.rating_raw_data_source = column(rating_raw_data_source, "-1", "<U3")
+        self.rating_standardised = column(rating_standardised, -1.0, float)
+
+        self.rating_is_snapped = column(rating_is_snapped, False, bool)
+        self.snapping_distance = column(snapping_distance, -1.0, float)
+        self.snapped_lat = column(snapped_lat, np.nan, float)
+        self.snapped_long = column(snapped_long, np.nan, float)
+
+        # Gleiche Plausibilitätsprüfungen wie beim Coordinate-Objekt
+        if ((self.rating_raw != -1) & (self.rating_raw_data_source == "-1")).any():
+            raise AttributeError("raw ratings require data source")
+        if (self.rating_is_snapped & (self.snapping_distance == -1)).any():
+            raise AttributeError("raw ratings require data source")
+
+    @classmethod
+    def from_coordinates(cls, coordinates):
+        # Erstellt eine RatedRoute aus einer Liste von Coordinate-Objekten
+        coordinates = list(coordinates)
+        snapped = [c.snapped_rating_coordinates or [np.nan, np.nan] for c in coordinates]
+        return cls(lat=[c.lat for c in coordinates],
+                   long=[c.long for c in coordinates],
+                   rating_raw=[c.rating_raw for c in coordinates],
+                   rating_raw_data_source=[c.rating_raw_data_source for c in coordinates],
+                   rating_standardised=[c.rating_standardised for c in coordinates],
+                   rating_is_snapped=[c.rating_is_snapped for c in coordinates],
+                   snapping_distance=[c.snapping_distance for c in coordinates],
+                   snapped_lat=[s[0] for s in snapped],
+                   snapped_long=[s[1] for s in snapped])
+
+    @classmethod
+    def from_path(cls, path):
+        # Nimmt sowohl RatedRoutes als auch Listen von Coordinate-Objekten an
+        if isinstance(path, cls):
+            return path
+        return cls.from_coordinates(path)
+
+    @classmethod
+    def concatenate(cls, routes):
+        routes = [cls.from_path(route) for route in routes]
+        if not routes:
+            return cls()
+        return cls(**{name: np.concatenate([getattr(route, name) for route in routes]) for name in cls.COLUMNS})
+
+    def copy(self):
+        return RatedRoute(**{name: getattr(self, name).copy() for name in self.COLUMNS})
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self.get_coordinate(item)
+        return RatedRoute(**{name: getattr(self, name)[item] for name in self.COLUMNS})
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.get_coordinate(i)
+
+    def __add__(self, other):
+        return RatedRoute.concatenate([self, other])
+
+    def insert(self, positions, other):
+        # Neue RatedRoute, in der die Punkte von 'other' jeweils vor den Stellen 'positions' eingefügt wurden
+        other = RatedRoute.from_path(other)
+        return RatedRoute(**{name: np.insert(getattr(self, name), positions, getattr(other, name))
+                             for name in self.COLUMNS})
+
+    def __radd__(self, other):
+        return RatedRoute.concatenate([other, self])
+
+    def get_coordinate(self, i):
+        # Coordinate-Objekt (Kopie) für den i-ten Routenpunkt
+        snapped_rating_coordinates = None
+        if self.rating_is_snapped[i]:
+            snapped_rating_coordinates = [float(self.snapped_lat[i]), float(self.snapped_long[i])]
+        return Coordinate(self.lat[i], self.long[i], self.rating_raw[i], self.rating_raw_data_source[i],
+                          self.rating_standardised[i], self.rating_is_snapped[i], self.snapping_distance[i],
+                          snapped_rating_coordinates)
+
+    def to_coordinates(self):
+        return list(self)
+
+    def get_coordinates(self):
+        # Array mit einer Zeile [lat, long] pro Routenpunkt
+        return np.stack([self.lat, self.long], axis=1)
+
+    def get_rating(self, standardised_wanted=True, raw_with_source_wanted=False):
+        # Wie Coordinate.get_rating, nur für alle Routenpunkte auf einmal (als Arrays)
+        if standardised_wanted:
+            missing = self.rating_standardised == -1
+            if missing.any():
+                if ((self.rating_raw[missing] == -1) | (self.rating_raw_data_source[missing] == "-1")).any():
+                    raise AttributeError('not possible, required values missing')
+                self.rating_standardised[missing] = standardize_ratings(self.rating_raw[missing],
+                                                                        self.rating_raw_data_source[missing])
+            return self.rating_standardised
+        else:
+            if raw_with_source_wanted:
+                return self.rating_raw, self.rating_raw_data_source
+            else:
+                return self.rating_raw
+
+    def set_rating(self, rating_standardised, rating_raw=None, rating_raw_data_source=None):
+        self.rating_standardised[:] = rating_standardised
+        if not (bool(rating_raw is None) and bool(rating_raw_data_source is None)):
+            self.rating_raw[:] = rating_raw
+            self.rating_raw_data_source[:] = rating_raw_data_source
+
+    def set_snapping_info(self, snapping_distance, snapped_lat, snapped_long, rating_is_snapped=True):
+        self.rating_is_snapped[:] = rating_is_snapped
+        self.snapping_distance[:] = snapping_distance
+        self.snapped_lat[:] = snapped_lat
+        self.snapped_long[:] = snapped_long
+
+    def calc_segment_distances(self):
+        # Abstand in km von jedem Routenpunkt zum nächsten, berechnet wie in Coordinate.calc_distance_to_other_point
+        distance_y = 111.3 * (self.lat[:-1] - self.lat[1:])
+        conversion_factor_delta_longitude_to_km = np.cos(np.radians(self.lat[:-1])) * 111.3
+        distance_x = (self.long[:-1] - self.long[1:]) * conversion_factor_delta_longitude_to_km
+        return np.sqrt(distance_x * distance_x + distance_y * distance_y)
+
+
+class RatingIndex:
+    ################################################################################################################
+    # Die RatingIndex-Klasse ist ein räumlicher Index (gleichmäßiges Gitter) über eine Menge von Rating-Punkten.
+    # Sie wird genutzt, um für viele Routenpunkte auf einmal das jeweils nächste Rating zu finden, ohne jeden
+    # Routenpunkt mit jedem Rating-Punkt vergleichen zu müssen (siehe snap_ratings_to_route)
+    #
+    # Beim Initialisieren werden die Rating-Punkte in Gitterzellen mit einer Kantenlänge von ca. 'cell_size_km'
+    # einsortiert. Die Zellbreite in Längengrad wird dabei mit dem äquatorfernsten Rating-Punkt berechnet, sodass
+    # eine Zelle in keiner Richtung schmaler als 'cell_size_km' ist.
+    # Die Punkte werden nach Zellnummer (Zeile * Spaltenanzahl + Spalte) sortiert abgelegt. Alle Punkte einer Zeile
+    # von Zellen zwischen zwei Spalten liegen damit an einem Stück und können über eine binäre Suche gefunden werden.
+    #
+    # Die Abfrage ("query") gruppiert die Routenpunkte nach ihrer Zelle und durchsucht für jede Gruppe Ringe von
+    # Zellen um diese Zelle herum, bis das gefundene nächste Rating näher ist als alles, was außerhalb des bisher
+    # durchsuchten Bereichs liegen kann. Das Ergebnis ist damit exakt dasselbe wie beim Vergleich mit allen Punkten:
+    #   - Die Distanz wird genau wie in "calc_distance_to_other_point" berechnet (Breitengrad des Routenpunktes)
+    #   - Bei gleicher Distanz gewinnt, wie bisher, der Rating-Punkt, der in der Liste zuerst kommt
+    #################################################################################################################
+
+    def __init__(self, rating_coordinates, cell_size_km=0.5):
+        self.rating_coordinates = list(rating_coordinates)
+        self._build(np.array([c.lat for c in self.rating_coordinates], dtype=float),
+                    np.array([c.long for c in self.rating_coordinates], dtype=float), cell_size_km)
+
+    @classmethod
+    def from_arrays(cls, lats, longs, cell_size_km=0.5):
+        # Wie oben, aber direkt aus Breiten- und Längengraden, ohne Coordinate-Objekte ('rating_coordinates' ist leer)
+        index = cls.__new__(cls)
+        index.rating_coordinates = []
+        index._build(np.asarray(lats, dtype=float), np.asarray(longs, dtype=float), cell_size_km)
+        return index
+
+    def _build(self, lats, longs, cell_size_km):
+        self.lats = lats
+        self.longs = longs
+
+        if len(self.lats) == 0:
+            return
+
+        max_abs_lat = min(float(np.abs(self.lats).max()), 89.9)
+        self.cell_lat = cell_size_km / 111.3
+        self.cell_long = cell_size_km / (math.cos(math.radians(max_abs_lat)) * 111.3)
+        self.lat0 = float(self.lats.min())
+        self.long0 = float(self.longs.min())
+
+        rows, cols = self._cells(self.lats, self.longs)
+        self.row_count = int(rows.max()) + 1
+        self.col_count = int(cols.max()) + 1
+
+        # Stabil sortieren, damit innerhalb einer Zelle die ursprüngliche Reihenfolge erhalten bleibt
+        keys = rows * self.col_count + cols
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cells(self, lats, longs):
+        rows = np.floor((lats - self.lat0) / self.cell_lat).astype(np.int64)
+        cols = np.floor((longs - self.long0) / self.cell_long).astype(np.int64)
+        return rows, cols
+
+    def _indices_in_box(self, row_from, row_to, col_from, col_to):
+        # Liefert die (ursprünglichen) Indizes aller Punkte in den Zellen des Rechtecks, aufsteigend sortiert
+        row_from, row_to = max(row_from, 0), min(row_to, self.row_count - 1)
+        col_from, col_to = max(col_from, 0), min(col_to, self.col_count - 1)
+        if row_from > row_to or col_from > col_to:
+            return np.empty(0, dtype=np.int64)
+
+        row_keys = np.arange(row_from, row_to + 1) * self.col_count
+        starts = np.searchsorted(self.sorted_keys, row_keys + col_from, side="left")
+        ends = np.searchsorted(self.sorted_keys, row_keys + col_to, side="right")
+        indices = np.concatenate([self.order[s:e] for s, e in zip(starts, ends)])
+        indices.sort()
+        return indices
+
+    def query(self, lats, longs):
+        ################################################################################################################
+        # Eingabeparameter:     Breiten- und Längengrade der Routenpunkte (Listen oder Arrays)
+        # Rückgabe:             Tupel aus
+        #                           - Array mit dem Index des jeweils nächsten Rating-Punktes (in 'rating_coordinates')
+        #                           - Array mit der jeweiligen Distanz in km
+        ################################################################################################################
+        lats = np.asarray(lats, dtype=float)
+        longs = np.asarray(longs, dtype=float)
+
+        if len(self.lats) == 0:
+            raise IndexError("Im Index sind keine Rating-Punkte vorhanden")
+
+        closest_indices = np.zeros(len(lats), dtype=np.int64)
+        closest_distances = np.zeros(len(lats), dtype=float)
+        if len(lats) == 0:
+            return closest_indices, closest_distances
+
+        # Umrechnungsfaktor wie in "calc_distance_to_other_point", damit die Distanzen bitgenau übereinstimmen
+        factors = np.array([math.cos(math.radians(lat)) * 111.3 for lat in lats])
+
+        rows, cols = self._cells(lats, longs)
+        cells, group_of_point = np.unique(np.stack([rows, cols], axis=1), axis=0, return_inverse=True)
+        group_of_point = group_of_point.reshape(-1)
+
+        for group, (row, col) in enumerate(cells):
+            members = np.flatnonzero(group_of_point == group)
+
+            # Liegt die Zelle außerhalb des Gitters, wird direkt mit dem ersten Ring begonnen, der das Gitter berührt
+            ring = max(1, row - (self.row_count - 1), -row, col - (self.col_count - 1), -col)
+            while len(members) > 0:
+                candidates = self._indices_in_box(row - ring, row + ring, col - ring, col + ring)
+                covers_all = (row - ring <= 0 and row + ring >= self.row_count - 1 and
+                              col - ring <= 0 and col + ring >= self.col_count - 1)
+                if len(candidates) > 0:
+                    distance_y = 111.3 * (lats[members][:, None] - self.lats[candidates][None, :])
+                    distance_x = (longs[members][:, None] - self.longs[candidates][None, :]) * factors[members][:, None]
+                    distances = np.sqrt(distance_x * distance_x + distance_y * distance_y)
+                    best = np.argmin(distances, axis=1)
+                    best_distances = distances[np.arange(len(members)), best]
+
+                    # Alles außerhalb des durchsuchten Bereichs ist mindestens 'ring' Zellen entfernt
+                    lower_bound = ring * np.minimum(self.cell_lat * 111.3, self.cell_long * factors[members])
+                    done = best_distances <= lower_bound * (1 - 1e-9)
+                    if covers_all:
+                        done[:] = True
+                    closest_indices[members[done]] = candidates[best[done]]
+                    closest_distances[members[done]] = best_distances[done]
+                    members = members[~done]
+                ring += max(1, ring // 2)
+
+        return closest_indices, closest_distances
+
+
+class Cache:
+    ################################################################################################################
+    # Die Cache-Klasse speichert Ergebnisse von teuren Abfragen (z.B. API-Aufrufen) zwischen. Sie besteht aus zwei
+    # Ebenen:
+    #   - Ein LRU-Speicher im Arbeitsspeicher ('memory_entries' Einträge, der am längsten nicht genutzte fliegt raus)
+    #   - Optional eine SQLite-Datei auf der Festplatte ('path'), sodass Ergebnisse auch über das Programmende hinaus
+    #     erhalten bleiben. Auch hier wird bei mehr als 'max_entries' Einträgen der am längsten nicht genutzte gelöscht.
+    #
+    # Einträge, die älter als 'ttl_seconds' sind, gelten als abgelaufen und werden wie fehlende Einträge behandelt.
+    # In der Datei werden Bytes gespeichert, die Umwandlung übernehmen 'encode' und 'decode'.
+    # In 'stats' wird mitgezählt, wie oft ein Eintrag im Arbeitsspeicher ("memory_hits") bzw. in der Datei
+    # ("disk_hits") gefunden wurde und wie oft nicht ("misses").
+    #
+    # Die Klasse kann aus mehreren Threads gleichzeitig genutzt werden. Jeder Prozess öffnet seine eigene Verbindung
+    # zur Datei.
+    #################################################################################################################
+
+    def __init__(self, path=None, table="cache", memory_entries=1024, max_entries=100000, ttl_seconds=None,
+                 encode=lambda value: json.dumps(value).encode("utf8"),
+                 decode=lambda data: json.loads(data.decode("utf8"))):
+        self.path = path
+        self.table = table
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.encode = encode
+        self.decode = decode
+
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._connection = None
+        self._connection_pid = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def _database(self):
+        if self._connection is None or self._connection_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS "{}" (key TEXT PRIMARY KEY, value BLOB, '
+                                     'created_at REAL, accessed_at REAL)'.format(self.table))
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _is_expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            if key in self._memory:
+                value, created_at = self._memory[key]
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self.path is not None:
+                database = self._database()
+                row = database.execute('SELECT value, created_at FROM "{}" WHERE key = ?'.format(self.table),
+                                       (key,)).fetchone()
+                if row is not None and self._is_expired(row[1], now):
+                    database.execute('DELETE FROM "{}" WHERE key = ?'.format(self.table), (key,))
+                    self.stats["expired"] += 1
+                elif row is not None:
+                    database.execute('UPDATE "{}" SET accessed_at = ? WHERE key = ?'.format(self.table), (now, key))
+                    value = self.decode(row[0])
+                    self._remember(key, value, row[1])
+                    self.stats["disk_hits"] += 1
+                    return value
+
+            self.stats["misses"] += 1
+            return default
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+
+            if self.path is not None:
+                database = self._database()
+                database.execute('INSERT OR REPLACE INTO "{}" (key, value, created_at, accessed_at) '
+                                 'VALUES (?, ?, ?, ?)'.format(self.table), (key, self.encode(value), now, now))
+                evicted = database.execute('DELETE FROM "{0}" WHERE key IN (SELECT key FROM "{0}" '
+                                           'ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)'.format(self.table),
+                                           (self.max_entries,)).rowcount
+                self.stats["evictions"] += max(evicted, 0)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.path is not None:
+                self._database().execute('DELETE FROM "{}"'.format(self.table))
+
+
+class Measurement:
+    ################################################################################################################
+    # Ergebnis einer Messung (siehe Instrumentation.record):
+    #   - 'stages': Abschnitt -> [Sekunden, Aufrufe]. Die Sekunden sind ohne die darin aufgerufenen Abschnitte
+    #     gezählt (z.B. ist die Wartezeit auf die API unter "http" und nicht zusätzlich unter "geocoding" verbucht),
+    #     sodass sich die Zeiten aller Abschnitte zur gemessenen Gesamtzeit aufsummieren.
+    #   - 'counters': Zähler -> Wert (z.B. "http_bytes" oder "rating_candidates")
+    #################################################################################################################
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    def add_stage(self, name, seconds, calls=1):
+        stage = self.stages.setdefault(name, [0.0, 0])
+        stage[0] += seconds
+        stage[1] += calls
+
+    def add_counter(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other):
+        for name, (seconds, calls) in other.stages.items():
+            self.add_stage(name, seconds, calls)
+        for name, value in other.counters.items():
+            self.add_counter(name, value)
+
+    def seconds(self, name):
+        return self.stages.get(name, [0.0, 0])[0]
+
+    def calls(self, name):
+        return self.stages.get(name, [0.0, 0])[1]
+
+    def as_dict(self):
+        return {"stages": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.stages.items()},
+                "counters": dict(self.counters)}
+
+
+class _Stage:
+    # Misst einen Abschnitt (siehe Instrumentation.stage)
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.instrumentation._stack().append([time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stack = self.instrumentation._stack()
+        start, children = stack.pop()
+        elapsed = time.perf_counter() - start
+        if stack:
+            stack[-1][1] += elapsed
+        measurement = self.instrumentation._current()
+        if measurement is not None:
+            measurement.add_stage(self.name, elapsed - children)
+
+
+class Instrumentation:
+    ################################################################################################################
+    # Misst, wie viel Zeit in welchem Abschnitt der Berechnung verbracht wird (Geocoding, Routing, HTTP, Abfrage der
+    # SmartRoadSense-Datenbank, Queensland, Standardisierung, Snapping, Bepreisung), und zählt z.B. HTTP-Bytes und
+    # Rating-Kandidaten. Standardmäßig ist die Messung ausgeschaltet: 'stage' und 'count' kosten dann nur eine Abfrage
+    # von 'enabled'.
+    #
+    # Verwendung:
+    #   with get_instrumentation().record() as measurement:     -> sammelt alle Abschnitte und Zähler, die im selben
+    #       ...                                                    Thread laufen, in 'measurement' (ausgeschaltet: None)
+    #   with get_instrumentation().stage("srs"): ...            -> misst einen Abschnitt (oder @instrumented("srs"))
+    #   get_instrumentation().count("http_bytes", 1234)         -> erhöht einen Zähler
+    #
+    # Verschachtelte Messungen werden beim Beenden in die äußere übernommen. Abschnitte und Zähler außerhalb einer
+    # Messung werden nicht gespeichert.
+    # Über 'add_sink' können Funktionen angemeldet werden, die mit 'emit' fertige Messungen (und beliebige weitere
+    # Angaben, z.B. die Zeilennummer) erhalten, z.B. JsonLinesTraceSink.
+    #################################################################################################################
+
+    def __init__(self):
+        self.enabled = False
+        self.sinks = []
+        self._local = threading.local()
+
+    def enable(self, enabled=True):
+        self.enabled = bool(enabled)
+
+    def add_sink(self, sink):
+        # 'sink' wird als sink(measurement, context) aufgerufen, 'context' ist ein dict mit den Angaben aus 'emit'
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def emit(self, measurement, **context):
+        if measurement is None:
+            return
+        for sink in self.sinks:
+            sink(measurement, context)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _records(self):
+        records = getattr(self._local, "records", None)
+        if records is None:
+            records = self._local.records = []
+        return records
+
+    def _current(self):
+        # Messung, in die Abschnitte und Zähler im aktuellen Thread gezählt werden (None außerhalb einer Messung)
+        records = self._records()
+        return records[-1] if records else None
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NO_MEASUREMENT
+        return _Stage(self, name)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            measurement = self._current()
+            if measurement is not None:
+                measurement.add_counter(name, value)
+
+    def record(self):
+        if not self.enabled:
+            return _NO_MEASUREMENT
+        return _Record(self)
+
+
+class _Record:
+    # Sammelt eine Messung (siehe Instrumentation.record)
+    def __init__(self, instrumentation):
+        self.instrumentation = instrumentation
+        self.measurement = Measurement()
+
+    def __enter__(self):
+        self.instrumentation._records().append(self.measurement)
+        return self.measurement
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        records = self.instrumentation._records()
+        records.pop()
+        if records:
+            records[-1].merge(self.measurement)
+
+
+_NO_MEASUREMENT = nullcontext()
+
+# Gemeinsame Instrumentierung für alle Abschnitte (siehe get_instrumentation)
+_instrumentation = Instrumentation()
+
+# Abschnitte und Zähler, die z.B. 'process_with_csv.py' als eigene Spalten ausgibt
+INSTRUMENTATION_STAGES = ["geocoding", "routing", "http", "srs", "ql", "standardize", "snapping", "pricing"]
+INSTRUMENTATION_COUNTERS = ["http_requests", "http_bytes", "srs_rows", "ql_rows", "rating_candidates"]
+
+
+def get_instrumentation():
+    return _instrumentation
+
+
+def instrumented(stage):
+    # Dekorator: Misst jeden Aufruf der Funktion als Abschnitt 'stage' (siehe Instrumentation)
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*arguments, **keyword_arguments):
+            if not _instrumentation.enabled:
+                return function(*arguments, **keyword_arguments)
+            with _Stage(_instrumentation, stage):
+                return function(*arguments, **keyword_arguments)
+        return wrapper
+    return decorator
+
+
+class JsonLinesTraceSink:
+    ################################################################################################################
+    # Sink für Instrumentation.add_sink: Schreibt für jede Messung eine Zeile pro Abschnitt als JSON in die Datei
+    # 'path', z.B.
+    #   {"row": 3, "stage": "srs", "seconds": 0.0123, "calls": 4}
+    # und eine Zeile mit allen Zählern ({"row": 3, "counters": {...}}). Die Angaben aus 'emit' (hier "row") werden in
+    # jede Zeile übernommen.
+    #################################################################################################################
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self._file = open(path, "a" if append else "w", encoding="utf8")
+        self._lock = threading.Lock()
+
+    def __call__(self, measurement, context):
+        lines = [dict(context, stage=name, seconds=seconds, calls=calls)
+                 for name, (seconds, calls) in measurement.stages.items()]
+        lines.append(dict(context, counters=measurement.counters))
+        with self._lock:
+            for line in lines:
+                self._file.write(json.dumps(line) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class TokenBucket:
+    ################################################################################################################
+    # Einfacher Token-Bucket zur Begrenzung der Anfragen pro Sekunde (z.B. entsprechend der GraphHopper-Quota):
+    # Es kommen 'rate' Tokens pro Sekunde hinzu, höchstens 'capacity' Tokens können angespart werden. Jede Anfrage
+    # verbraucht ein Token, ist keines vorhanden, wartet 'acquire', bis wieder eines da ist.
+    #################################################################################################################
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpClient:
+    ################################################################################################################
+    # Die HttpClient-Klasse bündelt alle Anfragen an externe APIs (GraphHopper, Queensland, SmartRoadSense):
+    #   - Verbindungen werden über eine requests.Session wiederverwendet (keep-alive), statt für jede Anfrage eine
+    #     neue TCP- und TLS-Verbindung aufzubauen. Pro Host werden bis zu 'pool_size' Verbindungen offen gehalten.
+    #   - Jede Anfrage hat ein Timeout ('timeout' in Sekunden, als (Verbindungsaufbau, Lesen))
+    #   - Schlägt eine Anfrage wegen eines Verbindungsfehlers, Timeouts oder einer Antwort mit einem Status aus
+    #     'retry_statuses' (z.B. 503) fehl, wird sie bis zu 'max_retries' mal wiederholt. Die Wartezeit verdoppelt
+    #     sich dabei jedes Mal ('backoff_seconds', 2 * 'backoff_seconds', ...) und wird zufällig verkürzt ("jitter"),
+    #     damit nicht alle Anfragen gleichzeitig wiederholt werden. Gibt der Server "Retry-After" an, wird mindestens
+    #     so lange gewartet.
+    #   - Pro Host laufen höchstens 'max_per_host' Anfragen gleichzeitig
+    #   - Optional kann pro Host über 'set_rate_limit' eine maximale Anzahl Anfragen pro Sekunde festgelegt werden
+    #     (siehe TokenBucket), die auch für Wiederholungen gilt
+    #
+    # Nach der letzten Wiederholung wird die letzte Antwort zurückgegeben (bzw. der letzte Fehler ausgelöst), die
+    # Auswertung bleibt also bei den aufrufenden Methoden.
+    # Jeder Prozess nutzt seine eigene Session.
+    #################################################################################################################
+
+    def __init__(self, timeout=(5, 60), max_retries=3, backoff_seconds=0.5, retry_statuses=(429, 500, 502, 503, 504),
+                 pool_size=10, max_per_host=4):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.retry_statuses = set(retry_statuses)
+        self.pool_size = pool_size
+        self.max_per_host = max_per_host
+
+        self._session = None
+        self._session_pid = None
+        self._host_limits = {}
+        self._rate_limits = {}
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+                self._session_pid = os.getpid()
+            return self._session
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def set_rate_limit(self, url, requests_per_second, burst=None):
+        # Begrenzt die Anfragen an den Host der URL; requests_per_second=None hebt die Begrenzung auf
+        host = urlsplit(url).netloc
+        with self._lock:
+            if requests_per_second is None:
+                self._rate_limits.pop(host, None)
+            else:
+                self._rate_limits[host] = TokenBucket(requests_per_second, burst)
+
+    @contextmanager
+    def rate_limit(self, url, requests_per_second, burst=None):
+        # Wie set_rate_limit, aber nur innerhalb des with-Blocks, danach gilt wieder die vorherige Begrenzung
+        host = urlsplit(url).netloc
+        with self._lock:
+            previous = self._rate_limits.get(host)
+        self.set_rate_limit(url, requests_per_second, burst)
+        try:
+            yield self
+        finally:
+            with self._lock:
+                if previous is None:
+                    self._rate_limits.pop(host, None)
+                else:
+                    self._rate_limits[host] = previous
+
+    def _wait_before_retry(self, attempt, response=None):
+        wait = random.uniform(0, self.backoff_seconds * 2 ** attempt)
+        if response is not None:
+            try:
+                wait = max(wait, float(response.headers.get("Retry-After", 0)))
+            except ValueError:
+                pass
+        time.sleep(wait)
+
+    @instrumented("http")
+    def get(self, url, **kwargs):
+        ################################################################################################################
+        # Eingabeparameter:     URL und weitere Parameter wie bei requests.get (z.B. params, stream)
+        # Rückgabe:             requests.Response
+        #
+        # Bei eingeschalteter Instrumentierung werden die Anfragen (inkl. Wiederholungen) und die Bytes der Antworten
+        # gezählt (bei stream=True laut "Content-Length", da die Antwort erst später gelesen wird)
+        ################################################################################################################
+        kwargs.setdefault("timeout", self.timeout)
+        session = self._get_session()
+
+        rate_limit = self._rate_limits.get(urlsplit(url).netloc)
+
+        attempt = 0
+        while True:
+            if rate_limit is not None:
+                rate_limit.acquire()
+            try:
+                with self._host_limit(url):
+                    response = session.get(url, **kwargs)
+                _instrumentation.count("http_requests")
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                self._wait_before_retry(attempt)
+            else:
+                if response.status_code not in self.retry_statuses or attempt >= self.max_retries:
+                    if _instrumentation.enabled:
+                        _instrumentation.count("http_bytes", int(response.headers.get("Content-Length", 0))
+                                               if kwargs.get("stream") else len(response.content))
+                    return response
+                response.close()
+                self._wait_before_retry(attempt, response)
+            attempt += 1
+
+
+def get_http_client():
+    # Gemeinsamer HttpClient für alle Abfragen, wird beim ersten Aufruf mit den HTTP_-Einstellungen und der
+    # Begrenzung für GraphHopper (GRAPHHOPPER_REQUESTS_PER_SECOND) erstellt
+    global _http_client
+
+    if _http_client is None:
+        _http_client = HttpClient(timeout=HTTP_TIMEOUT, max_retries=HTTP_MAX_RETRIES,
+                                  backoff_seconds=HTTP_BACKOFF_SECONDS, pool_size=HTTP_POOL_SIZE,
+                                  max_per_host=HTTP_MAX_PER_HOST)
+        _http_client.set_rate_limit(GRAPHHOPPER_URL, GRAPHHOPPER_REQUESTS_PER_SECOND)
+    return _http_client
+
+
+class ResultCsvWriter:
+    ################################################################################################################
+    # Schreibt eine Ergebnis-CSV Zeile für Zeile, statt sie nach jeder Zeile komplett neu zu schreiben. Jede Zeile
+    # wird sofort an die Datei angehängt, alle 'fsync_every' Zeilen (und beim Schließen) wird sie zusätzlich mit
+    # os.fsync auf die Festplatte geschrieben.
+    #
+    # Für die Spalten in 'sum_columns' werden beim Schreiben die Summen in 'sums' mitgezählt, sodass am Ende keine
+    # Datei mehr eingelesen werden muss, um die Summenzeile zu bilden.
+    #
+    # Mit resume=True wird eine bereits vorhandene Datei (z.B. nach einem Abbruch bei Zeile 150) weitergeführt: Die
+    # vorhandenen Ergebniszeilen bleiben stehen und werden in 'sums' mitgezählt, eine angefangene letzte Zeile sowie
+    # alte Leer- und Summenzeilen werden entfernt. Über 'is_done' können die Eingabezeilen übersprungen werden, für
+    # die schon ein Ergebnis vorhanden ist. Eine Zeile wird dabei über ihre ersten 'key_columns' Werte erkannt
+    # (in 'process_with_csv.py': Reifenanzahl, Start, Ziel), mehrfach vorkommende Zeilen werden mitgezählt.
+    #################################################################################################################
+
+    def __init__(self, path, header, sum_columns=(), key_columns=3, resume=False, fsync_every=20):
+        self.path = path
+        self.header = [str(name) for name in header]
+        self.key_columns = key_columns
+        self.fsync_every = fsync_every
+        self.sum_positions = [self.header.index(name) for name in sum_columns]
+        self.sums = [0.0] * len(self.sum_positions)
+        self.rows_written = 0
+        self.rows_resumed = 0
+        self._done = {}
+
+        existing_rows = self._read_existing_rows() if resume else None
+        if existing_rows is None:
+            self._file = open(path, "w", newline="", encoding="utf8")
+            self._writer = csv.writer(self._file, lineterminator="\n")
+            self._writer.writerow(self.header)
+        else:
+            # Die vorhandenen Ergebniszeilen werden einmal unverändert (ohne Summenzeile) neu geschrieben
+            temporary_path = path + ".tmp"
+            with open(temporary_path, "w", newline="", encoding="utf8") as file:
+                writer = csv.writer(file, lineterminator="\n")
+                writer.writerow(self.header)
+                writer.writerows(existing_rows)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, path)
+
+            self._file = open(path, "a", newline="", encoding="utf8")
+            self._writer = csv.writer(self._file, lineterminator="\n")
+            for row in existing_rows:
+                key = self._key(row)
+                self._done[key] = self._done.get(key, 0) + 1
+                self._add_to_sums(row)
+            self.rows_resumed = len(existing_rows)
+
+    def _read_existing_rows(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, newline="", encoding="utf8") as file:
+            text = file.read()
+        if not text.endswith("\n"):
+            # Die letzte Zeile wurde beim Abbruch nur teilweise geschrieben
+            text = text[:text.rfind("\n") + 1]
+        rows = list(csv.reader(text.splitlines()))
+        if not rows or rows[0] != self.header:
+            raise ValueError("{} hat nicht die erwarteten Spalten und kann nicht fortgesetzt werden".format(self.path))
+        return [row for row in rows[1:] if len(row) == len(self.header) and row[0] != ""]
+
+    def _key(self, row):
+        return tuple(str(value) for value in row[:self.key_columns])
+
+    def _add_to_sums(self, row):
+        for i, position in enumerate(self.sum_positions):
+            self.sums[i] += float(row[position])
+
+    def is_done(self, row):
+        # Gibt True zurück, wenn für die Eingabezeile schon ein Ergebnis in der Datei steht (jedes Ergebnis zählt nur
+        # für eine Eingabezeile)
+        key = self._key(row)
+        if self._done.get(key, 0) > 0:
+            self._done[key] -= 1
+            return True
+        return False
+
+    def write(self, row):
+        self._writer.writerow(row)
+        self._file.flush()
+        self._add_to_sums(row)
+        self.rows_written += 1
+        if self.rows_written % self.fsync_every == 0:
+            os.fsync(self._file.fileno())
+
+    def close(self, final_rows=()):
+        # Hängt z.B. die Leer- und Summenzeile an, ohne sie in 'sums' mitzuzählen, und schließt die Datei
+        self._writer.writerows(final_rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+# Einstellungen für externe Abfragen (siehe HttpClient). Die URLs können z.B. für Tests auf lokale Server zeigen
+GRAPHHOPPER_URL = "https://graphhopper.com/api/1"
+QL_URL = "https://www.data.qld.gov.au/api/3/action/datastore_search_sql"
+SRS_DOWNLOAD_URL = "http://www.smartroadsense.it/open_data.zip"
+HTTP_TIMEOUT = (5, 60)
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_SECONDS = 0.5
+HTTP_POOL_SIZE = 10
+HTTP_MAX_PER_HOST = 4
+_http_client = None
+
+# Einstellungen für das parallele Abfragen ganzer Batches (siehe fetch_routes_concurrently)
+FETCH_MAX_WORKERS = 8
+GRAPHHOPPER_REQUESTS_PER_SECOND = 5
+
+
+# Datensatz der Queensland-API (resource_id). Es gibt zwei Datensätze: Die Wahl fiel hier auf die 100m-Variante, da
+# überproportional viel mehr Datensätze zur Verfügung stehen und zusätzlich die Genauigkeit steigt.
+# resource_id for 1km: 66457d52-79c8-46d6-9e95-d356527a71e5
+# resource_id for 100m: d618ce2e-7d29-4569-97bd-d97bd5831924
+QL_RESOURCE_ID = "d618ce2e-7d29-4569-97bd-d97bd5831924"
+
+# Gebiet, in dem die Queensland-Datensätze liegen ((Breitengrad von, bis), (Längengrad von, bis)). Rechtecke außerhalb
+# werden nicht über die API abgefragt
+QL_EXTENT = ((-29.2, -9.0), (137.9, 153.6))
+
+# Kantenlänge der Kacheln (in Grad) und Einstellungen des Caches für die Queensland-Datensätze (siehe
+# give_rated_area_ql_arrays), Gültigkeit in Sekunden
+QL_TILE_DEGREES = 0.1
+QL_CACHE_PATH = "internal/cache.sqlite"
+QL_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+QL_CACHE_MEMORY_ENTRIES = 4096
+QL_CACHE_MAX_ENTRIES = 100000
+_ql_cache = None
+
+# Anzahl der Datensätze pro Abfrage, wenn die ganze Queensland-Datenbank gelesen wird (siehe give_ratings_ql_pages)
+QL_PAGE_ROWS = 32000
+
+# Breite des Korridors um die Route (in km, zu jeder Seite), in dem Ratings gesucht werden, und Anzahl der Segmente,
+# die für die Vorauswahl in einem Rechteck zusammengefasst werden (siehe give_corridor_boxes)
+RATING_CORRIDOR_KM = 1.5
+CORRIDOR_CHUNK_SEGMENTS = 32
+# Segmente, deren Richtung (Kreuzprodukt relativ zu den Längen) höchstens so stark abweicht, werden in corridor_mask
+# zu einer Strecke zusammengefasst, und Puffer in km für die Rundungsfehler dabei
+CORRIDOR_STRAIGHT_TOLERANCE = 1e-9
+CORRIDOR_STRAIGHT_MARGIN_KM = 1e-6
+
+# Größter Suchradius (in km) für Routenpunkte ohne Rating im Korridor (siehe snap_route)
+SNAP_MAXIMUM_SEARCH_KM = 100
+# Anteil des Suchradius, innerhalb dessen das nächste gefundene Rating als endgültig gilt (siehe snap_route und
+# integrate_route_ratings). corridor_mask rechnet mit derselben Distanz wie das Snapping, aber über den Abstand zum
+# Segment statt zum Routenpunkt; der Abstand zum Rand schließt aus, dass ein Rating genau am Rand nur wegen
+# Rundungsfehlern fehlt. Er kostet höchstens eine weitere Abfrage für die wenigen Punkte knapp innerhalb des Radius
+SNAP_RESOLVED_RADIUS_FRACTION = 0.99
+
+
 # Abfragen:
 
 
-def give_rated_area_ql(point_a=Coordinate(-90, -180), point_b=Coordinate(90, 180)):
+def give_rated_area_ql(point_a=Coordinate(-90, -180), point_b=Coordinate(90, 180), standardised=False,
+                       use_cache=True):
     ################################################################################################################
     # Eingabeparameter:     optional: Zwei beliebige Coordinate-Objekte
     #                       Werden diese nicht gegeben, so liefert die Methode alle Datensätze zurück
+    #                       optional: Sollen die Ratings direkt (in einem Durchlauf) standardisiert werden?
+    #                       optional: Soll der lokale Kachel-Cache genutzt werden? (siehe give_rated_area_ql_arrays)
     # Rückgabe:             Liste von Coordinate-Objekten mit rohen Ratings und Datenquelle 'ql'
 
     # Beschreibung:
     # Die Methode liefert die Datensätze aus der Queensland-Datenbank in einem von zwei Punkten aufgespannten Rechteck
     # zurück.
-    # Dazu werden der maximale und minimale Längen- & Breitengrad ermittelt, und dann über eine SQL-Abfrage
-    # über die API abgefragt. SQL ist hier nötig, da es über die einfachere Schnittstelle nicht möglich ist,
-    # Alle Koordinaten in einem bestimmten Bereich anzufordern.
-    # Die Antwort wird danach nach den benötigten Informationen gefiltert und für jeden Eintrag in der Antwort
-    # ein Coordinate Objekt erstellt, welches in die coordinate_list hinzugefügt wird, solange die IRIRoughness
-    # über 0 ist. Einträge mit unplausiblen Werten wie IRIRoughness = -99 werden also verworfen.
+    # Dazu werden die Datensätze über give_rated_area_ql_arrays abgefragt und für jeden Eintrag ein Coordinate Objekt
+    # erstellt, welches in die coordinate_list hinzugefügt wird. Einträge mit unplausiblen Werten wie
+    # IRIRoughness = -99 sind dort bereits verworfen.
+    ################################################################################################################
+
+    latitudes, longitudes, iri_roughness = give_rated_area_ql_arrays(point_a, point_b, use_cache)
+
+    coordinate_list = [Coordinate(lat, long, rating, "ql")
+                       for lat, long, rating in zip(latitudes.tolist(), longitudes.tolist(), iri_roughness.tolist())]
+
+    if standardised and coordinate_list:
+        ratings = standardize_ratings(iri_roughness, "ql")
+        for coordinate, rating in zip(coordinate_list, ratings.tolist()):
+            coordinate.set_rating(rating)
+
+    return coordinate_list
+
+
+def fetch_ql_area(lat_from, lat_to, long_from, long_to):
+    ################################################################################################################
+    # Eingabeparameter:     Grenzen des Rechtecks (Breiten- und Längengrade)
+    # Rückgabe:             numpy-Array mit einer Zeile [Breitengrad, Längengrad, IRIRoughness] pro Datensatz
     #
-    # Es kann zwischen zwei Datensätzen gewählt werden, wofür nur die ressource_id ausgetauscht werden muss.
-    # Die Wahl fiel hier auf die 100m-Variante, da überproportional viel mehr Datensätze zur Verfügung stehen und
-    # zusätzlich die Genauigkeit steigt.
+    # Beschreibung:
+    # Fragt die Datensätze in dem Rechteck über eine SQL-Abfrage über die API ab. SQL ist hier nötig, da es über die
+    # einfachere Schnittstelle nicht möglich ist, alle Koordinaten in einem bestimmten Bereich anzufordern.
+    # Es werden nur Datensätze mit einer IRIRoughness über 0 zurückgegeben, Einträge mit unplausiblen Werten wie
+    # IRIRoughness = -99 werden also verworfen.
     ################################################################################################################
+    sql_request = 'SELECT "Latitude","Longitude","IRIRoughness" FROM "{}" ' \
+                  'WHERE "Latitude" BETWEEN {} AND {} ' \
+                  'AND "Longitude" BETWEEN {} AND {};' \
+        .format(QL_RESOURCE_ID, lat_from, lat_to, long_from, long_to)
+
+    response = get_http_client().get(QL_URL + "?sql=" + sql_request)
+    records = response.json()["result"]["records"]
+
+    area = np.array([[float(c["Latitude"]), float(c["Longitude"]), float(c["IRIRoughness"])] for c in records],
+                    dtype=float).reshape(-1, 3)
+    return area[area[:, 2] > 0]
+
 
-    url = "https://www.data.qld.gov.au/api/3/action/datastore_search_sql"
-    resource_id = "d618ce2e-7d29-4569-97bd-d97bd5831924"
-    # resource_id for 1km: 66457d52-79c8-46d6-9e95-d356527a71e5
-    # resource_id for 100m: d618ce2e-7d29-4569-97bd-d97bd5831924
+def get_ql_cache():
+    # Cache für die Kacheln aus give_rated_area_ql_arrays, wird beim ersten Aufruf im Prozess erstellt. Gespeichert
+    # werden die Datensätze einer Kachel als komprimierte Arrays mit je einer Zeile [lat, long, IRIRoughness]
+    global _ql_cache
 
+    if _ql_cache is None:
+        _ql_cache = Cache(QL_CACHE_PATH, table="ql_tiles", memory_entries=QL_CACHE_MEMORY_ENTRIES,
+                          max_entries=QL_CACHE_MAX_ENTRIES, ttl_seconds=QL_CACHE_TTL_SECONDS,
+                          encode=lambda area: zlib.compress(np.ascontiguousarray(area, dtype="<f8").tobytes()),
+                          decode=lambda data: np.frombuffer(zlib.decompress(data), dtype="<f8").reshape(-1, 3))
+    return _ql_cache
+
+
+@instrumented("ql")
+def give_rated_area_ql_arrays(point_a: Coordinate = Coordinate(-90, -180), point_b: Coordinate = Coordinate(90, 180),
+                              use_cache=True):
+    ################################################################################################################
+    # Eingabeparameter:     optional: Zwei beliebige Coordinate-Objekte (wie bei give_rated_area_ql)
+    #                       optional: Soll der lokale Kachel-Cache genutzt werden?
+    # Rückgabe:             Tupel aus drei numpy-Arrays: Breitengrade, Längengrade und IRIRoughness der Datensätze
+    #
+    # Beschreibung:
+    # Wie give_rated_area_ql, aber ohne für jeden Datensatz ein Coordinate-Objekt zu erstellen.
+    # Liegt das Rechteck vollständig außerhalb von Queensland (QL_EXTENT), wird die API gar nicht erst abgefragt.
+    #
+    # Mit Cache wird das Rechteck auf Kacheln (QL_TILE_DEGREES) erweitert. Jede Kachel wird nur einmal über die API
+    # abgefragt und dann komprimiert im Cache (siehe get_ql_cache) gespeichert, auch wenn sie leer ist. Fehlende
+    # nebeneinanderliegende Kacheln einer Kachelzeile werden dabei in einer Abfrage zusammengefasst. Überschneiden sich
+    # die Rechtecke von aufeinanderfolgenden Sektionen, werden die gemeinsamen Kacheln also nicht erneut abgefragt.
+    # Zum Schluss werden nur die Datensätze im eigentlichen Rechteck zurückgegeben.
+    ################################################################################################################
     lat_from = min(point_a.get_coordinates()[0], point_b.get_coordinates()[0])
     lat_to = max(point_a.get_coordinates()[0], point_b.get_coordinates()[0])
     long_to = max(point_a.get_coordinates()[1], point_b.get_coordinates()[1])
     long_from = min(point_a.get_coordinates()[1], point_b.get_coordinates()[1])
 
-    sql_request = 'SELECT "Latitude","Longitude","IRIRoughness" FROM "{}" ' \
-                  'WHERE "Latitude" BETWEEN {} AND {} ' \
-                  'AND "Longitude" BETWEEN {} AND {};' \
-        .format(resource_id, lat_from, lat_to, long_from, long_to)
+    (extent_lat_from, extent_lat_to), (extent_long_from, extent_long_to) = QL_EXTENT
+    query_lat_from, query_lat_to = max(lat_from, extent_lat_from), min(lat_to, extent_lat_to)
+    query_long_from, query_long_to = max(long_from, extent_long_from), min(long_to, extent_long_to)
+    if query_lat_from > query_lat_to or query_long_from > query_long_to:
+        return np.empty(0), np.empty(0), np.empty(0)
+
+    if not use_cache:
+        area = fetch_ql_area(lat_from, lat_to, long_from, long_to)
+    else:
+        cache = get_ql_cache()
+        tile_row_from, tile_row_to = [int(math.floor((lat + 90) / QL_TILE_DEGREES))
+                                      for lat in (query_lat_from, query_lat_to)]
+        tile_col_from, tile_col_to = [int(math.floor((long + 180) / QL_TILE_DEGREES))
+                                      for long in (query_long_from, query_long_to)]
+
+        tiles = []
+        for tile_row in range(tile_row_from, tile_row_to + 1):
+            row_tiles = {}
+            missing = []
+            for tile_col in range(tile_col_from, tile_col_to + 1):
+                tile = cache.get("{}|{}|{}".format(QL_RESOURCE_ID, tile_row, tile_col))
+                if tile is None:
+                    missing.append(tile_col)
+                else:
+                    row_tiles[tile_col] = tile
+
+            # Nebeneinanderliegende fehlende Kacheln werden zusammen abgefragt (etwas größer, damit durch Rundung
+            # keine Datensätze am Kachelrand verloren gehen) und danach auf die Kacheln aufgeteilt
+            runs = np.split(np.array(missing, dtype=np.int64), np.flatnonzero(np.diff(missing) != 1) + 1)
+            for run in (run for run in runs if len(run)):
+                fetched = fetch_ql_area(tile_row * QL_TILE_DEGREES - 90 - 1e-9,
+                                        (tile_row + 1) * QL_TILE_DEGREES - 90 + 1e-9,
+                                        run[0] * QL_TILE_DEGREES - 180 - 1e-9,
+                                        (run[-1] + 1) * QL_TILE_DEGREES - 180 + 1e-9)
+                fetched_rows = np.floor((fetched[:, 0] + 90) / QL_TILE_DEGREES).astype(np.int64)
+                fetched_cols = np.floor((fetched[:, 1] + 180) / QL_TILE_DEGREES).astype(np.int64)
+                for tile_col in run.tolist():
+                    tile = fetched[(fetched_rows == tile_row) & (fetched_cols == tile_col)]
+                    cache.set("{}|{}|{}".format(QL_RESOURCE_ID, tile_row, tile_col), tile)
+                    row_tiles[tile_col] = tile
+
+            tiles += [row_tiles[tile_col] for tile_col in sorted(row_tiles)]
+
+        area = np.concatenate(tiles) if tiles else np.empty((0, 3))
+
+    in_area = ((area[:, 0] >= lat_from) & (area[:, 0] <= lat_to) &
+               (area[:, 1] >= long_from) & (area[:, 1] <= long_to))
+    area = area[in_area]
+    _instrumentation.count("ql_rows", len(area))
+    return area[:, 0], area[:, 1], area[:, 2]
+
+
+# Speicherort der binären SmartRoadSense-Datenbank (eine .npy-Datei pro Spalte, siehe convert_database_srs)
+SRS_STORE_DIRECTORY = "internal/database_srs_store"
+SRS_STORE_COLUMNS = {"latitude": np.float64, "longitude": np.float64, "ppe": np.float64}
+SRS_STORE_FILES = list(SRS_STORE_COLUMNS) + ["row_order", "tile_keys", "tile_starts"]
+# Datei im Ordner der binären Datenbank mit dem Namen des aktuellen Versionsordners, siehe write_database_srs_store
+SRS_STORE_POINTER = "current"
+
+# Kantenlänge der Kacheln (in Grad), nach denen die Datensätze in der binären Datenbank sortiert werden
+SRS_TILE_DEGREES = 0.1
+SRS_TILE_COLUMN_COUNT = int(math.ceil(360 / SRS_TILE_DEGREES)) + 1
+
+# Blockgrößen beim Herunterladen der Zip-Datei (in Bytes) und beim Umwandeln der csv (in Zeilen), siehe
+# update_database_srs
+SRS_DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+SRS_CSV_CHUNK_ROWS = 1000000
+
+# Pro Prozess geladene (memory-mapped) SmartRoadSense-Datenbanken je Ordner, siehe load_database_srs
+_srs_stores = {}
+
+# Einmal pro Prozess eingelesene Quantile aus 'database_standardizer.csv', siehe load_database_standardizer
+_standardizer = None
+
+# Quantile für 'database_standardizer.csv' (siehe update_database_standardizer), Blockgröße in Werten und Anzahl der
+# Bereiche des Histogramms in streaming_quantiles
+STANDARDIZER_QUANTILES = [0.4, 0.8, 0.9, 0.95, 0.98, 0.99]
+STANDARDIZER_CHUNK_ROWS = 1000000
+STANDARDIZER_HISTOGRAM_BINS = 4096
+
+# Einstellungen des Geocoding-Caches (siehe give_coordinate_for_location), Gültigkeit in Sekunden
+GEOCODING_CACHE_PATH = "internal/cache.sqlite"
+GEOCODING_CACHE_TTL_SECONDS = 90 * 24 * 60 * 60
+GEOCODING_CACHE_MEMORY_ENTRIES = 1024
+GEOCODING_CACHE_MAX_ENTRIES = 100000
+_geocoding_cache = None
+
+# Einstellungen des Routen-Caches (siehe find_path), Gültigkeit in Sekunden
+ROUTE_CACHE_PATH = "internal/cache.sqlite"
+ROUTE_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+ROUTE_CACHE_MEMORY_ENTRIES = 64
+ROUTE_CACHE_MAX_ENTRIES = 10000
+ROUTE_CACHE_DENSIFIED = True
+_route_cache = None
+
+
+def update_database_srs(force=False, url=None, store_directory=None):
+    ################################################################################################################
+    # Eingabeparameter:     optional: Auch herunterladen, wenn sich die Datei nicht geändert hat?
+    #                       optional: URL der Zip-Datei (Standard: SRS_DOWNLOAD_URL) und Ordner der binären Datenbank
+    # Rückgabe:             True, wenn die binäre Datenbank neu erstellt wurde, False, wenn die Datei unverändert war
+    #
+    # Beschreibung:
+    # Lädt die gesamte Datenbank von der SmartRoadSence Website herunter und erstellt daraus die binäre Datenbank
+    # (siehe write_database_srs_store). Nötig geworden, da die API von SmartRoadSence nicht mehr funktioniert
+    #
+    # Die Zip-Datei wird in Blöcken von SRS_DOWNLOAD_CHUNK_BYTES direkt auf die Festplatte geschrieben, statt sie
+    # ganz im Arbeitsspeicher zu halten. Die csv darin wird nicht entpackt, sondern direkt aus der Zip-Datei in
+    # Blöcken gelesen und umgewandelt (siehe convert_database_srs). Danach wird die Zip-Datei gelöscht.
+    #
+    # Änderungserkennung: In 'metadata.json' im Ordner der binären Datenbank werden ETag, Last-Modified und der
+    # SHA-256-Hash der letzten Zip-Datei gespeichert. Beim nächsten Aufruf wird nur heruntergeladen, wenn der Server
+    # eine geänderte Datei meldet (If-None-Match / If-Modified-Since). Unterstützt der Server das nicht, wird nach
+    # dem Herunterladen über den Hash erkannt, dass sich nichts geändert hat, und die Umwandlung übersprungen.
+    ################################################################################################################
+    url = url or SRS_DOWNLOAD_URL
+    store_directory = store_directory or SRS_STORE_DIRECTORY
+    metadata_path = os.path.join(store_directory, "metadata.json")
+
+    metadata = {}
+    if not force and give_database_srs_version(store_directory) and os.path.exists(metadata_path):
+        with open(metadata_path, encoding="utf8") as file:
+            metadata = json.load(file)
+
+    headers = {}
+    if metadata.get("etag"):
+        headers["If-None-Match"] = metadata["etag"]
+    if metadata.get("last_modified"):
+        headers["If-Modified-Since"] = metadata["last_modified"]
+
+    response = get_http_client().get(url, headers=headers, stream=True, allow_redirects=True)
+    if response.status_code == 304:
+        response.close()
+        return False
+    response.raise_for_status()
+
+    # Die Zip-Datei wird neben der binären Datenbank abgelegt (eigene Datei pro Aufruf)
+    os.makedirs(store_directory, exist_ok=True)
+    download_path = None
+    try:
+        # Download file
+        content_hash = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=store_directory, prefix="open_data_", suffix=".zip.part",
+                                         delete=False) as file:
+            download_path = file.name
+            for block in response.iter_content(chunk_size=SRS_DOWNLOAD_CHUNK_BYTES):
+                file.write(block)
+                content_hash.update(block)
+        response.close()
+
+        new_metadata = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+                        "sha256": content_hash.hexdigest()}
+
+        # Convert file (ohne Entpacken)
+        if new_metadata["sha256"] != metadata.get("sha256"):
+            with ZipFile(download_path, "r") as archive:
+                csv_name = next(name for name in archive.namelist() if name.lower().endswith(".csv"))
+                with archive.open(csv_name) as csv_file:
+                    new_metadata["rows"] = convert_database_srs(csv_file, store_directory)
+        else:
+            new_metadata["rows"] = metadata.get("rows")
+    finally:
+        response.close()
+        if download_path is not None and os.path.exists(download_path):
+            os.remove(download_path)
 
-    response = requests.get(url + "?sql=" + sql_request)
-    response_filtered = response.json()["result"]["records"]
+    # Die Metadaten werden zuletzt (und ebenfalls über eine temporäre Datei) geschrieben, sodass sie nur zu einer
+    # vollständig geschriebenen Datenbank gehören
+    new_metadata["updated_at"] = time.time()
+    os.makedirs(store_directory, exist_ok=True)
+    with open(metadata_path + ".tmp", "w", encoding="utf8") as file:
+        json.dump(new_metadata, file)
+    os.replace(metadata_path + ".tmp", metadata_path)
 
-    coordinate_list = []
-    for c in response_filtered:
-        if float(c["IRIRoughness"]) > 0:
-            new_coordinate = Coordinate(c["Latitude"], c["Longitude"], c["IRIRoughness"], "ql")
-            coordinate_list.append(new_coordinate)
+    return new_metadata["sha256"] != metadata.get("sha256")
 
-    return coordinate_list
 
+def srs_tile_keys(latitudes, longitudes):
+    # Nummer der Kachel (Zeile * Spaltenanzahl + Spalte), in der die Punkte liegen
+    tile_rows = np.floor((np.asarray(latitudes) + 90) / SRS_TILE_DEGREES).astype(np.int64)
+    tile_cols = np.floor((np.asarray(longitudes) + 180) / SRS_TILE_DEGREES).astype(np.int64)
+    return tile_rows * SRS_TILE_COLUMN_COUNT + tile_cols
 
-def update_database_srs():
+
+def write_database_srs_store(latitudes, longitudes, ppes, store_directory=None):
     ################################################################################################################
-    # Lädt die gesamte Datenbank von der SmartRoadSence Website herunter, entpackt die Zip-Datei und verstaut die
-    # entpackte csv im Ordner interal als database_srs.csv
-    # Nötig geworden, da die API von SmartRoadSence nicht mehr funktioniert
+    # Eingabeparameter:     Breitengrade, Längengrade und ppe aller Datensätze (in ursprünglicher Reihenfolge)
+    #                       optional: Ordner, in den die binäre Datenbank geschrieben werden soll
+    # Rückgabe:             keine
+    #
+    # Beschreibung:
+    # Schreibt die binäre Datenbank, die von load_database_srs geladen wird. Die Datensätze werden dabei nach
+    # Kacheln von SRS_TILE_DEGREES x SRS_TILE_DEGREES Grad sortiert abgelegt, sodass alle Datensätze einer Kachel
+    # an einem Stück liegen. Zusätzlich werden gespeichert:
+    #   - "row_order": Position des Datensatzes in der ursprünglichen Reihenfolge
+    #   - "tile_keys": Nummern aller belegten Kacheln (aufsteigend)
+    #   - "tile_starts": Position des ersten Datensatzes jeder Kachel (plus Gesamtanzahl als letzter Eintrag)
+    # Alle Dateien werden in einen neuen Versionsordner geschrieben. Erst danach wird die Datei SRS_STORE_POINTER
+    # (über eine temporäre Datei) mit dem Namen dieses Ordners ersetzt, sodass ein Prozess, der gleichzeitig lädt,
+    # entweder nur alte oder nur neue Dateien sieht (siehe load_database_srs). Die vorherige Version bleibt für
+    # solche Prozesse erhalten, ältere Versionen werden gelöscht.
     ################################################################################################################
+    store_directory = store_directory or SRS_STORE_DIRECTORY
+
+    latitudes = np.asarray(latitudes, dtype=SRS_STORE_COLUMNS["latitude"])
+    longitudes = np.asarray(longitudes, dtype=SRS_STORE_COLUMNS["longitude"])
+    ppes = np.asarray(ppes, dtype=SRS_STORE_COLUMNS["ppe"])
+
+    # Datensätze ohne Position können in keinem Rechteck liegen
+    has_position = ~(np.isnan(latitudes) | np.isnan(longitudes))
+    row_order = np.flatnonzero(has_position)
+
+    keys = srs_tile_keys(latitudes[row_order], longitudes[row_order])
+    sorting = np.argsort(keys, kind="stable")
+    row_order, keys = row_order[sorting], keys[sorting]
+    tile_keys, tile_starts = np.unique(keys, return_index=True)
+
+    # Die Spalten werden einzeln sortiert und geschrieben, sodass (bei memory-mapped Eingaben, siehe
+    # convert_database_srs) immer nur eine sortierte Spalte im Arbeitsspeicher liegt
+    files = {
+        "latitude": lambda: latitudes[row_order],
+        "longitude": lambda: longitudes[row_order],
+        "ppe": lambda: ppes[row_order],
+        "row_order": lambda: row_order.astype(np.int64),
+        "tile_keys": lambda: tile_keys.astype(np.int64),
+        "tile_starts": lambda: np.append(tile_starts, len(keys)).astype(np.int64)
+    }
+
+    previous_version = give_database_srs_version(store_directory)
+    version = "version_{}_{}".format(time.time_ns(), os.getpid())
+    os.makedirs(os.path.join(store_directory, version))
+    for name, give_values in files.items():
+        np.save(os.path.join(store_directory, version, name + ".npy"), give_values())
+
+    pointer_path = os.path.join(store_directory, SRS_STORE_POINTER)
+    with open("{}.{}.tmp".format(pointer_path, os.getpid()), "w", encoding="utf8") as file:
+        file.write(version)
+    os.replace("{}.{}.tmp".format(pointer_path, os.getpid()), pointer_path)
 
-    # Download file
-    r = requests.get('http://www.smartroadsense.it/open_data.zip', allow_redirects=True)
-    temp_file = open("internal/temp", 'wb')
-    temp_file.write(r.content)
+    for name in os.listdir(store_directory):
+        if name.startswith("version_") and name not in (version, previous_version):
+            shutil.rmtree(os.path.join(store_directory, name), ignore_errors=True)
 
-    # extract file
-    ZipFile("internal/temp", 'r').extractall()
-    os.remove("internal/temp")
-    os.rename("open_data.csv", "internal/database_srs.csv")
+    _srs_stores.pop(store_directory, None)
+    # Geladene Raster werden beim nächsten Aufruf von load_rating_raster erneut geprüft
+    _rating_rasters.clear()
 
 
-def give_rated_area_srs(point_a: Coordinate = Coordinate(-90, -180), point_b: Coordinate = Coordinate(90, 180)):
+def convert_database_srs(csv_path="internal/database_srs.csv", store_directory=None):
     ################################################################################################################
-    # Eingabeparameter:     optional: Zwei beliebige Coordinate-Objekte
-    #                       Werden diese nicht gegeben, so liefert die Methode alle Datensätze zurück
-    # Rückgabe:             Liste von Coordinate-Objekten mit rohen Ratings und Datenquelle 'srs'
+    # Eingabeparameter:     optional: Pfad zur SmartRoadSense-csv (oder bereits geöffnete Datei, z.B. aus der
+    #                       Zip-Datei) und Ordner, in den die binäre Datenbank soll
+    # Rückgabe:             Anzahl der übernommenen Datensätze
+    #
+    # Beschreibung:
+    # Einmaliger Umwandlungsschritt: Aus der csv werden nur die Spalten latitude, longitude und ppe gelesen
+    # (mit festem Datentyp, siehe SRS_STORE_COLUMNS) und über write_database_srs_store als binäre Datenbank
+    # gespeichert. Diese kann danach von load_database_srs ohne erneutes Parsen memory-mapped werden.
+    # Die csv wird in Blöcken von SRS_CSV_CHUNK_ROWS Zeilen gelesen.
+    # Einträge mit unplausiblen Werten (ppe < 0.0000001) werden, wie in give_rated_area_srs, schon hier verworfen.
+    ################################################################################################################
+
+    # Jeder Block wird sofort spaltenweise an eine temporäre Datei im Ordner der binären Datenbank angehängt. Die
+    # Spalten werden danach memory-mapped an write_database_srs_store übergeben, liegen also nie als Ganzes (und
+    # nicht doppelt, wie beim Aneinanderhängen der Blöcke) im Arbeitsspeicher
+    store_directory = store_directory or SRS_STORE_DIRECTORY
+    os.makedirs(store_directory, exist_ok=True)
+    spool_paths = {}
+    try:
+        rows, spools = 0, {}
+        with ExitStack() as stack:
+            for name in SRS_STORE_COLUMNS:
+                spools[name] = stack.enter_context(tempfile.NamedTemporaryFile(
+                    dir=store_directory, prefix="convert_{}_".format(name), suffix=".tmp", delete=False))
+                spool_paths[name] = spools[name].name
+            for chunk in pd.read_csv(csv_path, usecols=list(SRS_STORE_COLUMNS), dtype=SRS_STORE_COLUMNS,
+                                     chunksize=SRS_CSV_CHUNK_ROWS):
+                chunk = chunk[~(chunk.ppe < 0.0000001)]
+                for name, dtype in SRS_STORE_COLUMNS.items():
+                    spools[name].write(np.ascontiguousarray(chunk[name].values, dtype=dtype).tobytes())
+                rows += len(chunk)
+
+        columns = {name: np.memmap(spool_paths[name], dtype=dtype, mode="r") if rows else np.empty(0, dtype=dtype)
+                   for name, dtype in SRS_STORE_COLUMNS.items()}
+        write_database_srs_store(columns["latitude"], columns["longitude"], columns["ppe"], store_directory)
+        del columns
+    finally:
+        for spool_path in spool_paths.values():
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+    return rows
+
+
+def give_database_srs_version(store_directory=None):
+    # Name des aktuellen Versionsordners der binären Datenbank (siehe write_database_srs_store), None, wenn es noch
+    # keine vollständig geschriebene Version gibt. Jede geschriebene Datenbank bekommt einen neuen Namen, er
+    # kennzeichnet also ihren Inhalt (siehe load_rating_raster)
+    pointer_path = os.path.join(store_directory or SRS_STORE_DIRECTORY, SRS_STORE_POINTER)
+    if not os.path.exists(pointer_path):
+        return None
+    with open(pointer_path, encoding="utf8") as file:
+        return file.read().strip() or None
+
+
+def load_database_srs(store_directory=None):
+    ################################################################################################################
+    # Eingabeparameter:     optional: Ordner der binären Datenbank
+    # Rückgabe:             dict mit allen Dateien der binären Datenbank (siehe write_database_srs_store) als
+    #                       (memory-mapped) numpy-Arrays, unter "version" der Name des geladenen Versionsordners
+    #
+    # Beschreibung:
+    # Die Dateien werden nur beim ersten Aufruf im Prozess geöffnet und dann in '_srs_stores' vorgehalten. Durch das
+    # memory-mapping liest das Betriebssystem nur die Teile der Dateien, die tatsächlich gebraucht werden.
+    # Alle Dateien werden aus dem Versionsordner gelesen, auf den SRS_STORE_POINTER beim Laden zeigt, auch wenn
+    # währenddessen eine neue Version geschrieben wird.
+    # Fehlt die binäre Datenbank, wird sie aus der csv erstellt, fehlt auch die csv, wird sie direkt aus der
+    # heruntergeladenen Zip-Datei erstellt (siehe update_database_srs).
+    ################################################################################################################
+    store_directory = store_directory or SRS_STORE_DIRECTORY
+
+    if store_directory not in _srs_stores:
+        if give_database_srs_version(store_directory) is None:
+            if not os.path.exists("internal/database_srs.csv"):
+                update_database_srs(force=True, store_directory=store_directory)
+            else:
+                convert_database_srs(store_directory=store_directory)
+        while True:
+            version = give_database_srs_version(store_directory)
+            try:
+                store = {name: np.load(os.path.join(store_directory, version, name + ".npy"), mmap_mode="r")
+                         for name in SRS_STORE_FILES}
+                break
+            except FileNotFoundError:
+                # Version wurde währenddessen durch zwei neuere ersetzt und gelöscht
+                if give_database_srs_version(store_directory) == version:
+                    raise
+        store["version"] = version
+        _srs_stores[store_directory] = store
+
+    return _srs_stores[store_directory]
+
+
+@instrumented("srs")
+def give_rated_area_srs_arrays(point_a: Coordinate = Coordinate(-90, -180),
+                               point_b: Coordinate = Coordinate(90, 180), store=None, standardised=False):
+    ################################################################################################################
+    # Eingabeparameter:     optional: Zwei beliebige Coordinate-Objekte (wie bei give_rated_area_srs)
+    #                       optional: bereits geladene Datenbank (Standard: load_database_srs())
+    #                       optional: Sollen auch die standardisierten Ratings zurückgegeben werden?
+    # Rückgabe:             Tupel aus drei numpy-Arrays: Breitengrade, Längengrade und ppe der Datensätze
+    #                       (bei standardised=True als viertes Array die standardisierten Ratings)
     #
     # Beschreibung:
-    # Die Methode liefert die Datensätze aus der unter database-srs.csv gespeicherten SmartRoadSence-Datenbank in einem
-    # von zwei Punkten aufgespannten Rechteck zurück.
-    # Dazu wird zunächst der maximale und minimale Längen- & Breitengrad ermittelt.
-    # Dann wird versucht, die database_srs.csv im Ordner internal zu öffnen.
-    # Ist diese nicht vorhanden oder kann nicht geöffnet werden, wird der resultierende IOError behandelt und über
-    # den Aufruf von update_database_srs eine neue csv erstellt. Danach wird fortgefahren
-    # Nun werden die Daten in die variable data_filtered gespeichert, die zwischen den max. und mins. bei Breiten- &
-    # Längengrad liegen
+    # Wie give_rated_area_srs, aber ohne für jeden Datensatz ein Coordinate-Objekt zu erstellen.
+    # Es werden nur die Kacheln der Datenbank gelesen, die das Rechteck überschneiden: Für jede Kachelzeile liegen
+    # die Kacheln zwischen der westlichsten und östlichsten Spalte an einem Stück und werden über eine binäre Suche
+    # in 'tile_keys' gefunden. Nur diese Datensätze werden dann genau mit dem Rechteck verglichen.
+    # Zum Schluss werden die Treffer wieder in die ursprüngliche Reihenfolge der csv gebracht.
     #
-    # Für jeden Eintrag in der Antwort wird nun ein Coordinate Objekt erstellt, welches in die coordinate_list
-    # hinzugefügt wird, solange die ppe größer gleich 0.0000001 ist.
-    # Einträge mit unplausiblen Werten wie ppe = 0 werden also verworfen.
+    # Die standardisierten Ratings werden beim ersten Bedarf für die gesamte Datenbank in einem Durchlauf berechnet
+    # (siehe standardize_ratings) und als zusätzliche Spalte im Arbeitsspeicher vorgehalten.
     ################################################################################################################
 
     lat_from = min(point_a.get_coordinates()[0], point_b.get_coordinates()[0])
@@ -210,58 +1555,171 @@ def give_rated_area_srs(point_a: Coordinate = Coordinate(-90, -180), point_b: Co
     long_to = max(point_a.get_coordinates()[1], point_b.get_coordinates()[1])
     long_from = min(point_a.get_coordinates()[1], point_b.get_coordinates()[1])
 
-    try:
-        data = pd.read_csv("internal/database_srs.csv")[["latitude", "longitude", "ppe"]]
-    except IOError:
-        update_database_srs()
-        data = pd.read_csv("internal/database_srs.csv")[["latitude", "longitude", "ppe"]]
+    if store is None:
+        store = load_database_srs()
+
+    selected = give_area_indices_srs(store, lat_from, lat_to, long_from, long_to)
+    _instrumentation.count("srs_rows", len(selected))
+
+    if not standardised:
+        return store["latitude"][selected], store["longitude"][selected], store["ppe"][selected]
+
+    return store["latitude"][selected], store["longitude"][selected], store["ppe"][selected], \
+        give_standardised_ratings_srs(store)[selected]
+
+
+def give_area_indices_srs(store, lat_from, lat_to, long_from, long_to):
+    # Positionen der Datensätze im Rechteck in der binären Datenbank, in der ursprünglichen Reihenfolge der csv
+    # (siehe give_rated_area_srs_arrays)
+    (tile_row_from, tile_row_to), (tile_col_from, tile_col_to) = \
+        np.divmod(srs_tile_keys([max(lat_from, -90), min(lat_to, 90)],
+                                [max(long_from, -180), min(long_to, 180)]), SRS_TILE_COLUMN_COUNT)
+
+    row_keys = np.arange(tile_row_from, tile_row_to + 1) * SRS_TILE_COLUMN_COUNT
+    first_tiles = np.searchsorted(store["tile_keys"], row_keys + tile_col_from, side="left")
+    last_tiles = np.searchsorted(store["tile_keys"], row_keys + tile_col_to, side="right")
+    starts, ends = store["tile_starts"][first_tiles], store["tile_starts"][last_tiles]
+
+    parts = []
+    for start, end in zip(starts, ends):
+        if start == end:
+            continue
+        latitude, longitude = store["latitude"][start:end], store["longitude"][start:end]
+        in_area = ((latitude >= lat_from) &
+                   (latitude <= lat_to) &
+                   (longitude >= long_from) &
+                   (longitude <= long_to))
+        parts.append(np.flatnonzero(in_area) + start)
+
+    selected = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+    return selected[np.argsort(store["row_order"][selected], kind="stable")]
+
+
+def give_standardised_ratings_srs(store):
+    # Berechnet die standardisierten Ratings der gesamten Datenbank beim ersten Bedarf und hält sie im Store vor
+    if "rating_standardised" not in store:
+        store["rating_standardised"] = standardize_ratings(store["ppe"], "srs").astype(np.int8)
+    return store["rating_standardised"]
+
+
+def give_rated_area_srs(point_a: Coordinate = Coordinate(-90, -180), point_b: Coordinate = Coordinate(90, 180),
+                        standardised=False):
+    ################################################################################################################
+    # Eingabeparameter:     optional: Zwei beliebige Coordinate-Objekte
+    #                       Werden diese nicht gegeben, so liefert die Methode alle Datensätze zurück
+    #                       optional: Sollen die (vorberechneten) standardisierten Ratings mit übernommen werden?
+    # Rückgabe:             Liste von Coordinate-Objekten mit rohen Ratings und Datenquelle 'srs'
+    #
+    # Beschreibung:
+    # Die Methode liefert die Datensätze aus der SmartRoadSence-Datenbank in einem von zwei Punkten aufgespannten
+    # Rechteck zurück.
+    # Die eigentliche Abfrage übernimmt give_rated_area_srs_arrays auf der binären Datenbank (siehe
+    # load_database_srs). Diese wird einmal pro Prozess geöffnet, statt bei jedem Aufruf die gesamte
+    # database_srs.csv neu einzulesen. Fehlt sie, wird sie aus der csv erstellt bzw. über update_database_srs
+    # neu heruntergeladen.
+    #
+    # Für jeden gefundenen Datensatz wird nun ein Coordinate Objekt erstellt, welches in die coordinate_list
+    # hinzugefügt wird. Einträge mit unplausiblen Werten wie ppe = 0 wurden schon beim Erstellen der binären
+    # Datenbank verworfen.
+    ################################################################################################################
+
+    if not standardised:
+        latitudes, longitudes, ppes = give_rated_area_srs_arrays(point_a, point_b)
 
-    data_filtered = data[(data.latitude >= lat_from) &
-                         (data.latitude <= lat_to) &
-                         (data.longitude >= long_from) &
-                         (data.longitude <= long_to)]
+        coordinate_list = []
+        for lat, long, ppe in zip(latitudes.tolist(), longitudes.tolist(), ppes.tolist()):
+            coordinate_list.append(Coordinate(lat, long, ppe, "srs"))
+        return coordinate_list
+
+    latitudes, longitudes, ppes, ratings = give_rated_area_srs_arrays(point_a, point_b, standardised=True)
 
     coordinate_list = []
-    for c in data_filtered.values:
-        if c[2] < 0.0000001:
-            pass
-        else:
-            new_coordinate = Coordinate(c[0], c[1], c[2], "srs")
-            coordinate_list.append(new_coordinate)
+    for lat, long, ppe, rating in zip(latitudes.tolist(), longitudes.tolist(), ppes.tolist(), ratings.tolist()):
+        new_coordinate = Coordinate(lat, long, ppe, "srs")
+        new_coordinate.set_rating(rating)
+        coordinate_list.append(new_coordinate)
     return coordinate_list
 
 
-def give_coordinate_for_location(location):
+def get_geocoding_cache():
+    # Cache für give_coordinate_for_location, wird beim ersten Aufruf im Prozess erstellt
+    global _geocoding_cache
+
+    if _geocoding_cache is None:
+        _geocoding_cache = Cache(GEOCODING_CACHE_PATH, table="geocoding",
+                                 memory_entries=GEOCODING_CACHE_MEMORY_ENTRIES,
+                                 max_entries=GEOCODING_CACHE_MAX_ENTRIES, ttl_seconds=GEOCODING_CACHE_TTL_SECONDS)
+    return _geocoding_cache
+
+
+@instrumented("geocoding")
+def give_coordinate_for_location(location, locale="en", use_cache=True):
     ################################################################################################################
     # Eingabeparameter:     Name eines Ortes, als Datentyp wird str angenommen
+    #                       optional: Sprache der Abfrage, Soll der Cache genutzt werden?
     # Rückgabe:             Coordinte Objekt, mit dem zu den Ort gehörenden Breiten- und Längengrad
     #
     # Beschreibung:
     # Diese Methode fragt für einen Ortsnamen die dazugehörigen Koordinaten über die GraphHopper API ab ('geocoding')
     # unter 'parameters' kann der API-Key geändert werden
+    #
+    # Bereits abgefragte Orte werden im Geocoding-Cache (siehe get_geocoding_cache) gespeichert, sodass z.B. "Verona
+    # Italy" nur einmal über die API abgefragt wird. Als Schlüssel dient der Ortsname in Kleinbuchstaben ohne
+    # überflüssige Leerzeichen zusammen mit der Sprache.
     ################################################################################################################
 
+    cache_key = "{}|{}".format(" ".join(str(location).lower().split()), locale)
+    if use_cache:
+        cached = get_geocoding_cache().get(cache_key)
+        if cached is not None:
+            return Coordinate(cached[0], cached[1])
+
     parameters = {
-        "key": GRAPHHOPPER_API_KEY,
+        "key": get_graphhopper_api_key(),
         "q": str(location),
-        "locale": "en",
+        "locale": locale,
         "limit": "1"
     }
 
-    request = requests.get("https://graphhopper.com/api/1/geocode", params=parameters)
+    request = get_http_client().get(GRAPHHOPPER_URL + "/geocode", params=parameters)
 
     lat = request.json()["hits"][0]["point"]["lat"]
     long = request.json()["hits"][0]["point"]["lng"]
 
+    if use_cache:
+        get_geocoding_cache().set(cache_key, [lat, long])
+
     return Coordinate(lat, long)
 
 
-def find_path(start: Coordinate, destination: Coordinate, maximum_point_distance=0.11, splitter=380):
+def get_route_cache():
+    # Cache für find_path, wird beim ersten Aufruf im Prozess erstellt. Gespeichert werden die Wegpunkte als
+    # komprimierte Arrays mit je einer Zeile [lat, long]
+    global _route_cache
+
+    if _route_cache is None:
+        _route_cache = Cache(ROUTE_CACHE_PATH, table="routes", memory_entries=ROUTE_CACHE_MEMORY_ENTRIES,
+                             max_entries=ROUTE_CACHE_MAX_ENTRIES, ttl_seconds=ROUTE_CACHE_TTL_SECONDS,
+                             encode=lambda points: zlib.compress(np.ascontiguousarray(points, dtype="<f8").tobytes()),
+                             decode=lambda data: np.frombuffer(zlib.decompress(data), dtype="<f8").reshape(-1, 2))
+    return _route_cache
+
+
+def route_cache_key(start, destination, parameters):
+    # Schlüssel aus gerundetem Start- und Zielpunkt (5 Nachkommastellen, ca. 1 m) und den Routing-Parametern
+    options = "&".join("{}={}".format(name, value) for name, value in sorted(parameters.items()) if name != "key")
+    return "{:.5f},{:.5f}|{:.5f},{:.5f}|{}".format(start.lat, start.long, destination.lat, destination.long, options)
+
+
+@instrumented("routing")
+def find_path(start: Coordinate, destination: Coordinate, maximum_point_distance=0.11, splitter=380, vehicle="car",
+              use_cache=True):
     ################################################################################################################
     # Eingabeparameter:     2x Coordinate-Objekte (Start- und Zielpunkt)
     #                       optional: Maximaler Abstand, den zwei Wegpunkte zueinander haben dürfen
     #                       splitter: s. Beschreibung
-    # Rückgabe:             Liste, welche weitere Listen mit Coordinate-Objekten enthält.
+    #                       optional: Fahrzeug für das Routing, Soll der Routen-Cache genutzt werden?
+    # Rückgabe:             Liste, welche die Sektionen der Route als RatedRoute-Objekte enthält.
     #
     # Beschreibung:
     # Diese Methode besteht aus drei Teilen
@@ -272,18 +1730,23 @@ def find_path(start: Coordinate, destination: Coordinate, maximum_point_distance
     #       Falls keine Route gefunden werden kann, tritt beim Filtern der Ergebnisse ein Fehler auf, da
     #       eine nicht vorhandene Route natürlich auch keine "points" und "coordinates" enthält.
     #       Falls das passiert wird ein KeyError ausgelöst, der dem Nutzer angibt, dass keine Route gefunden wurde.
-    #       Sonst werden für jedes Ergebnis ein Coordinate-Objekt erstellt und der Liste 'coordinates' hinzugefügt.
+    #       Sonst werden die Ergebnisse spaltenweise in eine RatedRoute übernommen.
+    #       Die Wegpunkte werden im Routen-Cache (siehe get_route_cache) gespeichert. Schlüssel sind der gerundete
+    #       Start- und Zielpunkt sowie die Routing-Parameter. Wird dieselbe Strecke erneut abgefragt, wird die API nicht
+    #       mehr aufgerufen.
     #
     # - Teil 2: Zwischenpunkte hinzufügen falls nötig und gewollt
     #       Falls 'maximum_point_distance' = 0, None oder False in die Methode gegeben wurde, passiert in diesem Schritt
     #       nichts.
-    #       Sonst wird hier so lange die Methode 'interpoint' aufgerufen, bis der maximale Abstand zwischen zwei
-    #       Wegpunkten kleiner ist als 'maximum_point_distance'.
+    #       Sonst werden über 'densify_route' in einem Durchlauf so viele gleichmäßig verteilte Zwischenpunkte
+    #       eingefügt, dass der maximale Abstand zwischen zwei Wegpunkten kleiner ist als 'maximum_point_distance'.
+    #       Falls ROUTE_CACHE_DENSIFIED gesetzt ist, wird auch dieses Ergebnis (je 'maximum_point_distance') im
+    #       Routen-Cache gespeichert, sodass bei einer erneuten Abfrage auch Teil 2 übersprungen wird.
     #
     # - Teil 3: Aufsplitten des paths in Sektionen
     #       Falls 'splitter' = None in die Methode gegeben wurde, ist 'path' das einzige Routenstück und wird auch
-    #       so (als einzelne Liste in einer Liste(('[path]')zurückgegeben
-    #       Sonst wird 'path', dass ja eine Liste von Coordinate-Objekten beinhaltet, die die Route bilden, in
+    #       so (als einzelne RatedRoute in einer Liste(('[path]')zurückgegeben
+    #       Sonst wird 'path', dass ja eine RatedRoute ist, die die Route bildet, in
     #       mehrere Teilsektionen unterteilt. Das dient dazu, dass die Methoden, die später mit der Rückgabe aus dieser
     #       Methode rechnen müssen, nicht mit zu großen Strecken gleichzeitig rechnen müssen, sondern Stückchen nach
     #       Stückchen berechnen können. (v.a. da bei zunehmender auf einmal verarbeiteter Streckenlänge die Berechnungs-
@@ -304,82 +1767,139 @@ def find_path(start: Coordinate, destination: Coordinate, maximum_point_distance
     endpoint = "{}, {}".format(destination.get_coordinates()[0], destination.get_coordinates()[1])
 
     parameters = {
-        "key": GRAPHHOPPER_API_KEY,
+        "key": get_graphhopper_api_key(),
         "type": "json",
-        "vehicle": "car",
+        "vehicle": vehicle,
         "points_encoded": "false",
         "instructions": "false"
     }
-    url = "https://graphhopper.com/api/1/route"
-    url_with_points = "{}?point={}&point={}".format(url, startpoint, endpoint)
-    response = requests.get(url_with_points, params=parameters)
 
-    try:
-        response_filtered = response.json()["paths"][0]["points"]["coordinates"]
+    densify_wanted = not (maximum_point_distance is None or maximum_point_distance is False or
+                          maximum_point_distance == 0)
+    cache_key = route_cache_key(start, destination, parameters)
+    densified_cache_key = "{}|maximum_point_distance={!r}".format(cache_key, float(maximum_point_distance or 0))
+
+    path = None
+    if use_cache and densify_wanted and ROUTE_CACHE_DENSIFIED:
+        cached = get_route_cache().get(densified_cache_key)
+        if cached is not None:
+            path = RatedRoute(lat=cached[:, 0], long=cached[:, 1])
+
+    if path is None:
+        coordinates = get_route_cache().get(cache_key) if use_cache else None
+
+        if coordinates is None:
+            url = GRAPHHOPPER_URL + "/route"
+            url_with_points = "{}?point={}&point={}".format(url, startpoint, endpoint)
+            response = get_http_client().get(url_with_points, params=parameters)
+
+            try:
+                response_filtered = response.json()["paths"][0]["points"]["coordinates"]
+            # zu Teil 1:
+            except KeyError:
+                raise KeyError("Zwischen {} und {} konnte keine Route gefunden werden, Eingabe überprüfen"
+                               .format([startpoint], [endpoint]))
 
-        coordinates = []
+            # GraphHopper liefert [Längengrad, Breitengrad]
+            coordinates = np.array(response_filtered, dtype=float).reshape(-1, 2)[:, ::-1]
+            if use_cache:
+                get_route_cache().set(cache_key, coordinates)
 
-        for c in response_filtered:
-            coordinates.append(Coordinate(c[1], c[0]))
+        path = RatedRoute(lat=coordinates[:, 0], long=coordinates[:, 1])
 
         # Teil 2: Zwischenpunkte hinzufügen falls nötig und gewollt
 
-        if maximum_point_distance is None or maximum_point_distance is False or maximum_point_distance == 0:
-            path = coordinates.copy
+        if densify_wanted:
+            path = densify_route(path, maximum_point_distance)
+            if use_cache and ROUTE_CACHE_DENSIFIED:
+                get_route_cache().set(densified_cache_key, path.get_coordinates())
 
-        else:
-            all_distances_above_min = False
-            path = coordinates.copy()
-            while all_distances_above_min is False:
-                temp_1 = interpoint(path, maximum_point_distance)
-                path = temp_1
-                i = 0
-                all_distances_above_min = True
-                while i < (len(path) - 1):
-                    if path[i].calc_distance_to_other_point(path[i + 1]) > maximum_point_distance:
-                        all_distances_above_min = False
-                    i = i + 1
-
-        # Teil 3: Aufsplitten des paths in Sektionen
-
-        if splitter is None:
-            return [path]
-        else:
-            splitted = []
-            line = []
-            counter_in_line = 0
-            line_count = 0
-            for i in path:
-                if counter_in_line < splitter:
-                    line.append(i)
-                    counter_in_line += 1
+    # Teil 3: Aufsplitten des paths in Sektionen
 
-                else:
-                    counter_in_line = 0
-                    line_count += 1
-                    splitted.append(line)
-                    line = []
-
-                    line.append(i)
-                    counter_in_line += 1
-                    line_count += 1
-
-            if len(splitted) < len(path) / splitter:
-                if len(line) == splitter:
-                    splitted.append(line)
-                else:
-                    if len(splitted) != 0:
-                        for e in line:
-                            splitted[-1].append(e)
-                    else:
-                        splitted.append(line)
-                line = []
+    return split_route(path, splitter)
+
+
+def split_route(path, splitter=380):
+    # Teil 3 von find_path: Teilt die RatedRoute in Sektionen mit 'splitter' Wegpunkten (die letzte Sektion enthält
+    # zusätzlich den Rest), bei splitter=None bleibt sie ein einziges Stück
+    if splitter is None:
+        return [path]
+    elif len(path) == 0:
+        return []
+    else:
+        section_count = max(1, len(path) // splitter)
+        section_starts = [i * splitter for i in range(section_count)] + [len(path)]
+        return [path[section_starts[i]:section_starts[i + 1]] for i in range(section_count)]
+
+
+def fetch_routes_concurrently(location_pairs, maximum_point_distance=0.11, splitter=380, max_workers=None,
+                              requests_per_second=None, measurements=None):
+    ################################################################################################################
+    # Eingabeparameter:     Liste von (Start, Ziel)-Paaren als Ortsnamen (wie in 'to_process.csv')
+    #                       optional: 'maximum_point_distance' und 'splitter' wie bei find_path
+    #                       optional: Anzahl gleichzeitiger Abfragen (Standard: FETCH_MAX_WORKERS) und maximale Anzahl
+    #                       GraphHopper-Anfragen pro Sekunde (nur während dieses Aufrufs, danach gilt wieder die
+    #                       Begrenzung des HttpClients, Standard: GRAPHHOPPER_REQUESTS_PER_SECOND, siehe
+    #                       get_http_client)
+    #                       optional: Liste, an die bei eingeschalteter Instrumentierung pro Paar ein Measurement
+    #                       (Geocoding und Routing) angehängt wird. Jeder Ort und jede Route wird nur einmal abgefragt
+    #                       und nur beim ersten Paar gezählt, das sie verwendet.
+    # Rückgabe:             Liste mit einem Tupel pro Paar, in derselben Reihenfolge wie die Eingabe:
+    #                       (Start-Coordinate, Ziel-Coordinate, Sektionen aus find_path, Fehlermeldung)
+    #                       Bei einem Fehler sind die fehlenden Werte None, sonst ist die Fehlermeldung None
+    #
+    # Beschreibung:
+    # Statt alle Zeilen nacheinander abzufragen, werden zuerst alle unterschiedlichen Ortsnamen und danach alle
+    # unterschiedlichen Routen gleichzeitig in einem Thread-Pool abgefragt. Damit die Quota von GraphHopper nicht
+    # überschritten wird, wird die Anzahl der Anfragen pro Sekunde über den HttpClient begrenzt (siehe TokenBucket).
+    # Fehler (z.B. "keine Route gefunden") werden pro Zeile zurückgegeben, statt den ganzen Batch abzubrechen.
+    ################################################################################################################
+    location_pairs = [tuple(pair) for pair in location_pairs]
+    max_workers = max_workers or FETCH_MAX_WORKERS
+    if requests_per_second:
+        rate_limit = get_http_client().rate_limit(GRAPHHOPPER_URL, requests_per_second)
+    else:
+        rate_limit = nullcontext()
+
+    def call(function, *arguments):
+        with _instrumentation.record() as measurement:
+            try:
+                return function(*arguments), None, measurement
+            except Exception as e:
+                return None, "{}: {}".format(type(e).__name__, e), measurement
+
+    with rate_limit, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        locations = list(dict.fromkeys(location for pair in location_pairs for location in pair))
+        geocoded = dict(zip(locations, executor.map(lambda location: call(give_coordinate_for_location, location),
+                                                    locations)))
+
+        routable = list(dict.fromkeys(pair for pair in location_pairs
+                                      if geocoded[pair[0]][1] is None and geocoded[pair[1]][1] is None))
+        routes = dict(zip(routable, executor.map(
+            lambda pair: call(find_path, geocoded[pair[0]][0], geocoded[pair[1]][0], maximum_point_distance,
+                              splitter), routable)))
+
+    results = []
+    counted = set()
+    for pair in location_pairs:
+        (start, start_error, _), (destination, destination_error, _) = geocoded[pair[0]], geocoded[pair[1]]
+        if start_error is not None or destination_error is not None:
+            results.append((start, destination, None, "Geocoding fehlgeschlagen: {}".format(
+                start_error or destination_error)))
+        else:
+            paths, route_error, _ = routes[pair]
+            results.append((start, destination, paths, route_error))
 
-            return splitted
-    # zu Teil 1:
-    except KeyError:
-        raise KeyError("Zwischen {} und {} konnte keine Route gefunden werden, Eingabe überprüfen"
-                       .format([startpoint], [endpoint]))
+        if measurements is not None and _instrumentation.enabled:
+            measurement = Measurement()
+            for key, (_, _, fetched) in [(("location", pair[0]), geocoded[pair[0]]),
+                                         (("location", pair[1]), geocoded[pair[1]]),
+                                         (("route", pair), routes.get(pair, (None, None, None)))]:
+                if fetched is not None and key not in counted:
+                    measurement.merge(fetched)
+                    counted.add(key)
+            measurements.append(measurement)
+    return results
 
 
 # Verarbeitung
@@ -394,9 +1914,10 @@ def update_database_standardizer():
     # welche von der Methode 'standardized' genutzt werden, um die Daten vergleichbar zu machen (s. dort für weitere
     # Erklärungen)
     #
-    # Zunächst werden dazu die gesamten Datensätze in Form einer List von Coordinate-Objekten abgerufen und gespeichert.
-    # Nun wird für jede dieser Coordinate-Objekte das Rating ausgelesen und in neue Listen abgelegt.
-    # Diese Listen werden nun ausgewertet und die Quantile 0.4, 0.8, 0.9, 0.95, 0.98 und 0.99 werden ermittelt
+    # Zunächst werden dazu die rohen Ratings beider Datensätze in Blöcken gelesen: SmartRoadSense aus der binären
+    # Datenbank, Queensland seitenweise über die API (siehe give_ratings_ql_pages, zwischengespeichert in einer
+    # temporären Datei). Aus diesen Blöcken werden die Quantile 0.4, 0.8, 0.9, 0.95, 0.98 und 0.99 exakt ermittelt
+    # (siehe streaming_quantiles), ohne alle Ratings gleichzeitig im Arbeitsspeicher zu halten
     # Diese Werte orientieren sich an der Einteilung von smartroadsence. Die Legende auf der Website unterteilt in
     # 6 Kategorien:
     #   - Grün = ppe > 0.3
@@ -420,34 +1941,149 @@ def update_database_standardizer():
     # Eingangsparameter:    keine
     # Rückgabe:             keine
     ################################################################################################################
-    srs_coordinates = give_rated_area_srs()
-    ql_coordinates = give_rated_area_ql()
-    srs_raw_ratings = []
-    ql_raw_ratings = []
+    global _standardizer
+
+    store = load_database_srs()
+    srs_ppes = store["ppe"]
 
-    for coordinate in srs_coordinates:
-        srs_raw_ratings.append(coordinate.get_rating(standardised_wanted=False))
-    for coordinate in ql_coordinates:
-        ql_raw_ratings.append(coordinate.get_rating(standardised_wanted=False))
+    def srs_chunks():
+        for i in range(0, len(srs_ppes), STANDARDIZER_CHUNK_ROWS):
+            yield np.asarray(srs_ppes[i:i + STANDARDIZER_CHUNK_ROWS])
+
+    # Eigene temporäre Datei pro Aufruf, damit sich gleichzeitig laufende Aktualisierungen (z.B. pricing_service.py
+    # und ein Batch-Lauf) nicht gegenseitig überschreiben
+    os.makedirs("internal", exist_ok=True)
+    spool_path = None
+    try:
+        with tempfile.NamedTemporaryFile(dir="internal", prefix="ql_ratings_", suffix=".tmp", delete=False) as spool:
+            spool_path = spool.name
+            for page in give_ratings_ql_pages():
+                spool.write(np.ascontiguousarray(page, dtype="<f8").tobytes())
 
-    srs_quantiles = []
-    ql_quantiles = []
+        ql_ratings = np.fromfile(spool_path, dtype="<f8") if os.path.getsize(spool_path) == 0 else \
+            np.memmap(spool_path, dtype="<f8", mode="r")
 
-    for i in [0.4, 0.8, 0.9, 0.95, 0.98, 0.99]:
-        srs_quantiles.append(pd.Series(srs_raw_ratings).quantile(i))
-        ql_quantiles.append(pd.Series(ql_raw_ratings).quantile(i))
-        plt.axvline(pd.Series(ql_raw_ratings).quantile(i))
+        def ql_chunks():
+            for i in range(0, len(ql_ratings), STANDARDIZER_CHUNK_ROWS):
+                yield np.asarray(ql_ratings[i:i + STANDARDIZER_CHUNK_ROWS])
+
+        srs_quantiles = streaming_quantiles(srs_chunks, STANDARDIZER_QUANTILES)
+        ql_quantiles = streaming_quantiles(ql_chunks, STANDARDIZER_QUANTILES)
+        del ql_ratings
+    finally:
+        if spool_path is not None and os.path.exists(spool_path):
+            os.remove(spool_path)
 
     csv = pd.DataFrame(data={"quantile nr": range(1, 7), "srs_quantiles": srs_quantiles, "ql_quantiles": ql_quantiles})
     csv.to_csv("internal/database_standardizer.csv")
 
+    # Bereits eingelesene Quantile und damit standardisierte Ratings sind nun veraltet
+    _standardizer = None
+    for store in _srs_stores.values():
+        store.pop("rating_standardised", None)
+    _rating_rasters.clear()
+
+
+def give_ratings_ql_pages(page_rows=None):
+    ################################################################################################################
+    # Eingabeparameter:     optional: Anzahl der Datensätze pro Abfrage (Standard: QL_PAGE_ROWS)
+    # Rückgabe:             Generator, der für jede Seite ein numpy-Array mit den IRIRoughness-Werten (über 0) liefert
+    #
+    # Beschreibung:
+    # Fragt alle Datensätze der Queensland-Datenbank (wie give_rated_area_ql ohne Rechteck) seitenweise ab, statt
+    # die ganze Tabelle in einer Antwort. Die Seiten werden über die fortlaufende Spalte "_id" abgegrenzt.
+    ################################################################################################################
+    page_rows = page_rows or QL_PAGE_ROWS
+    last_id = -1
+
+    while True:
+        sql_request = 'SELECT "_id","IRIRoughness" FROM "{}" ' \
+                      'WHERE "Latitude" BETWEEN -90 AND 90 ' \
+                      'AND "Longitude" BETWEEN -180 AND 180 ' \
+                      'AND "_id" > {} ORDER BY "_id" LIMIT {};' \
+            .format(QL_RESOURCE_ID, last_id, page_rows)
+
+        response = get_http_client().get(QL_URL + "?sql=" + sql_request)
+        records = response.json()["result"]["records"]
+        if not records:
+            return
+
+        ratings = np.array([float(c["IRIRoughness"]) for c in records], dtype=float)
+        yield ratings[ratings > 0]
+
+        last_id = max(int(c["_id"]) for c in records)
+        if len(records) < page_rows:
+            return
+
+
+def streaming_quantiles(read_chunks, quantiles):
+    ################################################################################################################
+    # Eingabeparameter:     Funktion, die bei jedem Aufruf die Werte erneut als Folge von numpy-Arrays (Blöcken)
+    #                       liefert, Liste von Quantilen (0-1)
+    # Rückgabe:             Liste mit dem Wert für jedes Quantil (NaN, wenn es keine Werte gibt)
+    #
+    # Beschreibung:
+    # Berechnet die Quantile exakt wie pandas.Series.quantile (lineare Interpolation, NaN werden ignoriert), ohne
+    # alle Werte gleichzeitig im Arbeitsspeicher zu halten. Die Werte werden dazu zweimal gelesen:
+    # - Durchlauf 1: Die Werte werden in ein Histogramm mit logarithmisch verteilten Grenzen einsortiert. Damit ist
+    #       bekannt, in welchem Bereich der k-kleinste Wert liegt, der für jedes Quantil gebraucht wird.
+    # - Durchlauf 2: Nur die Werte aus diesen Bereichen werden behalten. Über np.partition wird darin der genaue
+    #       k-kleinste Wert bestimmt und dann wie bei pandas zwischen den beiden benachbarten Werten interpoliert.
+    ################################################################################################################
+    edges = np.logspace(-8, 6, STANDARDIZER_HISTOGRAM_BINS + 1)
+
+    def bins_of(values):
+        return np.searchsorted(edges, values, side="right")
+
+    counts = np.zeros(len(edges) + 1, dtype=np.int64)
+    for chunk in read_chunks():
+        chunk = chunk[~np.isnan(chunk)]
+        counts += np.bincount(bins_of(chunk), minlength=len(counts))
+
+    value_count = int(counts.sum())
+    if value_count == 0:
+        return [float("nan")] * len(quantiles)
+
+    # Für jedes Quantil die beiden benachbarten Ränge (k-kleinster Wert) und der Anteil dazwischen
+    positions = [(value_count - 1) * q for q in quantiles]
+    lower_ranks = [int(math.floor(position)) for position in positions]
+    upper_ranks = [min(rank + 1, value_count - 1) for rank in lower_ranks]
+    ranks = np.array(lower_ranks + upper_ranks, dtype=np.int64)
+
+    bin_ends = np.cumsum(counts)
+    rank_bins = np.searchsorted(bin_ends, ranks, side="right")
+    needed_bins = np.unique(rank_bins)
+
+    collected = {b: [] for b in needed_bins.tolist()}
+    for chunk in read_chunks():
+        chunk = chunk[~np.isnan(chunk)]
+        chunk_bins = bins_of(chunk)
+        keep = np.isin(chunk_bins, needed_bins)
+        for b in needed_bins.tolist():
+            collected[b].append(chunk[keep & (chunk_bins == b)])
+
+    values_of_rank = {}
+    for b in needed_bins.tolist():
+        bin_values = np.concatenate(collected[b])
+        in_bin = sorted(set((ranks[rank_bins == b] - (bin_ends[b] - counts[b])).tolist()))
+        bin_values = np.partition(bin_values, in_bin)
+        for rank_in_bin in in_bin:
+            values_of_rank[rank_in_bin + int(bin_ends[b] - counts[b])] = bin_values[rank_in_bin]
+
+    results = []
+    for position, lower_rank, upper_rank in zip(positions, lower_ranks, upper_ranks):
+        lower, upper = values_of_rank[lower_rank], values_of_rank[upper_rank]
+        # Interpolation wie bei numpy/pandas
+        results.append(float(np.quantile(np.array([lower, upper]), position - lower_rank)))
+    return results
+
 
 def interpoint(coordinates, maximum_point_distance):
     ################################################################################################################
-    # Eingangsparameter:    Liste von Koordinaten
+    # Eingangsparameter:    RatedRoute oder Liste von Koordinaten
     #                       maximaler Abstand, den zwei Wegpunkte haben dürfen
-    # Rückgabe:             Liste von Koordinaten, bei denen bei zu weitem Abstand zwischen zwei Coordinate-Objekten
-    #                       genau jeweils ein Punkt in der Mitte eingesetzt wurden
+    # Rückgabe:             RatedRoute bzw. Liste von Koordinaten, bei denen bei zu weitem Abstand zwischen zwei
+    #                       Punkten genau jeweils ein Punkt in der Mitte eingesetzt wurden
     #
     # Beschreibung:
     # Diese Methode geht ermittelt die Abstände von jedem Punkt in der Liste ('coordinates') zum jeweils nächsten.
@@ -457,8 +2093,15 @@ def interpoint(coordinates, maximum_point_distance):
     # hinzugefügt, welche in der Mitte zwischen beiden Punkten ist.
     # Der 'offset_counter' zählt dazu mit, wie viele Koordinaten schon eingefügt wurden (+1), um die passende Stelle
     # zum Einfügen in der kopierten Liste zu finden
+    # Bei einer RatedRoute passiert dasselbe spaltenweise für alle zu langen Abstände auf einmal
     ################################################################################################################
 
+    if isinstance(coordinates, RatedRoute):
+        too_long = np.flatnonzero(coordinates.calc_segment_distances() > maximum_point_distance)
+        midpoints = RatedRoute(lat=(coordinates.lat[too_long] + coordinates.lat[too_long + 1]) / 2,
+                               long=(coordinates.long[too_long] + coordinates.long[too_long + 1]) / 2)
+        return coordinates.insert(too_long + 1, midpoints)
+
     distances = []
     i = 0
     while i < (len(coordinates) - 1):
@@ -479,14 +2122,68 @@ def interpoint(coordinates, maximum_point_distance):
     return new_coordinates
 
 
-def give_ratings_near_path(path, puffer_wanted=True):
+def densify_route(route, maximum_point_distance):
+    ################################################################################################################
+    # Eingangsparameter:    RatedRoute (oder Liste von Koordinaten)
+    #                       maximaler Abstand, den zwei Wegpunkte haben dürfen
+    # Rückgabe:             RatedRoute, in der kein Abstand zwischen zwei Wegpunkten größer als
+    #                       'maximum_point_distance' ist
+    #
+    # Beschreibung:
+    # Ersetzt das wiederholte Aufrufen von 'interpoint' (Halbieren aller zu langen Abstände, bis alle kurz genug sind)
+    # durch einen einzigen Durchlauf:
+    # Für jeden Abschnitt zwischen zwei Wegpunkten wird berechnet, in wie viele gleich lange Stücke er geteilt werden
+    # muss, und die Zwischenpunkte werden direkt gleichmäßig verteilt erzeugt.
+    #
+    # Die Länge eines Stücks wird in 'calc_distance_to_other_point' mit dem Breitengrad seines Anfangspunktes
+    # berechnet. Damit kein Stück zu lang wird, wird die Anzahl der Stücke mit dem größten Umrechnungsfaktor
+    # (cos des Breitengrades) auf dem Abschnitt bestimmt. Sollte ein Stück durch Rundungsfehler doch minimal zu
+    # lang sein, wird dieser Abschnitt in ein Stück mehr geteilt.
     ################################################################################################################
-    # Eingangsparameter:    Liste von Koordinaten, die eine Route bilden
+    route = RatedRoute.from_path(route)
+    if len(route) < 2:
+        return route.copy()
+
+    lat_from, lat_to = route.lat[:-1], route.lat[1:]
+    cos_max = np.maximum(np.cos(np.radians(lat_from)), np.cos(np.radians(lat_to)))
+    cos_max[np.sign(lat_from) != np.sign(lat_to)] = 1.0
+    distance_y = 111.3 * (lat_to - lat_from)
+    distance_x = 111.3 * (route.long[1:] - route.long[:-1]) * cos_max
+    pieces = np.maximum(1, np.ceil(np.sqrt(distance_x * distance_x + distance_y * distance_y)
+                                   / maximum_point_distance)).astype(np.int64)
+
+    while True:
+        segment_of_point = np.repeat(np.arange(len(pieces)), pieces)
+        segment_starts = np.cumsum(pieces) - pieces
+        fraction = (np.arange(len(segment_of_point)) - segment_starts[segment_of_point]) / pieces[segment_of_point]
+
+        densified = RatedRoute(
+            lat=np.append(lat_from[segment_of_point] + fraction * (lat_to - lat_from)[segment_of_point],
+                          route.lat[-1]),
+            long=np.append(route.long[:-1][segment_of_point]
+                           + fraction * (route.long[1:] - route.long[:-1])[segment_of_point], route.long[-1]))
+
+        too_long = densified.calc_segment_distances() > maximum_point_distance
+        if not too_long.any():
+            break
+        pieces[np.unique(segment_of_point[too_long])] += 1
+
+    # Die ursprünglichen Wegpunkte (Bruchteil 0) behalten alle ihre Informationen
+    original = np.append(fraction == 0, True)
+    for name in RatedRoute.COLUMNS:
+        getattr(densified, name)[original] = getattr(route, name)
+    return densified
+
+
+def give_ratings_near_path(path, puffer_wanted=True, corridor=False):
+    ################################################################################################################
+    # Eingangsparameter:    RatedRoute (oder Liste von Koordinaten), die eine Route bilden
     #                       optional: Sicherheitspuffer gewollt?
+    #                       optional: Nur Ratings im Korridor um die Route statt im ganzen Rechteck?
     # Rückgabe:             Gibt ein Tupel zurück, dass zwei Infos enthält:
     #                           - Eine Liste von Coordinate-Objekten mit rohen ratings, die aus den Datenbanken von
     #                           SmartRoadSence und Queensland abgefragt wurden und in der Nähe der Route liegen
-    #                           - Eine Liste von Rectangle-Objekten (aus matplotlib.pyplot), die später falls gewünscht
+    #                           - Eine Liste von Rectangle-Objekten (siehe Rectangle), die später falls gewünscht
     #                           geplottet werden kann
 
     # Beschreibung:
@@ -502,29 +2199,39 @@ def give_ratings_near_path(path, puffer_wanted=True):
     # - Schritt 2: Sicherheitsabstand in km in Grad umrechnen und aufschlagen
     #       Falls gewollt, wird noch ein Sicherheitsabstand zu allen Seiten aufgeschlagen.
     #       Danach wird ein neues (rotes) Rechteck erstellt, dass diese neue (größere) Fläche zeigt
-    #       Standardmäßig eingestellt ist hier ein Sicherheitsabstand von 1.5km
+    #       Standardmäßig eingestellt ist hier ein Sicherheitsabstand von 1.5km (RATING_CORRIDOR_KM)
     #
     # - Schritt 3: Straßenzustände in Rechteck abfragen
     #       Nun werden alle Punkte, die in dem entsprechenden Rechteck liegen, abgefragt und in einer Liste gesammelt.
+    #       Die Ratings dieser Punkte sind dabei schon standardisiert.
     #       Diese Liste wird dann zurückgegeben
+    #
+    # Mit corridor=True (und Sicherheitspuffer) werden in Schritt 3 nur die Punkte abgefragt, die höchstens
+    # RATING_CORRIDOR_KM von der Route selbst entfernt sind (siehe give_rated_corridor). Bei einer diagonal
+    # verlaufenden Route ist das nur ein kleiner Teil des Rechtecks. Für die grafische Darstellung werden dann statt
+    # des roten Rechtecks die (roten) Rechtecke der Vorauswahl zurückgegeben. Standard bleibt das Rechteck: Laut
+    # "benchmark.py corridor" kostet die Abfrage im Korridor bisher mehr, als sie beim Snapping einspart.
     ################################################################################################################
 
     # 1. Schritt: Feststellen der nördlichsten, westlichsten etc. Punkte der Route
 
-    point_list = []
-    for c in path:
-        point_list.append(c.get_coordinates())
-    point_data_frame = pd.DataFrame(data=point_list, columns=["lat", "long"])
+    path = RatedRoute.from_path(path)
 
-    lat1, long1 = point_data_frame.min()[0], point_data_frame.min()[1]
-    lat2, long2 = point_data_frame.max()[0], point_data_frame.max()[1]
+    lat1, long1 = float(path.lat.min()), float(path.long.min())
+    lat2, long2 = float(path.lat.max()), float(path.long.max())
 
-    rectangles = [plt.Rectangle((long1, lat1), abs(long2 - long1), abs(lat1 - lat2), ec="black")]
+    rectangles = [Rectangle((long1, lat1), abs(long2 - long1), abs(lat1 - lat2), ec="black")]
+
+    if puffer_wanted and corridor:
+        all_rating_coordinates, boxes = give_rated_corridor(path, RATING_CORRIDOR_KM)
+        for lat_from, lat_to, long_from, long_to, first_point, last_point in boxes:
+            rectangles.append(Rectangle((long_from, lat_from), long_to - long_from, lat_to - lat_from, ec="red"))
+        return all_rating_coordinates, rectangles
 
     # 2. Schritt: Sicherheitsabstand in km in Grad umrechnen und aufschlagen
 
     if puffer_wanted:
-        safety_km = 1.5
+        safety_km = RATING_CORRIDOR_KM
         safety_lat = safety_km / 111.3
         safety_long = safety_km / (math.cos(math.radians(lat1)) * 111.3)
         lat1 = lat1 - safety_lat
@@ -532,19 +2239,296 @@ def give_ratings_near_path(path, puffer_wanted=True):
         long1 = long1 - safety_long
         long2 = long2 + safety_long
 
-        rectangles.append(plt.Rectangle((long1, lat1), abs(long2 - long1), abs(lat1 - lat2), ec="red"))
+        rectangles.append(Rectangle((long1, lat1), abs(long2 - long1), abs(lat1 - lat2), ec="red"))
 
     # Schritt 3: Straßenzustände in Großem Rechteck abfragen
 
     point_a, point_b = Coordinate(lat1, long1), Coordinate(lat2, long2)
 
-    all_rating_coordinates_srs = give_rated_area_srs(point_a, point_b)
-    all_rating_coordinates_ql = give_rated_area_ql(point_a, point_b)
+    all_rating_coordinates_srs = give_rated_area_srs(point_a, point_b, standardised=True)
+    all_rating_coordinates_ql = give_rated_area_ql(point_a, point_b, standardised=True)
     all_rating_coordinates = all_rating_coordinates_srs + all_rating_coordinates_ql
 
     return all_rating_coordinates, rectangles
 
 
+def give_corridor_segments(path, runs=None):
+    ################################################################################################################
+    # Eingangsparameter:    RatedRoute
+    #                       optional: Tupel aus ersten und letzten Punkten (einschließlich) der Teilstücke der Route
+    #                       (siehe give_index_runs, Standard: die ganze Route)
+    # Rückgabe:             Tupel aus zwei aufsteigenden Arrays: Anfangs- und Endpunkt jedes Segments
+    #
+    # Beschreibung:
+    # Segmente verbinden nur aufeinanderfolgende Punkte innerhalb eines Teilstücks, Teilstücke werden nie
+    # miteinander verbunden. Besteht ein Teilstück nur aus einem Punkt, ist das Segment dieser Punkt.
+    ################################################################################################################
+    if runs is None:
+        runs = ([0], [max(len(path) - 1, 0)])
+    run_starts, run_ends = np.asarray(runs[0], dtype=np.int64), np.asarray(runs[1], dtype=np.int64)
+    lengths = np.maximum(run_ends - run_starts, 1)
+    segment_starts = np.repeat(run_starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    segment_ends = np.minimum(segment_starts + 1, np.repeat(run_ends, lengths))
+    return segment_starts, segment_ends
+
+
+def give_corridor_boxes(path, corridor_km, runs=None):
+    ################################################################################################################
+    # Eingangsparameter:    RatedRoute, Breite des Korridors in km (zu jeder Seite)
+    #                       optional: Teilstücke der Route (siehe give_corridor_segments)
+    # Rückgabe:             Liste von Rechtecken (lat_from, lat_to, long_from, long_to, erster Punkt, letzter Punkt)
+    #
+    # Beschreibung:
+    # Fasst jeweils CORRIDOR_CHUNK_SEGMENTS aufeinanderfolgende Segmente der Route zusammen und legt um deren Punkte
+    # ein Rechteck, das um 'corridor_km' zu jeder Seite vergrößert ist. Jeder Punkt, der höchstens 'corridor_km' von
+    # einem dieser Segmente entfernt ist, liegt in dem Rechteck. Die Vereinigung aller Rechtecke enthält also den
+    # ganzen Korridor, ist aber bei diagonalen Routen viel kleiner als das Rechteck um die ganze Route.
+    # Für die Umrechnung in Längengrade wird der Breitengrad mit dem größten Betrag genommen, damit das Rechteck
+    # nie zu schmal wird.
+    # Bei Teilstücken kann ein Rechteck Segmente mehrerer nah beieinanderliegender Teilstücke enthalten, aber nie die
+    # Lücke zwischen ihnen (siehe corridor_mask).
+    ################################################################################################################
+    segment_starts, segment_ends = give_corridor_segments(path, runs)
+    # Erstes Segment jedes Rechtecks: höchstens CORRIDOR_CHUNK_SEGMENTS Segmente der Route, damit es klein bleibt
+    first_segments = []
+    first_segment = 0
+    while first_segment < len(segment_starts):
+        first_segments.append(first_segment)
+        first_segment = int(np.searchsorted(segment_ends, segment_starts[first_segment] + CORRIDOR_CHUNK_SEGMENTS,
+                                            side="right"))
+    first_segments = np.array(first_segments, dtype=np.int64)
+    last_segments = np.append(first_segments[1:], len(segment_starts)) - 1
+
+    lat_from = np.minimum.reduceat(np.minimum(path.lat[segment_starts], path.lat[segment_ends]), first_segments)
+    lat_to = np.maximum.reduceat(np.maximum(path.lat[segment_starts], path.lat[segment_ends]), first_segments)
+    long_from = np.minimum.reduceat(np.minimum(path.long[segment_starts], path.long[segment_ends]), first_segments)
+    long_to = np.maximum.reduceat(np.maximum(path.long[segment_starts], path.long[segment_ends]), first_segments)
+    lat_from, lat_to = lat_from - corridor_km / 111.3, lat_to + corridor_km / 111.3
+    largest_latitude = np.minimum(np.maximum(np.abs(lat_from), np.abs(lat_to)), 89.0)
+    safety_long = corridor_km / (np.cos(np.radians(largest_latitude)) * 111.3)
+    return list(zip(lat_from.tolist(), lat_to.tolist(), (long_from - safety_long).tolist(),
+                    (long_to + safety_long).tolist(), segment_starts[first_segments].tolist(),
+                    segment_ends[last_segments].tolist()))
+
+
+def concatenate_ranges(starts, lengths):
+    # Alle Bereiche starts[i] .. starts[i] + lengths[i] - 1 hintereinander als ein Array (ohne Python-Schleife)
+    starts, lengths = np.asarray(starts, dtype=np.int64), np.asarray(lengths, dtype=np.int64)
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+def corridor_mask(latitudes, longitudes, path, corridor_km, runs=None):
+    ################################################################################################################
+    # Eingangsparameter:    Breiten- und Längengrade von Punkten (numpy-Arrays), RatedRoute, Breite des Korridors
+    #                       in km
+    #                       optional: Teilstücke der Route (siehe give_corridor_segments)
+    # Rückgabe:             boolesches numpy-Array: Liegt der Punkt höchstens 'corridor_km' von der Route entfernt?
+    #
+    # Beschreibung:
+    # Die Distanz wird wie beim Snapping berechnet (calc_distance_to_other_point bzw. RatingIndex, Längengrad mit dem
+    # Breitengrad des Routenpunktes umgerechnet): Ein Punkt, der höchstens 'corridor_km' von einem Routenpunkt
+    # entfernt ist, liegt immer im Korridor. Zwischen zwei Routenpunkten zählt der Abstand zum Segment, umgerechnet
+    # mit dem Breitengrad des Anfangspunktes.
+    #
+    # Damit nicht jeder Punkt mit jedem Segment in der Nähe verglichen werden muss (bei Zwischenpunkten alle 110 m
+    # wären das ca. 30), werden aufeinanderfolgende Segmente, die auf einer Geraden liegen (z.B. aus densify_route),
+    # zu einer Strecke zusammengefasst. Der Abstand zur Strecke, einmal mit dem kleinsten und einmal mit dem größten
+    # Umrechnungsfaktor ihrer Routenpunkte berechnet, ist eine untere und eine obere Schranke für den Abstand zu ihren
+    # Segmenten. Nur für die wenigen Punkte, bei denen 'corridor_km' zwischen den Schranken liegt, werden die
+    # einzelnen Segmente verglichen.
+    # Alle Punkte und Strecken werden auf einmal verglichen: Jede Strecke wird in die Zellen (mindestens
+    # 'corridor_km' breit) eingetragen, die ihr umgebendes Rechteck plus eine Zelle zu jeder Seite überdecken. Jeder
+    # Punkt wird nur mit den Strecken seiner Zelle verglichen, Punkte außerhalb dieser Zellen gar nicht.
+    ################################################################################################################
+    latitudes, longitudes = np.asarray(latitudes, dtype=float), np.asarray(longitudes, dtype=float)
+    in_corridor = np.zeros(len(latitudes), dtype=bool)
+    if len(latitudes) == 0 or len(path) == 0:
+        return in_corridor
+
+    segment_starts, segment_ends = give_corridor_segments(path, runs)
+    # Umrechnungsfaktor für jeden Routenpunkt, für die Schranken mit numpy (Abweichungen deckt der Puffer
+    # CORRIDOR_STRAIGHT_MARGIN_KM), für den genauen Vergleich wie in calc_distance_to_other_point
+    factors = np.cos(np.radians(path.lat)) * 111.3
+
+    def exact_factors(indices):
+        return np.array([math.cos(math.radians(lat)) * 111.3 for lat in path.lat[indices].tolist()])
+
+    def distances_to_lines(points, starts, ends, start_factors):
+        # Abstand in km zur Strecke von 'starts' nach 'ends', Längengrad mit 'start_factors' umgerechnet
+        point_x = (longitudes[points] - path.long[starts]) * start_factors
+        point_y = (latitudes[points] - path.lat[starts]) * 111.3
+        delta_x = (path.long[ends] - path.long[starts]) * start_factors
+        delta_y = (path.lat[ends] - path.lat[starts]) * 111.3
+        length_squared = delta_x * delta_x + delta_y * delta_y
+        t = np.clip((point_x * delta_x + point_y * delta_y) / np.where(length_squared > 0, length_squared, np.inf),
+                    0, 1)
+        distance_x, distance_y = point_x - t * delta_x, point_y - t * delta_y
+        return np.sqrt(distance_x * distance_x + distance_y * distance_y)
+
+    # Segmente auf einer Geraden (gleiche Richtung bis auf Rundungsfehler) zu Strecken zusammenfassen
+    delta_lat = path.lat[segment_ends] - path.lat[segment_starts]
+    delta_long = path.long[segment_ends] - path.long[segment_starts]
+    continues = segment_starts[1:] == segment_ends[:-1]
+    cross = delta_lat[:-1] * delta_long[1:] - delta_long[:-1] * delta_lat[1:]
+    dot = delta_lat[:-1] * delta_lat[1:] + delta_long[:-1] * delta_long[1:]
+    lengths = np.hypot(delta_lat, delta_long)
+    straight = continues & (dot > 0) & (np.abs(cross) <= CORRIDOR_STRAIGHT_TOLERANCE * lengths[:-1] * lengths[1:])
+    line_first_segments = np.flatnonzero(np.append(True, ~straight))
+    line_segment_counts = np.diff(np.append(line_first_segments, len(segment_starts)))
+    line_starts = segment_starts[line_first_segments]
+    line_ends = segment_ends[line_first_segments + line_segment_counts - 1]
+    line_min_factors = np.minimum.reduceat(np.minimum(factors[segment_starts], factors[segment_ends]),
+                                           line_first_segments)
+    line_max_factors = np.maximum.reduceat(np.maximum(factors[segment_starts], factors[segment_ends]),
+                                           line_first_segments)
+
+    # Zellen sind in Längengrad so breit, dass sie auch beim äquatorfernsten Routenpunkt 'corridor_km' breit sind
+    cell_lat = corridor_km / 111.3
+    cell_long = corridor_km / float(factors.min()) if factors.min() > 0 else 360.0
+    lat0, long0 = float(path.lat.min()) - cell_lat, float(path.long.min()) - cell_long
+    row_count = int((float(path.lat.max()) - lat0) // cell_lat) + 2
+    col_count = int((float(path.long.max()) - long0) // cell_long) + 2
+
+    def cells(lats, longs):
+        return (np.floor((lats - lat0) / cell_lat).astype(np.int64),
+                np.floor((longs - long0) / cell_long).astype(np.int64))
+
+    # Zellen jeder Strecke (Zeile * Spaltenanzahl + Spalte), nach Zelle sortiert
+    start_rows, start_cols = cells(path.lat[line_starts], path.long[line_starts])
+    end_rows, end_cols = cells(path.lat[line_ends], path.long[line_ends])
+    row_from, col_from = np.minimum(start_rows, end_rows) - 1, np.minimum(start_cols, end_cols) - 1
+    row_span = np.maximum(start_rows, end_rows) + 2 - row_from
+    col_span = np.maximum(start_cols, end_cols) + 2 - col_from
+    cell_counts = row_span * col_span
+    within_line = concatenate_ranges(np.zeros(len(cell_counts)), cell_counts)
+    pair_col_span = np.repeat(col_span, cell_counts)
+    cell_keys = ((np.repeat(row_from, cell_counts) + within_line // pair_col_span) * col_count +
+                 np.repeat(col_from, cell_counts) + within_line % pair_col_span)
+    by_cell = np.argsort(cell_keys, kind="stable")
+    cell_keys, cell_lines = cell_keys[by_cell], np.repeat(np.arange(len(line_starts)), cell_counts)[by_cell]
+
+    # Paare aus Punkt und Strecke seiner Zelle
+    rows, cols = cells(latitudes, longitudes)
+    in_grid = np.flatnonzero((rows >= 0) & (rows < row_count) & (cols >= 0) & (cols < col_count))
+    point_keys = rows[in_grid] * col_count + cols[in_grid]
+    first_pair = np.searchsorted(cell_keys, point_keys, side="left")
+    pair_counts = np.searchsorted(cell_keys, point_keys, side="right") - first_pair
+    points = np.repeat(in_grid, pair_counts)
+    lines = cell_lines[concatenate_ranges(first_pair, pair_counts)]
+    starts, ends = line_starts[lines], line_ends[lines]
+
+    # Schranken; der Puffer von CORRIDOR_STRAIGHT_MARGIN_KM deckt die Rundungsfehler der zusammengefassten Segmente
+    upper = distances_to_lines(points, starts, ends, line_max_factors[lines])
+    accepted = upper <= corridor_km - CORRIDOR_STRAIGHT_MARGIN_KM
+    in_corridor[points[accepted]] = True
+    undecided = ~accepted & ~in_corridor[points]
+    points, lines = points[undecided], lines[undecided]
+    lower = distances_to_lines(points, line_starts[lines], line_ends[lines], line_min_factors[lines])
+    points, lines = points[lower <= corridor_km + CORRIDOR_STRAIGHT_MARGIN_KM], \
+        lines[lower <= corridor_km + CORRIDOR_STRAIGHT_MARGIN_KM]
+
+    # Genau wie beim Snapping: jedes Segment der übrigen Strecken einzeln
+    points = np.repeat(points, line_segment_counts[lines])
+    segments = concatenate_ranges(line_first_segments[lines], line_segment_counts[lines])
+    starts, ends = segment_starts[segments], segment_ends[segments]
+    in_corridor[points[distances_to_lines(points, starts, ends, exact_factors(starts)) <= corridor_km]] = True
+    # Der letzte Punkt eines Teilstücks ist nie Anfangspunkt eines Segments und zählt mit seinem eigenen Faktor
+    last = np.append(segment_starts[1:] != segment_ends[:-1], True)[segments]
+    points, ends = points[last], ends[last]
+    in_corridor[points[distances_to_lines(points, ends, ends, exact_factors(ends)) <= corridor_km]] = True
+    return in_corridor
+
+
+def give_corridor_indices_srs(path, corridor_km, store=None, boxes=None, runs=None):
+    # Positionen der SmartRoadSense-Datensätze im Korridor um die Route in der binären Datenbank, in der
+    # ursprünglichen Reihenfolge der csv. Gelesen werden nur die Kacheln, die eines der Rechtecke aus
+    # give_corridor_boxes überschneiden, jede Kachel genau einmal. Optional nur um Teilstücke der Route (siehe
+    # give_corridor_segments)
+    if store is None:
+        store = load_database_srs()
+    if boxes is None:
+        boxes = give_corridor_boxes(path, corridor_km, runs)
+
+    # Kacheln aller Rechtecke auf einmal
+    lat_from, lat_to, long_from, long_to = np.array([box[:4] for box in boxes], dtype=float).reshape(-1, 4).T
+    row_from, col_from = np.divmod(srs_tile_keys(np.maximum(lat_from, -90), np.maximum(long_from, -180)),
+                                   SRS_TILE_COLUMN_COUNT)
+    row_to, col_to = np.divmod(srs_tile_keys(np.minimum(lat_to, 90), np.minimum(long_to, 180)), SRS_TILE_COLUMN_COUNT)
+    col_span = col_to - col_from + 1
+    tile_counts = (row_to - row_from + 1) * col_span
+    within_box = concatenate_ranges(np.zeros(len(tile_counts)), tile_counts)
+    pair_col_span = np.repeat(col_span, tile_counts)
+    tile_keys = np.unique((np.repeat(row_from, tile_counts) + within_box // pair_col_span) * SRS_TILE_COLUMN_COUNT +
+                          np.repeat(col_from, tile_counts) + within_box % pair_col_span)
+
+    # Nur Kacheln, die in der Datenbank vorkommen
+    tile_positions = np.minimum(np.searchsorted(store["tile_keys"], tile_keys), len(store["tile_keys"]) - 1)
+    tile_positions = tile_positions[store["tile_keys"][tile_positions] == tile_keys]
+    starts, ends = store["tile_starts"][tile_positions], store["tile_starts"][tile_positions + 1]
+    selected = concatenate_ranges(starts, ends - starts)
+
+    selected = selected[corridor_mask(np.asarray(store["latitude"][selected]), np.asarray(store["longitude"][selected]),
+                                      path, corridor_km, runs)]
+    return selected[np.argsort(store["row_order"][selected], kind="stable")]
+
+
+def give_index_runs(indices):
+    ################################################################################################################
+    # Eingangsparameter:    aufsteigend sortiertes, nicht leeres Array von Indizes
+    # Rückgabe:             Tupel aus zwei Arrays: erster und letzter Index (einschließlich) jeder Folge
+    #                       aufeinanderfolgender Indizes
+    ################################################################################################################
+    breaks = np.diff(indices) > 1
+    return indices[np.append(True, breaks)], indices[np.append(breaks, True)]
+
+
+def give_rated_corridor(path, corridor_km, runs=None):
+    ################################################################################################################
+    # Eingangsparameter:    RatedRoute, Breite des Korridors in km (zu jeder Seite)
+    #                       optional: Teilstücke der Route (siehe give_corridor_segments)
+    # Rückgabe:             Tupel aus:
+    #                           - Liste von Coordinate-Objekten mit rohen und standardisierten Ratings
+    #                           (SmartRoadSense und Queensland), die höchstens 'corridor_km' von der Route entfernt
+    #                           liegen
+    #                           - Rechtecke der Vorauswahl (siehe give_corridor_boxes)
+    #
+    # Beschreibung:
+    # Wie Schritt 2 und 3 in give_ratings_near_path, aber statt aller Punkte im (vergrößerten) Rechteck um die Route
+    # werden nur die Punkte im Korridor um die Route zurückgegeben, in derselben Reihenfolge.
+    # Die SmartRoadSense-Datenbank wird nur in den Rechtecken der Vorauswahl abgefragt. Die Queensland-Datensätze
+    # werden im Rechteck um alle Rechtecke abgefragt (außerhalb von Queensland ohne API-Aufruf, sonst über den
+    # Kachel-Cache) und danach genauso gefiltert.
+    ################################################################################################################
+    boxes = give_corridor_boxes(path, corridor_km, runs)
+
+    with _instrumentation.stage("srs"):
+        store = load_database_srs()
+        selected = give_corridor_indices_srs(path, corridor_km, store, boxes, runs)
+        ratings = give_standardised_ratings_srs(store)[selected]
+        _instrumentation.count("srs_rows", len(selected))
+
+        coordinate_list = []
+        for lat, long, ppe, rating in zip(store["latitude"][selected].tolist(), store["longitude"][selected].tolist(),
+                                          store["ppe"][selected].tolist(), ratings.tolist()):
+            new_coordinate = Coordinate(lat, long, ppe, "srs")
+            new_coordinate.set_rating(rating)
+            coordinate_list.append(new_coordinate)
+
+    point_a = Coordinate(min(box[0] for box in boxes), min(box[2] for box in boxes))
+    point_b = Coordinate(max(box[1] for box in boxes), max(box[3] for box in boxes))
+    latitudes, longitudes, iri_roughness = give_rated_area_ql_arrays(point_a, point_b)
+    in_corridor = corridor_mask(latitudes, longitudes, path, corridor_km, runs)
+    if in_corridor.any():
+        ratings = standardize_ratings(iri_roughness[in_corridor], "ql")
+        for lat, long, iri, rating in zip(latitudes[in_corridor].tolist(), longitudes[in_corridor].tolist(),
+                                          iri_roughness[in_corridor].tolist(), ratings.tolist()):
+            new_coordinate = Coordinate(lat, long, iri, "ql")
+            new_coordinate.set_rating(rating)
+            coordinate_list.append(new_coordinate)
+
+    return coordinate_list, boxes
+
+
 def standardize(coordinate_to_standardize):
     ################################################################################################################
     # Eingangsparameter:    Ein einzelnes Coordinate-Objekt, welches bisher nur das rohe Rating und die Quelle der
@@ -567,15 +2551,12 @@ def standardize(coordinate_to_standardize):
     # Diese Einteilung orientiert sich grob an der von SmartRoadSence (s. Dokumentation zu 'update_database_normalizer')
 
     # Zunächst liest diese Funktion das rohe Rating und die Quelle dieses rohen Ratings aus dem Coordinate-Objekt aus.
-    # Dann wird versucht, die 'database_standardizer.csv' im internal Ordner zu öffen. Falls das nicht gelingt,
-    # wird 'update_database_standardizer' angefordert und der Einleseversuch dann widerholt
+    # Die Quantile aus 'database_standardizer.csv' werden über 'load_database_standardizer' nur einmal pro Prozess
+    # eingelesen (falls die Datei fehlt, wird 'update_database_standardizer' angefordert).
     #
-    # Nach dem Einlesen wird geprüft, was die Quelle des rohen Ratings ist bzw. ob diese überhaupt angegeben ist.
-    # Die entsprechende Spalte aus 'database_standardizer.csv' wird ausgelesen (falls Datenquelle angegeben war) und
-    # in ein 'pandas.DataFrame' mit der quantile nr gespeichert
-    # Dann wird in dieses Dataframe eine neue Zeile eingefügt, die das zu standardisierende Rating und als 'quantile nr'
-    # -1 enthält. Dann wird die Liste nach Rating sortiert und geschaut, an welcher Stelle die Hinzugefügte Zeile mit
-    # quantile nr = -1 ist.
+    # Die eigentliche Einteilung übernimmt 'standardize_ratings': Gedanklich wird das zu standardisierende Rating
+    # in die nach Rating sortierte Liste der Quantile eingefügt (mit 'quantile nr' -1) und geschaut, an welcher
+    # Stelle es steht.
     #
     # Beispiel anhand von queensland-Daten:
     #
@@ -594,95 +2575,540 @@ def standardize(coordinate_to_standardize):
     raw_rating, data_origin = \
         coordinate_to_standardize.get_rating(standardised_wanted=False, raw_with_source_wanted=True)
 
-    try:
-        standardize_values = pd.read_csv('internal/database_standardizer.csv')[
-            ["quantile nr", "srs_quantiles", "ql_quantiles"]]
-    except IOError:
-        update_database_standardizer()
-        standardize_values = pd.read_csv('internal/database_standardizer.csv')[
-            ["quantile nr", "srs_quantiles", "ql_quantiles"]]
-
-    if data_origin == "srs":
-        name_of_data_row = "srs_quantiles"
-    elif data_origin == "ql":
-        name_of_data_row = "ql_quantiles"
-    else:
-        raise AttributeError('data origin is needed')
+    rating = int(standardize_ratings([raw_rating], data_origin)[0])
 
-    quantiles = standardize_values[["quantile nr", name_of_data_row]]
+    coordinate_to_standardize.set_rating(rating)
 
-    quantiles_value_appended = (
-        quantiles.append({"quantile nr": float("-1"), name_of_data_row: float(raw_rating)}, ignore_index=True)
-            .sort_values(by=name_of_data_row)
-            .reset_index(drop=True))
+    return coordinate_to_standardize
 
-    rating = quantiles_value_appended[(quantiles_value_appended["quantile nr"] == -1)].index[0] + 1
 
-    coordinate_to_standardize.set_rating(rating)
+def load_database_standardizer():
+    ################################################################################################################
+    # Rückgabe:             dict mit den (aufsteigend sortierten) Quantilen je Datenquelle, z.B. {"srs": [...], "ql": [...]}
+    #
+    # Beschreibung:
+    # Liest die 'database_standardizer.csv' im internal Ordner nur beim ersten Aufruf im Prozess ein und hält die
+    # Quantile danach in '_standardizer' vor. Falls die Datei nicht geöffnet werden kann, wird
+    # 'update_database_standardizer' angefordert und der Einleseversuch dann widerholt
+    ################################################################################################################
+    global _standardizer
+
+    if _standardizer is None:
+        try:
+            standardize_values = pd.read_csv('internal/database_standardizer.csv')[
+                ["quantile nr", "srs_quantiles", "ql_quantiles"]]
+        except IOError:
+            update_database_standardizer()
+            standardize_values = pd.read_csv('internal/database_standardizer.csv')[
+                ["quantile nr", "srs_quantiles", "ql_quantiles"]]
+
+        _standardizer = {
+            "srs": np.sort(standardize_values["srs_quantiles"].values.astype(float)),
+            "ql": np.sort(standardize_values["ql_quantiles"].values.astype(float))
+        }
 
-    return coordinate_to_standardize
+    return _standardizer
+
+
+@instrumented("standardize")
+def standardize_ratings(raw_ratings, data_origin):
+    ################################################################################################################
+    # Eingangsparameter:    Liste oder Array von rohen Ratings
+    #                       Quelle der rohen Ratings: "srs" / "ql" für alle Ratings, oder eine Liste/ein Array mit
+    #                       der Quelle für jedes einzelne Rating
+    #
+    # Rückgabe:             numpy-Array mit dem standardisierten Rating (1-7) für jedes rohe Rating
+    #
+    # Beschreibung:
+    # Wie 'standardize', aber für beliebig viele Ratings in einem Durchlauf: Statt das Rating in die Tabelle der
+    # Quantile einzusortieren, wird über eine binäre Suche gezählt, wie viele Quantile kleiner oder gleich dem Rating
+    # sind. Das ergibt genau die Stelle, an der das einsortierte Rating stehen würde (bei Gleichstand hinter dem
+    # Quantil, d.h. ein Rating genau auf dem Grenzwert für Rating 3 bekommt Rating 4). Ratings ohne Wert (NaN)
+    # bekommen, wie beim Einsortieren, Rating 7.
+    ################################################################################################################
+    quantiles = load_database_standardizer()
+    raw_ratings = np.asarray(raw_ratings, dtype=float)
 
+    if isinstance(data_origin, str):
+        if data_origin not in quantiles:
+            raise AttributeError('data origin is needed')
+        return np.searchsorted(quantiles[data_origin], raw_ratings, side="right") + 1
+
+    data_origin = np.asarray(data_origin)
+    if not np.isin(data_origin, list(quantiles)).all():
+        raise AttributeError('data origin is needed')
 
+    ratings = np.zeros(len(raw_ratings), dtype=np.int64)
+    for origin, origin_quantiles in quantiles.items():
+        from_origin = data_origin == origin
+        ratings[from_origin] = np.searchsorted(origin_quantiles, raw_ratings[from_origin], side="right") + 1
+    return ratings
+
+
+@instrumented("snapping")
 def snap_ratings_to_route(path_coordinate_list):
     ################################################################################################################
-    # Eingangsparameter:        Liste an Coordinate-Objekten, die eine Route bilden
+    # Eingangsparameter:        RatedRoute (oder Liste an Coordinate-Objekten), die eine Route bilden
     # Ausgangsparameter:        Tupel, welches enthält:
-    #                               - Liste an Coordinate-Objekten, die eine Route bilden und die dazugehörige Straßen-
-    #                               qualität sowie Details zum Ablauf des Vorgangs beinhalten
+    #                               - RatedRoute, die die Route bildet und die dazugehörige Straßen-
+    #                               qualität sowie Details zum Ablauf des Vorgangs beinhaltet
     #                               - Der Durchschnitt der Distanz von den Punkten der Route zu dem jeweils nächsten
     #                               gefundenen Rating
     #                               - Die maximale Distanz von den Punkten der Route zu dem jeweils nächsten
     #                               gefundenen Rating
-    #                               - Eine Liste von Rectangle-Objekten (matplotlib.pyplot), die von der Funktion
+    #                               - Eine Liste von Rectangle-Objekten (siehe Rectangle), die von der Funktion
     #                               give_ratings_near_path weitergegeben wird
     #
     # Diese Methode sucht für jeden Punkt einer Route das jeweils nächste Rating in einem Bereich und fügt die Rating-
-    # informationen sowie Informationen über den Vorgang in diese Wegpunkte (Coordinate-Objekte) ein.
+    # informationen sowie Informationen über den Vorgang in eine Kopie der Route ein.
     # - Schritt 1: Nahe Ratings abfragen und in Variable speichern
     # - Schritt 2: Für jeden Punkt auf der Route das nächste Rating finden und Informationen in Punkt speichern
     #               Dazu wird für jeden Punkt r auf der Route jeder Punkt c aus den nahen Ratings auf seine Nähe zu
     #               r geprüft, und dann für r die Daten des nächsten ermittelten Ratings c gespeichert sowie weitere
     #               Informationen hinterlegt (die Info, von welchem anderen Coordinate-Objekt das Rating eigentlich
     #               stammt sowie die Distanz zu diesem)
-    # - Wurden alle Routenpunkte durchlaufen, wird u.a. die veränderte Liste dieser Routen-Coordinate-Objekte zurück-
-    # gegeben
+    # - Wurden alle Routenpunkte durchlaufen, wird u.a. die Route mit den übernommenen Ratings zurückgegeben
     ################################################################################################################
 
     # Schritt 1: Nahe Ratings abfragen und in Variable speichern
-    give_ratings_near_path_result = give_ratings_near_path(path_coordinate_list)
+    route = RatedRoute.from_path(path_coordinate_list).copy()
+    give_ratings_near_path_result = give_ratings_near_path(route)
     rating_coordinates = give_ratings_near_path_result[0]
 
     # Schritt 2: Für jeden Punkt auf der Route das nächste Rating finden und Informationen in Punkt speichern
 
-    distances = []
-    for r in path_coordinate_list:
-        closest = ()
-        for c in rating_coordinates:
-            distance = r.calc_distance_to_other_point(c)
-
-            if closest == ():
-                closest = (distance, c)
-            elif closest[0] > distance:
-                closest = (distance, c)
-
-        closest_rating_standardised = closest[1].get_rating()
-        closest_rating_raw = closest[1].get_rating(False)
-        closest_rating_raw_data_source = closest[1].get_rating(False, True)[1]
-        closest_rating_distance = closest[0]
-        closest_rating_coordinate = closest[1].get_coordinates()
-        r.set_snapping_info(closest_rating_distance, closest_rating_coordinate)
-        r.set_rating(closest_rating_standardised, closest_rating_raw, closest_rating_raw_data_source)
-
-        distances.append(closest_rating_distance)
-
-    return path_coordinate_list, pd.Series(distances).mean(), pd.Series(distances).max(), \
+    _instrumentation.count("rating_candidates", len(rating_coordinates))
+    rating_index = RatingIndex(rating_coordinates)
+    if len(rating_index) == 0:
+        raise IndexError("Im Umfeld der Route wurden keine Straßenzustände gefunden")
+
+    closest_indices, closest_distances = rating_index.query(route.lat, route.long)
+
+    # Jedes gefundene Rating wird nur einmal ausgelesen, auch wenn es für mehrere Routenpunkte das nächste ist
+    found_indices, closest_of_point = np.unique(closest_indices, return_inverse=True)
+    found = [rating_coordinates[i] for i in found_indices]
+    closest_rating_standardised = np.array([c.get_rating() for c in found], dtype=float)
+    closest_rating_raw = np.array([c.get_rating(False) for c in found], dtype=float)
+    closest_rating_raw_data_source = np.array([c.get_rating(False, True)[1] for c in found])
+
+    route.set_snapping_info(closest_distances, rating_index.lats[closest_indices], rating_index.longs[closest_indices])
+    route.set_rating(closest_rating_standardised[closest_of_point], closest_rating_raw[closest_of_point],
+                     closest_rating_raw_data_source[closest_of_point])
+
+    return route, pd.Series(closest_distances).mean(), pd.Series(closest_distances).max(), \
            give_ratings_near_path_result[1]
 
 
+# Vorberechnetes Raster der standardisierten Ratings (siehe build_rating_raster): Ordner, Anzahl der Zellen pro
+# Kachelkante (je Kachel von SRS_TILE_DEGREES Grad, 100 -> Zellen von ca. 110 m x 80 m in Italien) und Radius in km,
+# in dem für jede Zelle nach Ratings gesucht wird
+RATING_RASTER_DIRECTORY = "internal/rating_raster"
+RATING_RASTER_CELLS_PER_TILE = 100
+RATING_RASTER_SEARCH_KM = RATING_CORRIDOR_KM
+
+# Größter erlaubter Fehler in km beim Nachschlagen im Raster (siehe lookup_rating_raster):
+#   - Distanz: Die Distanz der Zellmitte zum nächsten Rating weicht höchstens so weit von der des Routenpunktes ab
+#   - Rating: Das Rating darf von einem Messpunkt stammen, der höchstens so viel weiter entfernt liegt als der
+#   nächste (bei 0 nur dort, wo das Rating sicher dasselbe ist wie bei der exakten Suche)
+RATING_RASTER_MAX_DISTANCE_ERROR_KM = 0.1
+RATING_RASTER_MAX_RATING_ERROR_KM = 0.0
+
+# Raster in snap_route nutzen, falls ein zur Datenbank passendes Raster gebaut wurde
+RATING_RASTER_ENABLED = True
+
+# Pro Prozess geladene (memory-mapped) Raster je Ordner des Rasters und der Datenbank (None, wenn keines vorhanden
+# oder veraltet)
+_rating_rasters = {}
+
+
+def build_rating_raster(raster_directory=None, store_directory=None, include_ql=False, cells_per_tile=None,
+                        search_km=None):
+    ################################################################################################################
+    # Eingabeparameter:     optional: Ordner des Rasters und der binären SmartRoadSense-Datenbank, Sollen die
+    #                       Queensland-Datensätze einbezogen werden?, Zellen pro Kachelkante, Suchradius in km
+    # Rückgabe:             dict mit den Metadaten des Rasters (wie in 'metadata.json')
+    #
+    # Beschreibung:
+    # Einmaliger Vorberechnungsschritt (wie convert_database_srs), danach muss er nur nach einer Änderung der
+    # Datenbank oder des Standardizers wiederholt werden (siehe load_rating_raster).
+    # Das Raster besteht aus denselben Kacheln wie die binäre Datenbank (SRS_TILE_DEGREES), und zwar aus allen Kacheln
+    # mit Messpunkten und ihren Nachbarn im Suchradius. Jede Kachel ist in cells_per_tile x cells_per_tile Zellen
+    # eingeteilt. Für die Mitte jeder Zelle wird die Distanz zum nächsten Messpunkt jedes standardisierten Ratings
+    # (1-7) berechnet (siehe RatingIndex, nur Messpunkte im Suchradius) und gespeichert:
+    #   - "level": standardisiertes Rating des nächsten Messpunktes (0, wenn im Suchradius keiner liegt)
+    #   - "distance": Distanz zu diesem Messpunkt in m
+    #   - "margin": Abstand in m, um den der nächste Messpunkt mit einem anderen Rating weiter entfernt ist (höchstens
+    #   bis zum Suchradius, abgerundet)
+    # Dazu "tile_keys" (Nummern der Kacheln, aufsteigend, siehe srs_tile_keys) und 'metadata.json' mit der Version
+    # der Datenbank (siehe give_database_srs_version), der Anzahl der Datensätze und den Quantilen, mit denen das
+    # Raster gebaut wurde.
+    # Ohne Queensland-Datensätze werden Kacheln, deren Suchradius QL_EXTENT berührt, weggelassen. Dort wird dann
+    # immer exakt gesucht. Mit Queensland-Datensätzen (einmal über die API bzw. den Kachel-Cache abgefragt) werden
+    # spätere Änderungen an der Queensland-Datenbank nicht erkannt.
+    ################################################################################################################
+    raster_directory = raster_directory or RATING_RASTER_DIRECTORY
+    cells_per_tile = cells_per_tile or RATING_RASTER_CELLS_PER_TILE
+    search_km = search_km or RATING_RASTER_SEARCH_KM
+
+    store = load_database_srs(store_directory)
+    lats, longs = [np.asarray(store["latitude"])], [np.asarray(store["longitude"])]
+    levels = [np.asarray(give_standardised_ratings_srs(store))]
+    ql_rows = 0
+    if include_ql:
+        (lat_from, lat_to), (long_from, long_to) = QL_EXTENT
+        ql_lats, ql_longs, iri_roughness = give_rated_area_ql_arrays(Coordinate(lat_from, long_from),
+                                                                     Coordinate(lat_to, long_to))
+        lats.append(ql_lats)
+        longs.append(ql_longs)
+        levels.append(standardize_ratings(iri_roughness, "ql").astype(np.int8))
+        ql_rows = len(ql_lats)
+    lats, longs, levels = np.concatenate(lats), np.concatenate(longs), np.concatenate(levels)
+
+    # Messpunkte nach Kacheln sortieren, wie in write_database_srs_store
+    keys = srs_tile_keys(lats, longs)
+    sorting = np.argsort(keys, kind="stable")
+    lats, longs, levels, keys = lats[sorting], longs[sorting], levels[sorting], keys[sorting]
+    site_tiles, site_starts = np.unique(keys, return_index=True)
+    site_starts = np.append(site_starts, len(keys))
+
+    # Kacheln mit Messpunkten und alle Nachbarn, die im Suchradius liegen
+    max_abs_lat = min(float(np.abs(lats).max()) + SRS_TILE_DEGREES, 89.9) if len(lats) else 0.0
+    search_lat = search_km / 111.3
+    search_long = search_km / (math.cos(math.radians(max_abs_lat)) * 111.3)
+    reach_rows = int(math.ceil(search_lat / SRS_TILE_DEGREES))
+    reach_cols = int(math.ceil(search_long / SRS_TILE_DEGREES))
+    offsets = [row * SRS_TILE_COLUMN_COUNT + col
+               for row in range(-reach_rows, reach_rows + 1) for col in range(-reach_cols, reach_cols + 1)]
+    tile_keys = np.unique((site_tiles[:, None] + np.array(offsets, dtype=np.int64)[None, :]).reshape(-1))
+
+    tile_rows, tile_cols = np.divmod(tile_keys, SRS_TILE_COLUMN_COUNT)
+    tile_lats = tile_rows * SRS_TILE_DEGREES - 90
+    tile_longs = tile_cols * SRS_TILE_DEGREES - 180
+    if not include_ql:
+        (ql_lat_from, ql_lat_to), (ql_long_from, ql_long_to) = QL_EXTENT
+        near_ql = ((tile_lats - search_lat <= ql_lat_to) & (tile_lats + SRS_TILE_DEGREES + search_lat >= ql_lat_from) &
+                   (tile_longs - search_long <= ql_long_to) &
+                   (tile_longs + SRS_TILE_DEGREES + search_long >= ql_long_from))
+        tile_keys, tile_rows, tile_cols = tile_keys[~near_ql], tile_rows[~near_ql], tile_cols[~near_ql]
+        tile_lats, tile_longs = tile_lats[~near_ql], tile_longs[~near_ql]
+
+    cell_degrees = SRS_TILE_DEGREES / cells_per_tile
+    cell_offsets = (np.arange(cells_per_tile) + 0.5) * cell_degrees
+    raster_level = np.zeros((len(tile_keys), cells_per_tile, cells_per_tile), dtype=np.int8)
+    raster_distance = np.full(raster_level.shape, np.iinfo(np.uint16).max, dtype=np.uint16)
+    raster_margin = np.zeros(raster_level.shape, dtype=np.uint16)
+
+    for tile, (tile_row, tile_col, tile_lat, tile_long) in enumerate(zip(tile_rows, tile_cols, tile_lats, tile_longs)):
+        # Messpunkte in den Nachbarkacheln, die höchstens den Suchradius von der Kachel entfernt liegen
+        row_keys = np.arange(tile_row - reach_rows, tile_row + reach_rows + 1) * SRS_TILE_COLUMN_COUNT
+        first_tiles = np.searchsorted(site_tiles, row_keys + tile_col - reach_cols, side="left")
+        last_tiles = np.searchsorted(site_tiles, row_keys + tile_col + reach_cols, side="right")
+        candidates = np.concatenate([np.arange(site_starts[first], site_starts[last])
+                                     for first, last in zip(first_tiles, last_tiles)])
+        near = ((lats[candidates] >= tile_lat - search_lat) &
+                (lats[candidates] <= tile_lat + SRS_TILE_DEGREES + search_lat) &
+                (longs[candidates] >= tile_long - search_long) &
+                (longs[candidates] <= tile_long + SRS_TILE_DEGREES + search_long))
+        candidates = candidates[near]
+        if len(candidates) == 0:
+            continue
+
+        center_lats = np.repeat(tile_lat + cell_offsets, cells_per_tile)
+        center_longs = np.tile(tile_long + cell_offsets, cells_per_tile)
+
+        # Distanz jeder Zellmitte zum nächsten Messpunkt jedes Ratings (unendlich, wenn es keinen gibt)
+        level_distances = np.full((7, len(center_lats)), np.inf)
+        for level in range(1, 8):
+            of_level = candidates[levels[candidates] == level]
+            if len(of_level):
+                level_index = RatingIndex.from_arrays(lats[of_level], longs[of_level], cell_size_km=search_km)
+                level_distances[level - 1] = level_index.query(center_lats, center_longs)[1]
+
+        nearest_level = np.argmin(level_distances, axis=0)
+        level_distances.sort(axis=0)
+        nearest, second = level_distances[0], np.minimum(level_distances[1], search_km)
+
+        # Außerhalb des Suchradius kann ein nicht abgefragter Messpunkt näher liegen
+        in_search = nearest <= search_km
+        raster_level[tile] = np.where(in_search, nearest_level + 1, 0).reshape(cells_per_tile, cells_per_tile)
+        raster_distance[tile] = np.where(in_search, np.round(np.minimum(nearest, search_km) * 1000), 65535) \
+            .reshape(cells_per_tile, cells_per_tile)
+        raster_margin[tile] = np.where(in_search, np.floor(np.maximum(second - nearest, 0) * 1000), 0) \
+            .reshape(cells_per_tile, cells_per_tile)
+
+    quantiles = load_database_standardizer()
+    metadata = {
+        "srs_version": store["version"],
+        "srs_rows": int(len(store["ppe"])),
+        "ql_rows": ql_rows,
+        "include_ql": bool(include_ql),
+        "quantiles": {origin: [float(q) for q in values] for origin, values in quantiles.items()},
+        "tile_degrees": SRS_TILE_DEGREES,
+        "cells_per_tile": int(cells_per_tile),
+        "search_km": float(search_km),
+        "tiles": int(len(tile_keys))
+    }
+
+    # Wie in write_database_srs_store zuerst unter temporärem Namen schreiben, die Metadaten zum Schluss
+    files = {"tile_keys": tile_keys.astype(np.int64), "level": raster_level, "distance": raster_distance,
+             "margin": raster_margin}
+    os.makedirs(raster_directory, exist_ok=True)
+    for name, values in files.items():
+        temp_path = os.path.join(raster_directory, name + ".tmp.npy")
+        np.save(temp_path, values)
+        os.replace(temp_path, os.path.join(raster_directory, name + ".npy"))
+    temp_path = os.path.join(raster_directory, "metadata.json.tmp")
+    with open(temp_path, "w") as file:
+        json.dump(metadata, file)
+    os.replace(temp_path, os.path.join(raster_directory, "metadata.json"))
+
+    for key in [key for key in _rating_rasters if key[0] == raster_directory]:
+        del _rating_rasters[key]
+    return metadata
+
+
+def load_rating_raster(raster_directory=None, store_directory=None):
+    ################################################################################################################
+    # Eingabeparameter:     optional: Ordner des Rasters und der binären SmartRoadSense-Datenbank
+    # Rückgabe:             dict mit den Dateien des Rasters (memory-mapped, siehe build_rating_raster) und den
+    #                       Metadaten, oder None
+    #
+    # Beschreibung:
+    # Wie load_database_srs wird das Raster nur beim ersten Aufruf im Prozess geöffnet. Es wird aber nie automatisch
+    # gebaut: Fehlt es oder passt es nicht mehr zur Datenbank (andere Version, also nach jedem Schreiben der Datenbank,
+    # z.B. durch update_database_srs, auch wenn die Anzahl der Datensätze gleich bleibt) oder zum Standardizer (andere
+    # Quantile), wird None zurückgegeben und exakt gesucht.
+    ################################################################################################################
+    raster_directory = raster_directory or RATING_RASTER_DIRECTORY
+    key = (raster_directory, store_directory or SRS_STORE_DIRECTORY)
+
+    if key not in _rating_rasters:
+        raster = None
+        metadata_path = os.path.join(raster_directory, "metadata.json")
+        paths = {name: os.path.join(raster_directory, name + ".npy")
+                 for name in ["tile_keys", "level", "distance", "margin"]}
+        if os.path.exists(metadata_path) and all(os.path.exists(path) for path in paths.values()):
+            with open(metadata_path) as file:
+                metadata = json.load(file)
+            quantiles = {origin: [float(q) for q in values] for origin, values in load_database_standardizer().items()}
+            store = load_database_srs(store_directory)
+            if (metadata.get("srs_version") == store["version"] and metadata["srs_rows"] == len(store["ppe"]) and
+                    metadata["quantiles"] == quantiles and metadata["tile_degrees"] == SRS_TILE_DEGREES):
+                raster = {name: np.load(path, mmap_mode="r") for name, path in paths.items()}
+                raster["metadata"] = metadata
+        _rating_rasters[key] = raster
+
+    return _rating_rasters[key]
+
+
+def lookup_rating_raster(raster, lats, longs, max_distance_error_km=None, max_rating_error_km=None):
+    ################################################################################################################
+    # Eingabeparameter:     Raster (siehe load_rating_raster), Breiten- und Längengrade der Routenpunkte
+    #                       optional: größter erlaubter Fehler der Distanz und des Ratings in km (Standard:
+    #                       RATING_RASTER_MAX_DISTANCE_ERROR_KM und RATING_RASTER_MAX_RATING_ERROR_KM)
+    # Rückgabe:             Tupel aus drei Arrays: standardisiertes Rating, Distanz zum nächsten Rating in km und ob
+    #                       der Routenpunkt über das Raster beantwortet werden kann
+    #
+    # Beschreibung:
+    # Für jeden Routenpunkt wird die Zelle direkt aus seinen Koordinaten berechnet (Kachel über binäre Suche in
+    # "tile_keys"). Liegt der Routenpunkt höchstens h (halbe Zelldiagonale) von der Zellmitte entfernt, so gilt
+    # (Dreiecksungleichung):
+    #   - Die Distanz des Routenpunktes zum nächsten Rating weicht höchstens um h von der der Zellmitte ab
+    #   - Ist jeder Messpunkt mit einem anderen Rating von der Zellmitte mehr als 2h weiter entfernt als der nächste
+    #   ("margin"), hat auch der nächste Messpunkt des Routenpunktes dasselbe Rating
+    #   - Sonst stammt das Rating von einem Messpunkt, der höchstens 2h weiter entfernt liegt als der nächste
+    # Ein Routenpunkt wird nur dann über das Raster beantwortet, wenn beide Fehler im erlaubten Bereich liegen und in
+    # seiner Zelle ein Rating im Suchradius liegt. Alle anderen müssen exakt gesucht werden (siehe snap_route).
+    ################################################################################################################
+    if max_distance_error_km is None:
+        max_distance_error_km = RATING_RASTER_MAX_DISTANCE_ERROR_KM
+    if max_rating_error_km is None:
+        max_rating_error_km = RATING_RASTER_MAX_RATING_ERROR_KM
+
+    lats = np.asarray(lats, dtype=float)
+    longs = np.asarray(longs, dtype=float)
+    cells_per_tile = raster["metadata"]["cells_per_tile"]
+    tile_keys = raster["tile_keys"]
+
+    if len(tile_keys) == 0:
+        return np.zeros(len(lats), dtype=np.int64), np.full(len(lats), np.inf), np.zeros(len(lats), dtype=bool)
+
+    keys = srs_tile_keys(lats, longs)
+    positions = np.minimum(np.searchsorted(tile_keys, keys), len(tile_keys) - 1)
+    in_raster = tile_keys[positions] == keys
+    positions[~in_raster] = 0
+
+    tile_rows, tile_cols = np.divmod(keys, SRS_TILE_COLUMN_COUNT)
+    cell_rows = np.clip(np.floor(((lats + 90) / SRS_TILE_DEGREES - tile_rows) * cells_per_tile).astype(np.int64),
+                        0, cells_per_tile - 1)
+    cell_cols = np.clip(np.floor(((longs + 180) / SRS_TILE_DEGREES - tile_cols) * cells_per_tile).astype(np.int64),
+                        0, cells_per_tile - 1)
+
+    levels = np.where(in_raster, raster["level"][positions, cell_rows, cell_cols], 0).astype(np.int64)
+    distances = raster["distance"][positions, cell_rows, cell_cols] / 1000
+    margins = raster["margin"][positions, cell_rows, cell_cols] / 1000
+
+    # Halbe Zelldiagonale in km (wie in calc_distance_to_other_point), mit Sicherheitsabstand für die Rundung auf m
+    # und die Umrechnung der Längengrade mit dem Breitengrad des Routenpunktes statt dem der Zellmitte
+    cell_degrees = SRS_TILE_DEGREES / cells_per_tile
+    half_diagonal = 0.5 * np.hypot(cell_degrees * 111.3, cell_degrees * np.cos(np.radians(lats)) * 111.3)
+    half_diagonal = half_diagonal * (1 + 1e-3) + 0.001
+
+    rating_certain = (margins > 2 * half_diagonal) | (2 * half_diagonal <= max_rating_error_km)
+    direct = (levels > 0) & rating_certain & (half_diagonal <= max_distance_error_km)
+    return levels, distances, direct
+
+
+@instrumented("snapping")
+def snap_route(route, search_km=None, maximum_search_km=None, raster=None):
+    ################################################################################################################
+    # Eingangsparameter:    Die ganze Route: RatedRoute, Liste an Coordinate-Objekten oder Liste von Sektionen (wie
+    #                       von find_path zurückgegeben)
+    #                       optional: Suchradius in km (Standard: RATING_CORRIDOR_KM) und größter Suchradius in km
+    #                       (Standard: SNAP_MAXIMUM_SEARCH_KM)
+    #                       optional: Raster (siehe load_rating_raster), Standard: das gebaute Raster, falls
+    #                       RATING_RASTER_ENABLED; False für die exakte Suche für alle Routenpunkte
+    # Rückgabe:             Tupel, welches enthält:
+    #                           - RatedRoute mit den übernommenen Ratings (wie bei snap_ratings_to_route), ohne
+    #                           Routenpunkte, für die auch im größten Suchradius kein Rating gefunden wurde
+    #                           - dict mit Statistiken: "mean_distance" und "max_distance" (Abstand der Routenpunkte
+    #                           zum jeweils nächsten Rating in km), "candidates" (Anzahl der abgefragten Ratings),
+    #                           "search_rounds" (Anzahl der Abfragen), "unrated_points" (Anzahl der Routenpunkte
+    #                           ohne Rating), "unrated_distance" (Länge der Segmente in km, die an einem Routenpunkt
+    #                           ohne Rating beginnen oder enden und daher mit den Ratings der benachbarten Punkte
+    #                           bepreist werden) und "raster_points" (Anzahl der Routenpunkte, die über das Raster
+    #                           beantwortet wurden)
+    #                           - Liste von Rectangle-Objekten (siehe Rectangle) für die grafische Darstellung
+    #
+    # Beschreibung:
+    # Wie snap_ratings_to_route für jede Sektion, aber für die ganze Route auf einmal und ohne Puffer:
+    # - Schritt 1: Alle Ratings im Korridor um die Route abfragen (siehe give_rated_corridor) und für jeden
+    #       Routenpunkt das nächste Rating finden (siehe RatingIndex).
+    # - Schritt 2: Nur für die Routenpunkte, deren nächstes Rating weiter als der Suchradius entfernt ist (oder die
+    #       gar keines haben), wird der Suchradius verdoppelt und erneut abgefragt, bis alle Routenpunkte ein Rating
+    #       haben oder der größte Suchradius erreicht ist.
+    # Ein Rating gilt dabei erst als das nächste, wenn es innerhalb des Suchradius liegt (mit einem kleinen
+    # Abstand zum Rand, siehe SNAP_RESOLVED_RADIUS_FRACTION), da außerhalb noch nicht alle Ratings abgefragt wurden.
+    # Im Gegensatz zum bisherigen Puffer werden Sektionen ohne Ratings also nicht mit der nächsten Sektion erneut
+    # abgefragt und gesnappt, und Routenpunkte am Ende der Route gehen nicht verloren, solange es im größten
+    # Suchradius ein Rating gibt.
+    # Gibt es ein vorberechnetes Raster (siehe build_rating_raster), werden zuvor alle Routenpunkte dort
+    # nachgeschlagen, und nur die, bei denen der erlaubte Fehler überschritten würde (siehe lookup_rating_raster),
+    # werden wie oben exakt gesucht. Routenpunkte aus dem Raster haben kein rohes Rating (-1, Quelle "-1") und keine
+    # Koordinaten des Messpunktes (NaN), als Distanz wird die der Zellmitte übernommen.
+    ################################################################################################################
+    if isinstance(route, (list, tuple)) and route and isinstance(route[0], RatedRoute):
+        route = RatedRoute.concatenate(route)
+    route = RatedRoute.from_path(route).copy()
+    search_km = search_km or RATING_CORRIDOR_KM
+    maximum_search_km = max(maximum_search_km or SNAP_MAXIMUM_SEARCH_KM, search_km)
+
+    rectangles = []
+    if len(route):
+        lat1, long1 = float(route.lat.min()), float(route.long.min())
+        lat2, long2 = float(route.lat.max()), float(route.long.max())
+        rectangles.append(Rectangle((long1, lat1), long2 - long1, lat2 - lat1, ec="black"))
+
+    rating_coordinates = []
+    closest_indices = np.full(len(route), -1, dtype=np.int64)
+    closest_distances = np.full(len(route), np.inf)
+    resolved = np.zeros(len(route), dtype=bool)
+
+    if raster is None and RATING_RASTER_ENABLED:
+        raster = load_rating_raster()
+    raster_levels = np.zeros(len(route), dtype=np.int64)
+    raster_distances = np.full(len(route), np.inf)
+    if raster:
+        raster_levels, raster_distances, resolved = lookup_rating_raster(raster, route.lat, route.long)
+    from_raster = resolved.copy()
+
+    radius = search_km
+    search_rounds = 0
+
+    # Position jedes bereits gefundenen Ratings in rating_coordinates, damit es in späteren Runden nicht erneut
+    # hinzugefügt wird
+    known_positions = {}
+
+    while not resolved.all():
+        unresolved = np.flatnonzero(~resolved)
+        search_rounds += 1
+
+        # Korridor um jede Folge zusammenhängender offener Routenpunkte, nicht entlang von Sehnen zwischen weit
+        # auseinanderliegenden offenen Punkten
+        found, boxes = give_rated_corridor(route, radius, give_index_runs(unresolved))
+        for lat_from, lat_to, long_from, long_to, first_point, last_point in boxes:
+            rectangles.append(Rectangle((long_from, lat_from), long_to - long_from, lat_to - lat_from, ec="red"))
+        positions = []
+        for coordinate in found:
+            rating_raw, rating_source = coordinate.get_rating(False, True)
+            key = (coordinate.lat, coordinate.long, rating_raw, rating_source)
+            if key not in known_positions:
+                known_positions[key] = len(rating_coordinates)
+                rating_coordinates.append(coordinate)
+            positions.append(known_positions[key])
+
+        if positions:
+            positions = np.unique(positions)
+            candidates = [rating_coordinates[i] for i in positions]
+            indices, distances = RatingIndex(candidates).query(route.lat[unresolved], route.long[unresolved])
+            closer = distances < closest_distances[unresolved]
+            closest_indices[unresolved[closer]] = positions[indices[closer]]
+            closest_distances[unresolved[closer]] = distances[closer]
+
+        resolved |= closest_distances <= radius * SNAP_RESOLVED_RADIUS_FRACTION
+        if radius >= maximum_search_km:
+            break
+        radius = min(radius * 2, maximum_search_km)
+
+    _instrumentation.count("rating_candidates", len(rating_coordinates))
+
+    # Im größten Suchradius wird jedes gefundene Rating übernommen, das höchstens so weit entfernt ist
+    rated = (closest_distances <= maximum_search_km) | from_raster
+    snapped_route = route[rated]
+    searched = closest_indices[rated] >= 0
+    distances = np.where(searched, closest_distances[rated], raster_distances[rated])
+
+    # Jedes gefundene Rating wird nur einmal ausgelesen, auch wenn es für mehrere Routenpunkte das nächste ist
+    found_indices, closest_of_point = np.unique(closest_indices[rated][searched], return_inverse=True)
+    found = [rating_coordinates[i] for i in found_indices]
+    closest_lat = np.array([c.lat for c in found], dtype=float)
+    closest_long = np.array([c.long for c in found], dtype=float)
+    closest_rating_standardised = np.array([c.get_rating() for c in found], dtype=float)
+    closest_rating_raw = np.array([c.get_rating(False) for c in found], dtype=float)
+    closest_rating_raw_data_source = np.array([c.get_rating(False, True)[1] for c in found], dtype="<U3")
+
+    # Routenpunkte aus dem Raster: nur standardisiertes Rating und Distanz
+    snapped_lat = np.full(len(snapped_route), np.nan)
+    snapped_long = np.full(len(snapped_route), np.nan)
+    rating_standardised = raster_levels[rated].astype(float)
+    rating_raw = np.full(len(snapped_route), -1.0)
+    rating_raw_data_source = np.full(len(snapped_route), "-1", dtype="<U3")
+    snapped_lat[searched] = closest_lat[closest_of_point]
+    snapped_long[searched] = closest_long[closest_of_point]
+    rating_standardised[searched] = closest_rating_standardised[closest_of_point]
+    rating_raw[searched] = closest_rating_raw[closest_of_point]
+    rating_raw_data_source[searched] = closest_rating_raw_data_source[closest_of_point]
+
+    snapped_route.set_snapping_info(distances, snapped_lat, snapped_long)
+    snapped_route.set_rating(rating_standardised, rating_raw, rating_raw_data_source)
+
+    statistics = {
+        "mean_distance": float(distances.mean()) if len(distances) else float("nan"),
+        "max_distance": float(distances.max()) if len(distances) else float("nan"),
+        "candidates": len(rating_coordinates),
+        "search_rounds": search_rounds,
+        "unrated_points": int((~rated).sum()),
+        "unrated_distance": float(route.calc_segment_distances()[~(rated[:-1] & rated[1:])].sum()),
+        "raster_points": int(from_raster.sum())
+    }
+    return snapped_route, statistics, rectangles
+
+
+@instrumented("pricing")
 def price_rated_route(rated_path, number_of_tires, tire_price=300, tire_best_range=75000, tire_worst_range=10000,
                       margin_percent=0.3):
     ################################################################################################################
-    # Eingangsparameter:                - Liste an Coordinate-Objekten, die eine Route bilden
+    # Eingangsparameter:                - RatedRoute (oder Liste an Coordinate-Objekten), die eine Route bilden
     #                                   - Anzahl der gemieteten Reifen
     #                                   - Einkaufspreis der Reifen für den Betreiber
     #                                   - Die Lebenserwartung eines Reifen unter bestmöglichen Umständen (also
@@ -731,118 +3157,637 @@ def price_rated_route(rated_path, number_of_tires, tire_price=300, tire_best_ran
     # wurde durch diese Fahrt verbraucht) und das Ganze wird dann mit dem Preis pro Reifen multipliziert
     # z.B.: Halbe Lebenszeit abgefahren => Halber Preis eines Neureifens verschlissen
     # Nun wird noch die Anzahl der Reifen multipliziert und dann noch die Marge aufgeschlagen
+    #
+    # Die Berechnung selbst übernehmen 'calc_weighted_rating' (Schritt 1) und 'calc_price' (Schritt 2), die auch von
+    # 'price_rated_routes' für viele Routen auf einmal genutzt werden.
     ################################################################################################################
     # Schritt 1: Nach Länge des Streckenabschnitts gewichtetes Durchschnittsrating ermitteln
-    dist = []
-    rating_sub_section = []
-    i = 0
-    while i < (len(rated_path) - 1):
-        # Liste der Distanzen erstellen
-        d = rated_path[i].calc_distance_to_other_point(rated_path[i + 1])
-        dist.append(d)
-        # Liste der Ratings der Teilstrecken erstellen
-        r1 = rated_path[i].get_rating()
-        r2 = rated_path[i + 1].get_rating()
-        rating_sub_section.append((r1 + r2) / 2)
-        i = i + 1
-    temp_weight = 0.0
-    total_distance = 0.0
-    for i in range(0, len(dist)):
-        temp_weight += dist[i] * rating_sub_section[i]
-        total_distance += dist[i]
+    rated_path = RatedRoute.from_path(rated_path)
+    temp_weight, total_distance = calc_weighted_rating(rated_path.lat, rated_path.long, rated_path.get_rating())
+    temp_weight, total_distance = float(temp_weight[0]), float(total_distance[0])
     average_rating = temp_weight / total_distance
 
-
     # Schritt 2: Bepreisung nach average_rating und Streckenlänge
+    customer_end_price, price_without_margin, price_per_tire_without_margin, \
+        expected_lifetime_range_at_specific_rating = \
+        [float(value) for value in calc_price(average_rating, total_distance, number_of_tires, tire_price,
+                                              tire_best_range, tire_worst_range, margin_percent)]
+
+    return ([customer_end_price, price_without_margin, price_per_tire_without_margin], [average_rating, total_distance],
+            expected_lifetime_range_at_specific_rating)
+
+
+def calc_weighted_rating(lats, longs, ratings, route_starts=(0,)):
+    ################################################################################################################
+    # Eingangsparameter:    Breitengrade, Längengrade und standardisierte Ratings der Routenpunkte (Arrays)
+    #                       optional: Position des ersten Punktes jeder Route, falls mehrere Routen hintereinander
+    #                       in den Arrays stehen (Standard: nur eine Route)
+    # Rückgabe:             Tupel aus zwei Arrays (ein Eintrag pro Route):
+    #                           - Summe der Teilstrecken-Längen mal Teilstrecken-Rating
+    #                           - Gesamtlänge der Route
+    #
+    # Beschreibung:
+    # Schritt 1 aus 'price_rated_route' für alle Teilstrecken aller Routen in einem Durchlauf: Länge jeder
+    # Teilstrecke (wie in 'calc_distance_to_other_point'), Rating jeder Teilstrecke (Mittelwert beider Punkte) und
+    # deren Produkt werden als Arrays berechnet und pro Route aufsummiert. Teilstrecken, die vom letzten Punkt einer
+    # Route zum ersten Punkt der nächsten führen würden, werden dabei nicht mitgezählt.
+    # Das gewichtete Durchschnittsrating einer Route ist dann der erste durch den zweiten Wert.
+    ################################################################################################################
+    lats = np.asarray(lats, dtype=float)
+    longs = np.asarray(longs, dtype=float)
+    ratings = np.asarray(ratings, dtype=float)
+    route_starts = np.asarray(route_starts, dtype=np.int64)
+
+    distance_y = 111.3 * (lats[:-1] - lats[1:])
+    conversion_factor_delta_longitude_to_km = np.cos(np.radians(lats[:-1])) * 111.3
+    distance_x = (longs[:-1] - longs[1:]) * conversion_factor_delta_longitude_to_km
+    dist = np.sqrt(distance_x * distance_x + distance_y * distance_y)
+    rating_sub_section = (ratings[:-1] + ratings[1:]) / 2
+
+    # Teilstrecken zwischen zwei Routen herausnehmen
+    dist[route_starts[route_starts > 0] - 1] = 0.0
+
+    segment_route_starts = np.minimum(route_starts, max(len(dist) - 1, 0))
+    if len(dist) == 0:
+        return np.zeros(len(route_starts)), np.zeros(len(route_starts))
+    temp_weight = np.add.reduceat(dist * rating_sub_section, segment_route_starts)
+    total_distance = np.add.reduceat(dist, segment_route_starts)
+
+    # Routen mit nur einem Punkt haben keine Teilstrecken
+    route_ends = np.append(route_starts[1:], len(lats))
+    no_segments = route_ends - route_starts < 2
+    temp_weight[no_segments] = 0.0
+    total_distance[no_segments] = 0.0
+    return temp_weight, total_distance
+
+
+def calc_price(average_rating, total_distance, number_of_tires, tire_price=300, tire_best_range=75000,
+               tire_worst_range=10000, margin_percent=0.3):
+    ################################################################################################################
+    # Eingangsparameter:    wie bei 'price_rated_route', nur statt der Route das gewichtete Durchschnittsrating und
+    #                       die Gesamtlänge. Alle Parameter dürfen auch Arrays sein (numpy-Broadcasting), sodass
+    #                       viele Routen, Reifen und Margen auf einmal bepreist werden können.
+    # Rückgabe:             Tupel aus Endkundenpreis, Preis ohne Marge, Preis ohne Marge pro Reifen und Lebens-
+    #                       erwartung pro Reifen
+    #
+    # Beschreibung:
+    # Schritt 2 aus 'price_rated_route' (siehe dort)
+    ################################################################################################################
+    average_rating = np.asarray(average_rating, dtype=float)
+    tire_best_range = np.asarray(tire_best_range, dtype=float)
+
     expected_lifetime_range_at_specific_rating = \
         tire_best_range - (average_rating - 1) * (tire_best_range - tire_worst_range) * (1 / 6)
 
     price_per_tire_without_margin = (total_distance / expected_lifetime_range_at_specific_rating) * tire_price
     price_without_margin = price_per_tire_without_margin * number_of_tires
-    customer_end_price = price_without_margin / (1 - margin_percent)
+    customer_end_price = price_without_margin / (1 - np.asarray(margin_percent, dtype=float))
+
+    return customer_end_price, price_without_margin, price_per_tire_without_margin, \
+        expected_lifetime_range_at_specific_rating
+
+
+@instrumented("pricing")
+def price_rated_routes(rated_routes, tire_settings, margins=(0.3,)):
+    ################################################################################################################
+    # Eingangsparameter:    - Liste von gerateten Routen (RatedRoutes oder Listen von Coordinate-Objekten)
+    #                       - Liste von Reifeneinstellungen, jeweils (Anzahl der Reifen, Einkaufspreis pro Reifen,
+    #                       Lebenserwartung im besten Fall, Lebenserwartung im schlechtesten Fall), oder ein
+    #                       pandas.DataFrame mit diesen vier Spalten
+    #                       - optional: Liste von Margen
+    # Rückgabe:             pandas.DataFrame mit einer Zeile für jede Kombination aus Route, Reifeneinstellung und
+    #                       Marge
+    #
+    # Beschreibung:
+    # Bepreist viele Routen mit vielen Reifeneinstellungen und Margen auf einmal: Die Ratings aller Routen werden in
+    # einem Durchlauf über 'calc_weighted_rating' berechnet, danach werden alle Kombinationen über
+    # numpy-Broadcasting in einem Aufruf von 'calc_price' bepreist.
+    # Die Werte entsprechen denen, die 'price_rated_route' für die jeweilige Kombination zurückgeben würde.
+    ################################################################################################################
+    routes = [RatedRoute.from_path(route) for route in rated_routes]
+    tire_settings = np.asarray(tire_settings, dtype=float).reshape(-1, 4)
+    margins = np.asarray(margins, dtype=float).reshape(-1)
+
+    lengths = np.array([len(route) for route in routes], dtype=np.int64)
+    route_starts = np.cumsum(lengths) - lengths
+    if routes:
+        all_routes = RatedRoute.concatenate(routes)
+        temp_weight, total_distance = calc_weighted_rating(all_routes.lat, all_routes.long, all_routes.get_rating(),
+                                                           route_starts)
+    else:
+        temp_weight, total_distance = np.zeros(0), np.zeros(0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average_rating = temp_weight / total_distance
+
+    # Achsen: Route x Reifeneinstellung x Marge
+    route_axis = (slice(None), None, None)
+    tire_axis = (None, slice(None), None)
+    customer_end_price, price_without_margin, price_per_tire_without_margin, expected_lifetime = calc_price(
+        average_rating[route_axis], total_distance[route_axis],
+        tire_settings[:, 0][tire_axis], tire_settings[:, 1][tire_axis], tire_settings[:, 2][tire_axis],
+        tire_settings[:, 3][tire_axis], margins[None, None, :])
+
+    shape = (len(routes), len(tire_settings), len(margins))
+    route_number, tire_setting_number, margin_number = [index.reshape(-1) for index in np.indices(shape)]
+
+    return pd.DataFrame(data={
+        "route": route_number,
+        "number_of_tires": tire_settings[tire_setting_number, 0],
+        "tire_price": tire_settings[tire_setting_number, 1],
+        "tire_best_range": tire_settings[tire_setting_number, 2],
+        "tire_worst_range": tire_settings[tire_setting_number, 3],
+        "margin_percent": margins[margin_number],
+        "average_rating": average_rating[route_number],
+        "total_distance": total_distance[route_number],
+        "expected_lifetime": np.broadcast_to(expected_lifetime, shape).reshape(-1),
+        "customer_end_price": np.broadcast_to(customer_end_price, shape).reshape(-1),
+        "price_without_margin": np.broadcast_to(price_without_margin, shape).reshape(-1),
+        "price_per_tire_without_margin": np.broadcast_to(price_per_tire_without_margin, shape).reshape(-1)
+    })
+
+
+def give_rating_envelope(slopes, offsets):
+    ################################################################################################################
+    # Eingabeparameter:     Steigungen a und Achsenabschnitte b von Geraden a * t + b (Arrays)
+    # Rückgabe:             Liste von Tupeln (Index der Geraden, t von, t bis), die zusammen die untere Einhüllende
+    #                       aller Geraden auf 0 <= t <= 1 bilden
+    #
+    # Beschreibung:
+    # Begonnen wird mit der bei t = 0 niedrigsten Geraden (bei Gleichstand mit der kleinsten Steigung, dann mit dem
+    # kleinsten Index). Von dieser aus wird zum ersten Schnittpunkt mit einer Geraden kleinerer Steigung gegangen,
+    # die dann die niedrigste ist, usw. Da die Steigung dabei jedes Mal kleiner wird, gibt es höchstens so viele
+    # Schritte wie Geraden.
+    ################################################################################################################
+    slopes = np.asarray(slopes, dtype=float)
+    offsets = np.asarray(offsets, dtype=float)
+
+    current = int(np.lexsort((np.arange(len(slopes)), slopes, offsets))[0])
+    t = 0.0
+    pieces = []
+    while True:
+        lower = np.flatnonzero(slopes < slopes[current])
+        if len(lower):
+            # Wegen Rundungsfehlern kann ein Schnittpunkt minimal vor t liegen
+            crossings = np.maximum((offsets[lower] - offsets[current]) / (slopes[current] - slopes[lower]), t)
+            t_next = float(crossings.min())
+        if not len(lower) or t_next >= 1:
+            pieces.append((current, t, 1.0))
+            return pieces
+        if t_next > t:
+            pieces.append((current, t, t_next))
+        crossing = lower[crossings == t_next]
+        current = int(crossing[np.argmin(slopes[crossing])])
+        t = t_next
+
+
+@instrumented("snapping")
+def integrate_route_ratings(route, search_km=None, maximum_search_km=None):
+    ################################################################################################################
+    # Eingangsparameter:    Die ganze Route (RatedRoute, Liste an Coordinate-Objekten oder Liste von Sektionen, wie
+    #                       von find_path zurückgegeben), am besten ohne Zwischenpunkte (maximum_point_distance=None)
+    #                       optional: Suchradius und größter Suchradius in km (wie bei snap_route)
+    # Rückgabe:             Tupel aus:
+    #                           - gewichtetem Durchschnittsrating der Route
+    #                           - Gesamtlänge der Route in km
+    #                           - dict mit Statistiken: "max_distance" (größte Distanz von einer Stelle der Route zum
+    #                           nächsten Rating in km), "candidates", "search_rounds" (wie bei snap_route), "points"
+    #                           (Anzahl der Routenpunkte), "intervals" (Anzahl der Abschnitte mit demselben nächsten
+    #                           Rating) und "unrated_distance" (Länge der Segmente ohne Rating im größten Suchradius)
+    #
+    # Beschreibung:
+    # Statt die Route in Abständen von ca. 110 m mit Zwischenpunkten zu versehen, diese zu snappen und die Ratings
+    # von je zwei Punkten zu mitteln (siehe find_path, snap_route und calc_weighted_rating), wird für jedes Segment
+    # der Route genau berechnet, auf welchen Längen welcher Messpunkt der nächste ist, und das Rating über die Länge
+    # integriert:
+    # - Für jedes Segment von A nach B (in km umgerechnet mit dem Breitengrad von A, wie in calc_weighted_rating) und
+    #   jeden Messpunkt s im Suchradius ist das Quadrat der Distanz von der Stelle A + t * (B - A) zu s
+    #       |B - A|² * t² - 2 * ((s - A) · (B - A)) * t + |s - A|²
+    #   Der erste Term ist für alle Messpunkte gleich. Der nächste Messpunkt ist also der mit der niedrigsten Geraden
+    #   -2 * ((s - A) · (B - A)) * t + |s - A|², und die Abschnitte mit demselben nächsten Messpunkt sind die Stücke
+    #   der unteren Einhüllenden dieser Geraden (siehe give_rating_envelope).
+    # - Das Segment trägt die Summe aus Länge mal Rating aller Abschnitte bei.
+    # - Wie in snap_route gilt ein Segment erst als fertig, wenn jede Stelle darauf höchstens den Suchradius vom
+    #   nächsten Messpunkt entfernt ist (die größte Distanz liegt immer an einem Ende eines Abschnitts), sonst wird
+    #   es mit doppeltem Suchradius erneut abgefragt. Segmente, für die auch im größten Suchradius kein Rating
+    #   gefunden wird, zählen zur Länge, aber nicht zum Durchschnittsrating.
+    ################################################################################################################
+    if isinstance(route, (list, tuple)) and route and isinstance(route[0], RatedRoute):
+        route = RatedRoute.concatenate(route)
+    route = RatedRoute.from_path(route)
+    search_km = search_km or RATING_CORRIDOR_KM
+    maximum_search_km = max(maximum_search_km or SNAP_MAXIMUM_SEARCH_KM, search_km)
+
+    lengths = route.calc_segment_distances()
+    # Für die Schleife über die Segmente als Python-Listen (schneller als einzelne numpy-Werte)
+    point_lats, point_longs = route.lat.tolist(), route.long.tolist()
+    point_factors = (np.cos(np.radians(route.lat[:-1])) * 111.3).tolist()
+    weights = np.zeros(len(lengths))
+    max_distances = np.zeros(len(lengths))
+    intervals = np.zeros(len(lengths), dtype=np.int64)
+    rated = lengths == 0
+    resolved = lengths == 0
+    radius = search_km
+    search_rounds = 0
+    candidate_count = 0
+
+    while not resolved.all():
+        unresolved = np.flatnonzero(~resolved)
+        search_rounds += 1
+
+        # Korridor um jede Folge zusammenhängender offener Segmente (Anfangs- und Endpunkte)
+        run_starts, run_ends = give_index_runs(unresolved)
+        found = give_rated_corridor(route, radius, (run_starts, run_ends + 1))[0]
+        candidate_count += len(found)
+
+        site_lat = np.array([c.lat for c in found], dtype=float)
+        site_long = np.array([c.long for c in found], dtype=float)
+        site_rating = np.array([c.get_rating() for c in found], dtype=float)
+        by_latitude = np.argsort(site_lat, kind="stable")
+        sorted_lat = site_lat[by_latitude]
+
+        for segment in unresolved.tolist():
+            lat_a, long_a = point_lats[segment], point_longs[segment]
+            lat_b, long_b = point_lats[segment + 1], point_longs[segment + 1]
+            factor = point_factors[segment]
+
+            # Vorauswahl im Rechteck um das Segment (wie in give_corridor_boxes), dann Distanz zum Segment
+            lat_from, lat_to = min(lat_a, lat_b) - radius / 111.3, max(lat_a, lat_b) + radius / 111.3
+            largest_latitude = min(max(abs(lat_from), abs(lat_to)), 89.0)
+            safety_long = radius / (math.cos(math.radians(largest_latitude)) * 111.3)
+            sites = by_latitude[np.searchsorted(sorted_lat, lat_from, side="left"):
+                                np.searchsorted(sorted_lat, lat_to, side="right")]
+            sites = sites[(site_long[sites] >= min(long_a, long_b) - safety_long) &
+                          (site_long[sites] <= max(long_a, long_b) + safety_long)]
+
+            site_x = (site_long[sites] - long_a) * factor
+            site_y = (site_lat[sites] - lat_a) * 111.3
+            delta_x, delta_y = (long_b - long_a) * factor, (lat_b - lat_a) * 111.3
+            length_squared = delta_x * delta_x + delta_y * delta_y
+            t = np.clip((site_x * delta_x + site_y * delta_y) / length_squared, 0, 1)
+            near = (site_x - t * delta_x) ** 2 + (site_y - t * delta_y) ** 2 <= radius ** 2
+            sites, site_x, site_y = sites[near], site_x[near], site_y[near]
+
+            if len(sites) == 0:
+                continue
+
+            slopes = -2 * (site_x * delta_x + site_y * delta_y)
+            offsets = site_x * site_x + site_y * site_y
+            pieces = give_rating_envelope(slopes, offsets)
+
+            nearest, t_from, t_to = [np.array(column) for column in zip(*pieces)]
+            t_ends = np.concatenate([t_from, t_to])
+            nearest_ends = np.concatenate([nearest, nearest])
+            distance_squared = slopes[nearest_ends] * t_ends + offsets[nearest_ends] + length_squared * t_ends ** 2
+            max_distance = math.sqrt(max(float(distance_squared.max()), 0.0))
+
+            if max_distance <= radius * SNAP_RESOLVED_RADIUS_FRACTION or radius >= maximum_search_km:
+                weights[segment] = float(((t_to - t_from) * site_rating[sites[nearest]]).sum()) * lengths[segment]
+                max_distances[segment] = max_distance
+                intervals[segment] = len(pieces)
+                rated[segment] = True
+                resolved[segment] = True
+
+        if radius >= maximum_search_km:
+            break
+        radius = min(radius * 2, maximum_search_km)
+
+    _instrumentation.count("rating_candidates", candidate_count)
+
+    rated_distance = float(lengths[rated].sum())
+    if rated_distance == 0 and lengths.sum() > 0:
+        raise IndexError("Im Umfeld der Route wurden keine Straßenzustände gefunden")
+
+    statistics = {
+        "max_distance": float(max_distances.max()) if len(max_distances) else float("nan"),
+        "candidates": candidate_count,
+        "search_rounds": search_rounds,
+        "points": len(route),
+        "intervals": int(intervals.sum()),
+        "unrated_distance": float(lengths[~rated].sum())
+    }
+    return float(weights.sum()) / rated_distance, float(lengths.sum()), statistics
+
+
+@instrumented("pricing")
+def price_route_integrated(route, number_of_tires, tire_price=300, tire_best_range=75000, tire_worst_range=10000,
+                           margin_percent=0.3, search_km=None, maximum_search_km=None):
+    ################################################################################################################
+    # Eingangsparameter:    wie bei 'price_rated_route', aber die ungesnappte Route (am besten ohne Zwischenpunkte,
+    #                       siehe integrate_route_ratings), optional: Suchradius und größter Suchradius in km
+    # Rückgabe:             Tupel aus dem Ergebnis wie bei 'price_rated_route' und den Statistiken aus
+    #                       'integrate_route_ratings'
+    #
+    # Beschreibung:
+    # Schritt 1 aus 'price_rated_route' über integrate_route_ratings (exakt, statt mit gesnappten Zwischenpunkten),
+    # Schritt 2 wie dort über 'calc_price'.
+    ################################################################################################################
+    average_rating, total_distance, statistics = integrate_route_ratings(route, search_km, maximum_search_km)
+
+    customer_end_price, price_without_margin, price_per_tire_without_margin, \
+        expected_lifetime_range_at_specific_rating = \
+        [float(value) for value in calc_price(average_rating, total_distance, number_of_tires, tire_price,
+                                              tire_best_range, tire_worst_range, margin_percent)]
 
     return ([customer_end_price, price_without_margin, price_per_tire_without_margin], [average_rating, total_distance],
-            expected_lifetime_range_at_specific_rating)
+            expected_lifetime_range_at_specific_rating), statistics
+
+
+def snap_and_price_sections(sections, number_of_tires, tire_settings, margin_percent=0.3, integrated=False,
+                            show_progress=False):
+    ################################################################################################################
+    # Eingangsparameter:    - Sektionen einer Route (Liste von RatedRoutes, wie von find_path zurückgegeben)
+    #                       - Anzahl der gemieteten Reifen
+    #                       - Reifeneinstellungen (Einkaufspreis, Lebenserwartung im besten und im schlechtesten
+    #                       Fall), wie in 'wheel_data.csv'
+    #                       - optional: Marge, exakte Bepreisung über die Segmente (siehe price_route_integrated),
+    #                       Ausgabe der Statistiken des Snappings
+    # Rückgabe:             Tupel aus:
+    #                           - Ergebnis von price_rated_route
+    #                           - maximale Distanz von einem Routenpunkt zum nächsten Rating
+    #                           - Dauer der Berechnung in s
+    #                           - Measurement mit den Abschnitten der Berechnung (siehe Instrumentation), bei
+    #                           ausgeschalteter Instrumentierung None
+    #
+    # Beschreibung:
+    # Rechnet eine Zeile aus 'process_with_csv.py' (Snapping und Bepreisung) vollständig durch.
+    # Alle Sektionen werden zusammen in einem Durchlauf gesnappt (siehe snap_route), oder, mit 'integrated', ohne
+    # Snapping der Routenpunkte exakt über die Segmente bepreist.
+    ################################################################################################################
+    timer = time.time()
+
+    if integrated:
+        with _instrumentation.record() as measurement:
+            price_result, statistics = price_route_integrated(sections, number_of_tires, tire_settings[0],
+                                                              tire_settings[1], tire_settings[2], margin_percent)
+            if show_progress:
+                print("Ratings abgefragt:", statistics["candidates"], " | ", "Abfragen:", statistics["search_rounds"],
+                      " | ", "Routenpunkte:", statistics["points"], " | ", "Abschnitte:", statistics["intervals"],
+                      " | ", "Strecke ohne Rating:", statistics["unrated_distance"])
+        return price_result, statistics["max_distance"], time.time() - timer, measurement
+
+    with _instrumentation.record() as measurement:
+        snapped_path, statistics, rectangles = snap_route(sections)
+        snap_max_distance = statistics["max_distance"]
+        if show_progress:
+            print("Ratings abgefragt:", statistics["candidates"], " | ", "Abfragen:", statistics["search_rounds"],
+                  " | ", "Punkte ohne Rating:", statistics["unrated_points"], " | ", "Strecke ohne Rating:",
+                  statistics["unrated_distance"])
+
+        price_result = price_rated_route(snapped_path, number_of_tires, tire_settings[0], tire_settings[1],
+                                         tire_settings[2], margin_percent)
+
+    return price_result, snap_max_distance, time.time() - timer, measurement
+
+
+def init_process_worker(instrumentation_enabled=None):
+    # Lädt die Rating-Daten einmal pro Prozess (und nicht pro Zeile): SmartRoadSense-Datenbank (memory-mapped, die
+    # Seiten teilen sich alle Prozesse über das Betriebssystem), Quantile, standardisierte SmartRoadSense-Ratings und
+    # das Raster der standardisierten Ratings (falls gebaut, siehe build_rating_raster)
+    # Neue Prozesse übernehmen außerdem, ob die Instrumentierung eingeschaltet ist (auch bei "spawn")
+    if instrumentation_enabled is not None:
+        _instrumentation.enable(instrumentation_enabled)
+    give_standardised_ratings_srs(load_database_srs())
+    if RATING_RASTER_ENABLED:
+        load_rating_raster()
+
+
+def _snap_and_price_job(job):
+    return snap_and_price_sections(*job)
+
+
+def snap_and_price_in_process_pool(jobs, workers=None):
+    ################################################################################################################
+    # Eingangsparameter:    - Liste von Aufträgen, jeweils (Sektionen, Anzahl der Reifen, Reifeneinstellungen, Marge)
+    #                       wie bei snap_and_price_sections
+    #                       - optional: Anzahl der Prozesse (Standard: Anzahl der CPU-Kerne)
+    # Rückgabe:             Generator, der die Ergebnisse von snap_and_price_sections in der Reihenfolge der Aufträge
+    #                       liefert, sobald sie (und alle vorherigen) fertig sind
+    #
+    # Beschreibung:
+    # Snapping und Bepreisung sind reine Python-Rechnungen und laufen deshalb in einem Prozess nur auf einem Kern.
+    # Hier werden die Aufträge auf einen Pool von Prozessen verteilt. Jeder Prozess lädt die Rating-Daten einmal beim
+    # Start (siehe init_process_worker). Sie werden vorher auch im aufrufenden Prozess geladen, damit neue Prozesse
+    # (bei "fork", siehe unten) die bereits geladenen Daten übernehmen können, statt sie selbst zu laden.
+    # Die gemessene Dauer ist, wie bei der seriellen Berechnung, die Dauer der Berechnung der einzelnen Zeile.
+    ################################################################################################################
+    init_process_worker()
+
+    # "fork" nur unter Linux und nur, wenn im aufrufenden Prozess keine weiteren Threads laufen (z.B. aus
+    # fetch_routes_concurrently oder einem Server), deren Locks sonst in den neuen Prozessen für immer belegt blieben.
+    # Unter macOS ist "fork" generell unsicher. Sonst gilt die Startmethode der Plattform ("spawn" bzw.
+    # "forkserver"): Dabei importieren die neuen Prozesse das aufrufende Skript neu, es muss diese Funktion also
+    # unter 'if __name__ == "__main__":' aufrufen (wie process_with_csv.py)
+    use_fork = sys.platform.startswith("linux") and threading.active_count() == 1
+    context = multiprocessing.get_context("fork" if use_fork else None)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context,
+                             initializer=init_process_worker, initargs=(_instrumentation.enabled,)) as executor:
+        for result in executor.map(_snap_and_price_job, jobs):
+            yield result
 
 
 # Ausgabe
 
-def plot(snapped_path, rectangles=(), debug=False):
+# Farben der Routenpunkte je standardisiertem Rating (1 = beste, 7 = schlechteste Straßenqualität), Punkte ohne
+# Rating werden grau eingezeichnet
+RATING_COLORS = {
+    1: "#00ff00",
+    2: "#92db00",
+    3: "#dbdb00",
+    4: "#dbb700",
+    5: "#db7800",
+    6: "#db4500",
+    7: "#db0000"
+}
+RATING_COLOR_UNKNOWN = "#808080"
+
+# Höchstzahl der Punkte (Routenlinie und farbige Wegpunkte), die auf der Karte eingezeichnet werden
+PLOT_MAXIMUM_POINTS = 5000
+
+# Nachkommastellen der Koordinaten in der Karte (6 Stellen = ca. 0,1 m)
+PLOT_COORDINATE_DECIMALS = 6
+
+LEAFLET_URL = "https://unpkg.com/leaflet@1.9.4/dist/"
+
+MAP_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Route</title>
+<link rel="stylesheet" href="{leaflet_url}leaflet.css">
+<script src="{leaflet_url}leaflet.js"></script>
+<style>html, body, #map {{ height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var data = {geojson};
+var map = L.map("map", {{preferCanvas: true}});
+L.tileLayer("https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+    maxZoom: 19, attribution: "&copy; OpenStreetMap contributors"
+}}).addTo(map);
+var layer = L.geoJSON(data, {{
+    style: function (feature) {{ return feature.properties.style; }},
+    pointToLayer: function (feature, latlng) {{
+        if (feature.properties.marker === "end") {{
+            return L.marker(latlng, {{icon: L.divIcon({{className: "", html: "<b style='color:blue;font-size:20px'>&#x2715;</b>",
+                                                      iconSize: [20, 20], iconAnchor: [7, 13]}})}});
+        }}
+        return L.circleMarker(latlng, feature.properties.style);
+    }}
+}}).addTo(map);
+map.fitBounds(layer.getBounds());
+</script>
+</body>
+</html>
+"""
+
+
+def give_display_indices(ratings, maximum_points=PLOT_MAXIMUM_POINTS):
+    ################################################################################################################
+    # Eingangsparameter:    Ratings aller Routenpunkte (Array), optional: Höchstzahl der Punkte
+    # Rückgabe:             aufsteigendes Array mit den Indizes der Routenpunkte, die eingezeichnet werden
+    #
+    # Beschreibung:
+    # Bei langen (verdichteten) Routen liegen zehntausende Punkte nur ca. 100 m auseinander, auf der Karte ist davon
+    # aber kaum etwas zu sehen. Es wird daher nur jeder n-te Punkt eingezeichnet, sodass es insgesamt etwa die Hälfte
+    # von 'maximum_points' sind, und der Endpunkt. Damit auch kurze Abschnitte mit anderem Rating sichtbar bleiben,
+    # werden mit der anderen Hälfte Wechsel des Ratings übernommen (jeweils der Punkt davor und der erste Punkt
+    # danach). Da sich standardisierte Ratings fast an jedem Punkt ändern können, sind das höchstens
+    # 'maximum_points' / 4 Wechsel, und zwar die, nach denen das neue Rating am längsten gilt.
     ################################################################################################################
-    # Eingangsparameter:     - Liste an Coordinate Objekten, die eine Route bilden und standardisiere Ratings enthalten
+    ratings = np.asarray(ratings)
+    point_count = len(ratings)
+    step = max(1, int(math.ceil(point_count / max(1, maximum_points // 2))))
+
+    keep = np.zeros(point_count, dtype=bool)
+    keep[::step] = True
+    keep[-1:] = True
+    changes = np.flatnonzero(ratings[1:] != ratings[:-1])
+    change_budget = maximum_points // 4
+    if len(changes) > change_budget:
+        run_lengths = np.diff(np.append(changes, point_count - 1))
+        changes = changes[np.argsort(-run_lengths, kind="stable")[:change_budget]]
+    keep[changes] = True
+    keep[changes + 1] = True
+    return np.flatnonzero(keep)
+
+
+def give_map_geojson(snapped_path, rectangles=(), debug=False, maximum_points=PLOT_MAXIMUM_POINTS):
+    ################################################################################################################
+    # Eingangsparameter:    wie 'plot', optional: Höchstzahl der eingezeichneten Punkte (siehe give_display_indices)
+    # Rückgabe:             GeoJSON-FeatureCollection (dict) mit allen Elementen der Karte
+    #
+    # Beschreibung:
+    # Statt eines Elements pro Routenpunkt gibt es nur wenige Features, deren Stil jeweils in
+    # properties["style"] (Leaflet-Optionen) hinterlegt ist:
+    # 1) Routenlinie (LineString)
+    # 2) Startpunkt (blauer Punkt) und Endpunkt (blaues Kreuz, properties["marker"] = "end")
+    # 3) ein MultiPoint je Rating mit allen Wegpunkten dieses Ratings in der Farbe aus RATING_COLORS
+    # 4) (wenn debug=True) ein MultiLineString mit den Strichen von jedem Wegpunkt zu dem Ort, von dem das Rating
+    #    entnommen wurde
+    # 5) (wenn debug=True) ein Polygon je Rechteck, in der Randfarbe des Rechtecks
+    # GeoJSON erwartet die Koordinaten als [Längengrad, Breitengrad].
+    ################################################################################################################
+    snapped_path = RatedRoute.from_path(snapped_path)
+    ratings = snapped_path.get_rating().astype(int)
+    indices = give_display_indices(ratings, maximum_points)
+
+    def positions(longitudes, latitudes):
+        return np.round(np.stack([longitudes, latitudes], axis=1), PLOT_COORDINATE_DECIMALS).tolist()
+
+    route_positions = positions(snapped_path.long[indices], snapped_path.lat[indices])
+
+    # 1) Routenlinie
+    features = [{"type": "Feature", "geometry": {"type": "LineString", "coordinates": route_positions},
+                 "properties": {"style": {"color": "#1f77b4", "weight": 3, "opacity": 0.5}}}]
+
+    # 2) Start und Endpunkt
+    features.append({"type": "Feature", "geometry": {"type": "Point", "coordinates": route_positions[0]},
+                     "properties": {"marker": "start",
+                                    "style": {"radius": 8, "color": "blue", "fillColor": "blue", "fillOpacity": 1}}})
+    features.append({"type": "Feature", "geometry": {"type": "Point", "coordinates": route_positions[-1]},
+                     "properties": {"marker": "end"}})
+
+    # 3) Wegpunkte, gruppiert nach Rating
+    displayed_ratings = ratings[indices]
+    for rating in np.unique(displayed_ratings).tolist():
+        color = RATING_COLORS.get(rating, RATING_COLOR_UNKNOWN)
+        features.append({"type": "Feature",
+                         "geometry": {"type": "MultiPoint",
+                                      "coordinates": [route_positions[i]
+                                                      for i in np.flatnonzero(displayed_ratings == rating)]},
+                         "properties": {"rating": rating,
+                                        "style": {"radius": 5, "stroke": False, "fillColor": color,
+                                                  "fillOpacity": 1}}})
+
+    if debug:
+        # 4) Striche von Punkten zu Ort, von dem das Rating stammt (nur gesnappte Punkte)
+        snapped = indices[~np.isnan(snapped_path.snapped_lat[indices])]
+        snapped_positions = positions(snapped_path.snapped_long[snapped], snapped_path.snapped_lat[snapped])
+        whiskers = [[route_position, snapped_position] for route_position, snapped_position
+                    in zip(positions(snapped_path.long[snapped], snapped_path.lat[snapped]), snapped_positions)]
+        features.append({"type": "Feature", "geometry": {"type": "MultiLineString", "coordinates": whiskers},
+                         "properties": {"style": {"color": "#333333", "weight": 1, "opacity": 0.2}}})
+
+        # 5) Rechtecke
+        for rectangle in rectangles:
+            long_from, lat_from = rectangle.xy
+            long_to, lat_to = long_from + rectangle.width, lat_from + rectangle.height
+            ring = [[long_from, lat_from], [long_to, lat_from], [long_to, lat_to], [long_from, lat_to],
+                    [long_from, lat_from]]
+            features.append({"type": "Feature",
+                             "geometry": {"type": "Polygon",
+                                          "coordinates": [np.round(ring, PLOT_COORDINATE_DECIMALS).tolist()]},
+                             "properties": {"style": {"color": rectangle.ec, "weight": 1, "fillOpacity": 0.05}}})
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+def write_map(geojson, path="_map.html"):
+    ################################################################################################################
+    # Eingangsparameter:    GeoJSON (siehe give_map_geojson), Pfad der HTML-Datei
+    # Rückgabe:             keine
+    #
+    # Beschreibung:
+    # Schreibt die Features als GeoJSON-Datei (gleicher Name, Endung '.geojson') und eine Leaflet-Karte (HTML), in
+    # die dieselben Daten eingebettet sind, sodass die Karte auch ohne Webserver direkt geöffnet werden kann.
+    ################################################################################################################
+    text = json.dumps(geojson, separators=(",", ":"))
+    with open(os.path.splitext(path)[0] + ".geojson", "w", encoding="utf-8") as geojson_file:
+        geojson_file.write(text)
+    with open(path, "w", encoding="utf-8") as html_file:
+        html_file.write(MAP_HTML_TEMPLATE.format(leaflet_url=LEAFLET_URL, geojson=text))
+
+
+def plot(snapped_path, rectangles=(), debug=False, path="_map.html", open_in_browser=True):
+    ################################################################################################################
+    # Eingangsparameter:     - RatedRoute (oder Liste an Coordinate Objekten), die eine Route bildet und standardisiere
+    #                        Ratings enthält
     #                        - optional: Liste o. Tupel an Rechtecken, die eingezeichnet werden sollen
     #                        (falls Debug=True)
     #                        - optional: debug (Ja/Nein)? (Ändert, was dem Nutzer alles angezeigt wird)
+    #                        - optional: Pfad der Karte, soll sie direkt im Browser geöffnet werden?
     #
     # Rückgabe:              keine
     #
     # Beschreibung:
-    #
-    # Zunächst werden die Routeninformationen so aufbereitet, dass eine Routenlinie damit geplottet werden kann.
-    # 1) Diese Routenlinie wird dann als erstes geplottet (siehe Dokumentation matplotlib.pyplot)
-    # 2) Nun werden Start und Endpunkt eingezeichnet, der Startpunkt mit einem blauen Punkt und der Endpunkt mit einem
-    # blauen Kreuz
-    # 3) Nun werden alle übrigen Punkte auf der Route mit einer von ihrem Rating abhängigen Farbe eingezeichnet. Diese
-    # Punkte liegen dann auf der Linie aus Schritt 1). Die Farbkodierung kann in 'color_codes' geändert werden.
-    #
+    # Die Route wird als interaktive Karte unter '_map.html' im Hauptverzeichnis des Programms gespeichert (dazu die
+    # Daten als '_map.geojson') und direkt im Browser geöffnet. Eingezeichnet werden (siehe give_map_geojson):
+    # 1) die Routenlinie
+    # 2) Start (blauer Punkt) und Ziel (blaues Kreuz)
+    # 3) die Wegpunkte in einer von ihrem Rating abhängigen Farbe. Die Farbkodierung kann in 'RATING_COLORS' geändert
+    # werden.
     # 4) (wenn debug=True) Striche, die von jedem farbigen Wegpunkt zu dem Ort zeigen, von dem das Rating entnommen
     # wurde. Sind die Striche sehr kurz, bedeutet dass, dass direkt in der Nähe Informationen zur Straßenqualität
     # verfügbar waren.
-    # 5) (wenn debug=True) Einzeichnen der Rechtecke
-    # Alle übergebenen Rechtecke werden geplottet
-    #
-    # 6) mplleaflet.show() wird aufgerufen. mplleaflet nimmt alles, was in pyplot übergeben wurde, und überträgt es
-    # auf eine interaktive Karte, die dann unter '_map.html' im Hauptverzeichnis des Programms auffindbar ist.
-    # Die Karte sollte auch direkt geöffnet werden
-    ################################################################################################################
-    content = []
-    route_lats = []
-    route_longs = []
-    for i in snapped_path:
-        route_lats.append(i.get_coordinates()[0])
-        route_longs.append(i.get_coordinates()[1])
-        content.append(
-            [(i.get_coordinates()[0], i.get_coordinates()[1]),
-             (i.get_snapping_info()[2][0], i.get_snapping_info()[2][1]),
-             i.get_rating()])
-
-    # 1) Routenlinie plotten
-
-    plt.plot(route_longs, route_lats, alpha=0.5)
-
-    # 2) Start und Endpunkt plotten
-
-    plt.plot(content[0][0][1], content[0][0][0], marker=".", color="b", markersize=20)
-    plt.plot(content[-1][0][1], content[-1][0][0], 'bx', markersize=15)
-
-    # 3) Einzelne Wegpunkte & Route mit passender Farbe plotten
-
-    for p in content:
-        rating = p[2]
-        color_codes = {
-            "1": (0 / 255, 255 / 255, 0),
-            "2": (146 / 255, 219 / 255, 0),
-            "3": (219 / 255, 219 / 255, 0),
-            "4": (219 / 255, 183 / 255, 0),
-            "5": (219 / 255, 120 / 255, 0),
-            "6": (219 / 255, 69 / 255, 0),
-            "7": (219 / 255, 0 / 255, 0)
-        }
-        plt.plot(p[0][1], p[0][0], color=color_codes[str(rating)], marker=".", markersize=15)
-
-    # 4) Striche von Punkten zu Ort, von dem das Rating stammt plotten
-    if debug:
-        for p in content:
-            lat1 = p[0][0]
-            long1 = p[0][1]
-            lat2 = p[1][0]
-            long2 = p[1][1]
-            plt.plot([long1, long2], [lat1, lat2], color=(0.2, 0.2, 0.2), alpha=0.2)
-
-    # 5) Rectangles plotten:
-    if debug:
-        for rectangle in rectangles:
-            plt.gca().add_patch(rectangle)
+    # 5) (wenn debug=True) alle übergebenen Rechtecke
+    #
+    # Bei langen Routen wird nur ein Teil der Wegpunkte eingezeichnet (siehe give_display_indices), die Karte bleibt
+    # so auch bei zehntausenden Routenpunkten klein und schnell.
+    ################################################################################################################
+    write_map(give_map_geojson(snapped_path, rectangles, debug), path)
 
-    # 6) Aufrufen von mplleaflet
-    mplleaflet.show()
\ No newline at end of file
+    if open_in_browser:
+        import webbrowser
+        webbrowser.open("file://" + os.path.abspath(path))
@@ -0,0 +1,412 @@
+# coding: utf8
+import main as m
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+################################################################################################################
+# Preis-Dienst: Ein dauerhaft laufender Prozess, der Preisanfragen über HTTP/JSON beantwortet. Im Gegensatz zu
+# 'process_with_user_interface.py' werden die SmartRoadSense-Datenbank, die Quantile des Standardisierers und die
+# Caches (Geocoding, Routen, Queensland-Kacheln) nur einmal beim Start geladen und bleiben danach im Speicher.
+#
+# Gleichzeitig eintreffende Anfragen werden zu kleinen Batches zusammengefasst (siehe PricingService): Orte und
+# Routen eines Batches werden gemeinsam und gleichzeitig abgefragt (siehe fetch_routes_concurrently), gleiche Orte
+# und Strecken also nur einmal abgefragt und gesnappt.
+#
+# Aufruf z.B.:
+#   python pricing_service.py --port 8080
+#   curl -X POST localhost:8080/price -d '{"start": "Venice Italy", "destination": "Verona Italy", "tires": 6}'
+#   curl localhost:8080/stats           -> Perzentile der Antwortzeiten, Batch-Größen, Cache-Statistiken
+#
+# Für Tests können GraphHopper und Queensland über --graphhopper-url und --ql-url durch lokale Stand-ins ersetzt
+# werden (siehe GRAPHHOPPER_URL und QL_URL in main.py).
+#
+# Anfrage (POST /price), alle Felder außer Start und Ziel sind optional:
+#   {"start": "Venice Italy", "destination": "Verona Italy", "tires": 6,
+#    "tire_settings": [600, 100000, 10000], "margin": 0.3}
+# 'tire_settings' sind Preis pro Reifen und Lebenserwartung im besten und schlechtesten Fall in km (Standard: die
+# Werte aus 'userfiles/wheel_data.csv').
+# Antwort: 200 mit dem Preis, 400 bei ungültiger Anfrage, 422, wenn die Strecke nicht bepreist werden kann (z.B. Ort
+# nicht gefunden), 504 nach REQUEST_TIMEOUT_SECONDS (--timeout), jeweils mit {"error": ...}.
+################################################################################################################
+
+# Höchstzahl der Anfragen in einem Batch und Wartezeit auf weitere Anfragen, nachdem die erste eingetroffen ist
+BATCH_MAX_SIZE = 32
+BATCH_WAIT_SECONDS = 0.02
+
+# Anzahl der letzten Anfragen, aus denen die Perzentile der Antwortzeiten berechnet werden
+LATENCY_WINDOW = 10000
+LATENCY_PERCENTILES = [50, 90, 95, 99]
+
+# Höchste Wartezeit einer Anfrage auf ihr Ergebnis in s, danach wird sie mit 504 beantwortet
+REQUEST_TIMEOUT_SECONDS = 300
+
+# Länge der Warteschlange für neue Verbindungen (listen-Backlog), der Standard von 5 führt bei vielen gleichzeitigen
+# Anfragen zu abgewiesenen Verbindungen ("Connection reset by peer")
+REQUEST_QUEUE_SIZE = 128
+
+
+class PricingError(Exception):
+    # Die Anfrage war gültig, konnte aber nicht bepreist werden (z.B. Ort nicht gefunden, keine Route)
+    pass
+
+
+class LatencyStatistics:
+    ################################################################################################################
+    # Hält für jede Messgröße (z.B. "total", "queue") die Dauer der letzten 'window' Anfragen vor und berechnet
+    # daraus die Perzentile aus LATENCY_PERCENTILES in ms
+    ################################################################################################################
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._values = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+            self._values[name].append(seconds)
+            self._counts[name] += 1
+
+    def summary(self):
+        with self._lock:
+            values = {name: np.array(list(durations)) * 1000 for name, durations in self._values.items()}
+            counts = dict(self._counts)
+
+        summary = {}
+        for name, milliseconds in values.items():
+            summary[name] = {"count": counts[name]}
+            for percentile, value in zip(LATENCY_PERCENTILES, np.percentile(milliseconds, LATENCY_PERCENTILES)):
+                summary[name]["p{}_ms".format(percentile)] = float(value)
+            summary[name]["max_ms"] = float(milliseconds.max())
+        return summary
+
+
+def parse_price_request(request, default_tire_settings, default_margin):
+    ################################################################################################################
+    # Eingabeparameter:     Anfrage als dict (siehe oben), Standard-Reifeneinstellungen und -Marge
+    # Rückgabe:             Tupel aus Start, Ziel, Anzahl der Reifen, Reifeneinstellungen und Marge
+    #
+    # Ungültige Anfragen lösen einen ValueError mit einer Beschreibung des Fehlers aus
+    ################################################################################################################
+    if not isinstance(request, dict):
+        raise ValueError("Anfrage muss ein JSON-Objekt sein")
+    for field in ["start", "destination"]:
+        if not isinstance(request.get(field), str) or not request[field].strip():
+            raise ValueError("'{}' fehlt oder ist kein Ortsname".format(field))
+
+    tires = request.get("tires", 4)
+    if not isinstance(tires, int) or isinstance(tires, bool) or tires < 1:
+        raise ValueError("'tires' muss eine positive ganze Zahl sein")
+
+    tire_settings = request.get("tire_settings", default_tire_settings)
+    try:
+        tire_settings = [float(value) for value in tire_settings]
+    except (TypeError, ValueError):
+        raise ValueError("'tire_settings' muss eine Liste aus drei Zahlen sein")
+    if len(tire_settings) != 3:
+        raise ValueError("'tire_settings' muss eine Liste aus drei Zahlen sein")
+
+    margin = request.get("margin", default_margin)
+    if not isinstance(margin, (int, float)) or isinstance(margin, bool) or not 0 <= margin < 1:
+        raise ValueError("'margin' muss eine Zahl zwischen 0 und 1 sein")
+
+    return request["start"], request["destination"], tires, tire_settings, float(margin)
+
+
+class PricingService:
+    ################################################################################################################
+    # Beantwortet Preisanfragen mit den Funktionen aus main.py.
+    #
+    # Anfragen werden über 'submit' in eine Warteschlange gestellt und von einem einzigen Hintergrund-Thread
+    # abgearbeitet: Sobald eine Anfrage eintrifft, wartet er bis zu 'batch_wait_seconds' auf weitere (höchstens
+    # 'batch_max_size'). Für alle Anfragen des Batches werden Orte und Routen gemeinsam abgefragt, danach wird jede
+    # unterschiedliche Route einmal gesnappt (siehe snap_route) und für jede Anfrage bepreist. Da Snapping und
+    # Bepreisung reine Python-Rechnungen sind, würden mehrere Threads dabei nicht schneller rechnen.
+    #
+    # Mit 'warm_up' werden vor der ersten Anfrage die SmartRoadSense-Datenbank, die Quantile, die standardisierten
+    # Ratings und die Caches geladen.
+    #
+    # Wartet 'price' länger als 'request_timeout_seconds', wird die Anfrage als fehlgeschlagen gezählt und, falls sie
+    # noch in der Warteschlange steht, abgebrochen (sie wird dann nicht mehr bepreist).
+    #################################################################################################################
+
+    def __init__(self, splitter=380, margin_percent=0.3, tire_settings=None, batch_max_size=BATCH_MAX_SIZE,
+                 batch_wait_seconds=BATCH_WAIT_SECONDS, fetch_max_workers=None,
+                 request_timeout_seconds=REQUEST_TIMEOUT_SECONDS):
+        self.splitter = splitter
+        self.margin_percent = margin_percent
+        self.tire_settings = tire_settings
+        self.batch_max_size = batch_max_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self.fetch_max_workers = fetch_max_workers
+        self.request_timeout_seconds = request_timeout_seconds
+
+        self.latencies = LatencyStatistics()
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        # Wird von den Threads des HTTP-Servers gleichzeitig erhöht, daher nur über _count_failure
+        self.requests_failed = 0
+        self._failed_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def warm_up(self):
+        timer = time.perf_counter()
+        if self.tire_settings is None:
+            self.tire_settings = np.loadtxt("userfiles/wheel_data.csv", delimiter=",", skiprows=1,
+                                            ndmin=2)[0].tolist()
+        m.init_process_worker()
+        m.get_geocoding_cache()
+        m.get_route_cache()
+        m.get_ql_cache()
+        m.get_http_client()
+        return time.perf_counter() - timer
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="pricing-batches", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, request):
+        # Rückgabe: Future, dessen Ergebnis die Antwort (dict) ist, bzw. ValueError / PricingError
+        future = Future()
+        try:
+            parsed = parse_price_request(request, self.tire_settings, self.margin_percent)
+        except ValueError as e:
+            future.set_exception(e)
+            return future
+        self._queue.put((parsed, future, time.perf_counter()))
+        return future
+
+    def price(self, request, timeout=None):
+        # Löst bei Überschreitung der Wartezeit (Standard: 'request_timeout_seconds') einen
+        # concurrent.futures.TimeoutError aus
+        timer = time.perf_counter()
+        future = self.submit(request)
+        try:
+            return future.result(self.request_timeout_seconds if timeout is None else timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._count_failure()
+            raise
+        except (ValueError, PricingError):
+            self._count_failure()
+            raise
+        finally:
+            self.latencies.add("total", time.perf_counter() - timer)
+
+    def _count_failure(self):
+        with self._failed_lock:
+            self.requests_failed += 1
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.batch_wait_seconds
+        while len(batch) < self.batch_max_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            # Abgebrochene Anfragen (siehe price) werden übersprungen, alle anderen können danach nicht mehr
+            # abgebrochen werden
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._process_batch(batch)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(PricingError("{}: {}".format(type(e).__name__, e)))
+
+    def _process_batch(self, batch):
+        started = time.perf_counter()
+        self.batch_sizes.append(len(batch))
+        for _, _, received in batch:
+            self.latencies.add("queue", started - received)
+
+        fetched = m.fetch_routes_concurrently([(parsed[0], parsed[1]) for parsed, _, _ in batch],
+                                              splitter=self.splitter, max_workers=self.fetch_max_workers)
+        self.latencies.add("fetch_batch", time.perf_counter() - started)
+
+        # Gleiche Strecken im Batch werden nur einmal gesnappt, bepreist wird jede Anfrage mit ihren Reifendaten
+        snapped = {}
+        for (parsed, future, _), (start, destination, sections, error) in zip(batch, fetched):
+            start_name, destination_name, tires, tire_settings, margin = parsed
+            if error is not None:
+                future.set_exception(PricingError(error))
+                continue
+            try:
+                timer = time.perf_counter()
+                if (start_name, destination_name) not in snapped:
+                    snapped_route, statistics, _ = m.snap_route(sections)
+                    snapped[(start_name, destination_name)] = snapped_route, statistics
+                snapped_route, statistics = snapped[(start_name, destination_name)]
+                price_result = m.price_rated_route(snapped_route, tires, tire_settings[0], tire_settings[1],
+                                                   tire_settings[2], margin)
+            except Exception as e:
+                future.set_exception(PricingError("{}: {}".format(type(e).__name__, e)))
+                continue
+            self.latencies.add("snap_and_price", time.perf_counter() - timer)
+
+            future.set_result({
+                "start": start_name,
+                "destination": destination_name,
+                "start_coordinates": start.get_coordinates(),
+                "destination_coordinates": destination.get_coordinates(),
+                "length_km": price_result[1][1],
+                "rating": price_result[1][0],
+                "price": price_result[0][0],
+                "price_without_margin": price_result[0][1],
+                "price_per_km": price_result[0][0] / price_result[1][1],
+                "max_snap_distance_km": statistics["max_distance"],
+                "unrated_distance_km": statistics["unrated_distance"],
+                "tires": tires,
+                "tire_settings": tire_settings,
+                "margin": margin
+            })
+
+    def stats(self):
+        batch_sizes = list(self.batch_sizes)
+        return {
+            "latency": self.latencies.summary(),
+            "requests_failed": self.requests_failed,
+            "batches": len(batch_sizes),
+            "mean_batch_size": float(np.mean(batch_sizes)) if batch_sizes else 0.0,
+            "max_batch_size": max(batch_sizes) if batch_sizes else 0,
+            "queued": self._queue.qsize(),
+            "geocoding_cache": m.get_geocoding_cache().stats,
+            "route_cache": m.get_route_cache().stats,
+            "ql_cache": m.get_ql_cache().stats
+        }
+
+
+class PricingRequestHandler(BaseHTTPRequestHandler):
+    # POST /price, GET /stats und GET /health; der PricingService steht in 'self.server.service'
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.server.service.stats())
+        elif self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": "unbekannter Pfad: {}".format(self.path)})
+
+    def do_POST(self):
+        if self.path != "/price":
+            self.send_json(404, {"error": "unbekannter Pfad: {}".format(self.path)})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf8"))
+        except (ValueError, UnicodeDecodeError):
+            self.send_json(400, {"error": "Anfrage ist kein gültiges JSON"})
+            return
+
+        try:
+            self.send_json(200, self.server.service.price(request))
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+        except PricingError as e:
+            self.send_json(422, {"error": str(e)})
+        except FutureTimeoutError:
+            self.send_json(504, {"error": "Zeitüberschreitung nach {} s".format(
+                self.server.service.request_timeout_seconds)})
+
+    def log_message(self, format, *arguments):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *arguments)
+
+
+class PricingHTTPServer(ThreadingHTTPServer):
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+def make_server(service, host="127.0.0.1", port=8080, verbose=False):
+    # Erstellt den HTTP-Server (port=0: freier Port, siehe server.server_address)
+    server = PricingHTTPServer((host, port), PricingRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP/JSON-Dienst für Preisanfragen")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--splitter", type=int, default=380)
+    parser.add_argument("--margin", type=float, default=0.3, help="Standard-Marge, falls die Anfrage keine angibt")
+    parser.add_argument("--batch-size", type=int, default=BATCH_MAX_SIZE, help="Höchstzahl der Anfragen pro Batch")
+    parser.add_argument("--batch-wait", type=float, default=BATCH_WAIT_SECONDS,
+                        help="Wartezeit auf weitere Anfragen für einen Batch in s")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT_SECONDS,
+                        help="höchste Wartezeit einer Anfrage in s, danach Antwort 504")
+    parser.add_argument("--graphhopper-url", help="statt GRAPHHOPPER_URL, z.B. für einen lokalen Stand-in")
+    parser.add_argument("--ql-url", help="statt QL_URL, z.B. für einen lokalen Stand-in")
+    parser.add_argument("--verbose", action="store_true", help="jede Anfrage ausgeben")
+    arguments = parser.parse_args()
+
+    if arguments.graphhopper_url:
+        m.GRAPHHOPPER_URL = arguments.graphhopper_url
+    if arguments.ql_url:
+        m.QL_URL = arguments.ql_url
+
+    pricing_service = PricingService(splitter=arguments.splitter, margin_percent=arguments.margin,
+                                     batch_max_size=arguments.batch_size, batch_wait_seconds=arguments.batch_wait,
+                                     request_timeout_seconds=arguments.timeout)
+    print("Daten geladen in {:.2f} s".format(pricing_service.warm_up()))
+    pricing_service.start()
+
+    http_server = make_server(pricing_service, arguments.host, arguments.port, arguments.verbose)
+    print("Preis-Dienst läuft auf http://{}:{}".format(*http_server.server_address))
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        pricing_service.stop()
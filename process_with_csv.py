@@ -5,117 +5,160 @@ import main as m
 splitter = 380
 margin_percent = 0.3
 
-# Einlesen der CSV "to_process.csv" im Ordner userfiles
+# Exakte Bepreisung über die Segmente der Route, wie sie von GraphHopper kommt, statt über Zwischenpunkte alle 110 m
+# (siehe price_route_integrated in main.py)
+integrated_pricing = False
 
-csv_i = m.pd.read_csv("userfiles/to_process.csv").values.tolist()
+# Anzahl gleichzeitiger Abfragen und maximale GraphHopper-Anfragen pro Sekunde (an die eigene Quota anpassen)
+fetch_max_workers = 8
+graphhopper_requests_per_second = 5
 
-# Zuerst für alle Strecken Abfragen der Koordinaten und Paths. So können Fehler (z.B. unmögliche Routen wie
-# London > Sydney) schnell gefunden werden)
-lines = []
-all_paths = []
-for line in csv_i:
-    print(line[1], "->", line[2], " | ",
-          m.give_coordinate_for_location(line[1]).get_coordinates(), "->",
-          m.give_coordinate_for_location(line[2]).get_coordinates())
-    input_start = line[1]
-    input_destination = line[2]
-    start = m.give_coordinate_for_location(input_start)
-    destination = m.give_coordinate_for_location(input_destination)
-    all_paths.append(m.find_path(start, destination, splitter=splitter))
+# Anzahl der Prozesse für Snapping und Bepreisung der Zeilen (1 = nacheinander im selben Prozess)
+process_workers = 1
 
+# Fortsetzen einer abgebrochenen Berechnung: Zeilen, die schon in '_processed_csv.csv' stehen, werden übersprungen
+resume = False
+
+# Zeitmessung pro Abschnitt (Geocoding, Routing, HTTP, SmartRoadSense, Queensland, Standardisierung, Snapping,
+# Bepreisung) und Zähler (HTTP-Anfragen und -Bytes, abgefragte Ratings), siehe Instrumentation in main.py:
+# - stage_columns = True: zusätzliche Spalten in der Ergebnis-CSV
+# - trace_path = "userfiles/_trace.jsonl": eine JSON-Zeile pro Zeile und Abschnitt
+# Sind beide ausgeschaltet, wird nichts gemessen
+stage_columns = False
+trace_path = None
 
 # Kopf (1. Zeile) der ausgegebenen Ergebnis-CSV:
 csv_o_header = ["Reifenanzahl", "Start", "Ziel", "->", "Startkoordinate", "Endkoordinate", "", "Streckenlänge",
                 "Streckenbewertung (Skala von 1-7)", "", "Endkundenpreis", "Endkundenpreis/km", "",
                 "Max. Abstand zu Messpunkt", "Dauer der Berechnung in s"]
-
-
-# 'sums' enthält die Summen:
-#   - der Strecken,
-#   - der Endkundenpreise und
-#   - der Berechnungsdauer angeben,
-# um später die Gesamtwerte (z.B. Gesamtpreis) ausgeben zu können
-sums = [0.0, 0.0, 0.0]
-
-# Für jede Zeile in der orig. CSV werden nun die Informationen genommen, zusätzlich die Reifendaten importiert und dann
-# die Methoden aus main.py aufgerufen
-counter = 0
-for line in csv_i:
-    paths_for_line = all_paths[counter]
-    counter += 1
-
-    input_start = line[1]
-    input_destination = line[2]
-    input_tire_count = int(line[0])
-
+if stage_columns:
+    csv_o_header += ["{} in s".format(stage) for stage in m.INSTRUMENTATION_STAGES] + m.INSTRUMENTATION_COUNTERS
+
+
+def process_csv():
+    # Der eigentliche Ablauf steht in einer Funktion, die nur beim direkten Start des Skripts aufgerufen wird: Ohne
+    # "fork" (z.B. unter Windows und macOS, siehe snap_and_price_in_process_pool) importieren die Prozesse dieses
+    # Skript neu und dürfen dabei nicht selbst den ganzen Batch starten
+    instrumentation = m.get_instrumentation()
+    if stage_columns or trace_path:
+        instrumentation.enable()
+    if trace_path:
+        trace_sink = m.JsonLinesTraceSink(trace_path, append=resume)
+        instrumentation.add_sink(trace_sink)
+
+    # Die Ergebnis-CSV wird Zeile für Zeile geschrieben (siehe ResultCsvWriter). Bricht das Programm z.B. bei Zeile
+    # 150 / 300 ab, so sind die Ergebnisse für die ersten 150 Zeilen trotzdem einsehbar und können mit 'resume = True'
+    # weiterverwendet werden. Die Summen (Strecke, Preis, Zeit) werden dabei mitgezählt
+    result_writer = m.ResultCsvWriter("userfiles/_processed_csv.csv", csv_o_header,
+                                      sum_columns=["Streckenlänge", "Endkundenpreis", "Dauer der Berechnung in s"],
+                                      resume=resume)
+
+    # Einlesen der CSV "to_process.csv" im Ordner userfiles (ohne bereits berechnete Zeilen)
+
+    csv_i = [line for line in m.pd.read_csv("userfiles/to_process.csv").values.tolist()
+             if not result_writer.is_done(line)]
+    if result_writer.rows_resumed:
+        print("Bereits berechnet:", result_writer.rows_resumed, "Zeilen, verbleibend:", len(csv_i), "Zeilen")
+
+    # Zuerst für alle Strecken Abfragen der Koordinaten und Paths. So können Fehler (z.B. unmögliche Routen wie
+    # London > Sydney) schnell gefunden werden)
+    # Die Abfragen laufen dabei gleichzeitig (siehe fetch_routes_concurrently). Zeilen, bei denen ein Fehler auftritt,
+    # werden gemeldet und später übersprungen, statt den ganzen Batch abzubrechen.
+    fetch_measurements = []
+    all_fetched = m.fetch_routes_concurrently([(line[1], line[2]) for line in csv_i],
+                                              maximum_point_distance=None if integrated_pricing else 0.11,
+                                              splitter=splitter,
+                                              max_workers=fetch_max_workers,
+                                              requests_per_second=graphhopper_requests_per_second,
+                                              measurements=fetch_measurements)
+    for line, (start, destination, paths, error) in zip(csv_i, all_fetched):
+        if error is None:
+            print(line[1], "->", line[2], " | ", start.get_coordinates(), "->", destination.get_coordinates())
+        else:
+            print(line[1], "->", line[2], " | ", "FEHLER:", error)
+
+    # Für jede Zeile in der orig. CSV werden nun die Informationen genommen, zusätzlich die Reifendaten importiert und
+    # dann die Methoden aus main.py aufgerufen
     tire_settings = m.pd.read_csv("userfiles/wheel_data.csv").values[0]
 
-    # Aufrufen von Methoden:
-    timer = m.time.time()
-
-    start = m.give_coordinate_for_location(input_start)
-    destination = m.give_coordinate_for_location(input_destination)
-
-    snapped_path = []
-    snap_max_distance = 0
-    counter2 = 0
-    # Fortschrittsindikator:
-    print("")
-    print("Processing line {}/{}..................................".format(len(lines) + 1, len(csv_i)),
-          line[1], "->", line[2])
-    print("")
-
-    # Die Strecke von A nach B wurde in verschiedene Sektionen unterteilt, um nicht mit zu langen Strecken auf einmal
-    # rechnen zu müssen. In wie viele Sektionen dabei unterteilt wird, ist von 'splitter' abhängig.
-    # Splitter = 380 bedeutet, die Route wird in Sektionen unterteilt, wobei jede Sektion 380 Koordinaten umfassen soll.
-    # Werden im Umfeld einer section keine Straßenzustände gefunden, so wird die section in einen Puffer aufgenommen,
-    # der dann zusammen mit der nächsten Section behantelt wird. Falls hier dann Straßenzustände vorliegen, wird normal
-    # fortgefahren, falls nicht, wiederholt sich das Ganze und der Puffer wird größer
-
-    puffer = []
-
-    for path in paths_for_line:
-        try:
-            snap_result = m.snap_ratings_to_route(puffer + path)
-            snapped_path += snap_result[0]
-            if snap_result[2] > snap_max_distance:
-                snap_max_distance = snap_result[2]
-            puffer = []
-        except IndexError:
-            puffer += path
-        counter2 += 1
-        print(round((counter2 / len(paths_for_line) * 100), 0), "%", " | ", counter2, " / ", len(paths_for_line))
-
-    price_result = m.price_rated_route(snapped_path, input_tire_count,
-                                       tire_settings[0], tire_settings[1], tire_settings[2], margin_percent)
-
-    # Hinzufügen der Ergebnisse zu der Zeile und Aufnahme der befüllten Zeile in die Liste 'lines':
-    t = m.time.time() - timer
-    result = ["->", start.get_coordinates(), destination.get_coordinates(), "", price_result[1][1], price_result[1][0],
-              "", price_result[0][0], price_result[0][0] / price_result[1][1], "",
-              snap_max_distance, t]
-    for i in result:
-        line.append(i)
-
-    lines.append(line)
-
-    # Speichern nach jeder Zeile. Bricht das Programm z.B. bei Zeile 150 / 300 ab, so sind so die Ergebnisse für die
-    # ersten 150 Zeilen trotzdem einsehbar
-    csv_o = m.pd.DataFrame(data=lines, columns=csv_o_header)
-    csv_o.to_csv("userfiles/_processed_csv.csv", index=False)
-
-    # Erhöhen der Summen (Stecke, Preis, Zeit)
-    sums[0] += price_result[1][1]
-    sums[1] += price_result[0][0]
-    sums[2] += t
-
-# Hinzufügen einer leeren Zeile und einer Zeile mit den Summen (Strecke, Preis, Zeit) ans Ende
-lines.append(["", "", "", "", "", "", "", "", "", "", "", "", "", "", ""])
-lines.append(["", "", "", "", "", "", "",
-              str(sums[0]), "", "", str(sums[1]), str(sums[1]/sums[0]), "", "", str(sums[2])])
-
-print("Gesamtstrecke: {}, Gesamtpreis: {}, Gesamptpreis/km: {}, Berechnungszeit: {}"
-      .format(sums[0], sums[1], sums[0]/sums[1], sums[2]))
-
-csv_o = m.pd.DataFrame(data=lines, columns=csv_o_header)
-csv_o.to_csv("userfiles/_processed_csv.csv", index=False)
\ No newline at end of file
+    skipped = []
+    rows = []
+    for row_number, (line, (start, destination, paths_for_line, error)) in enumerate(zip(csv_i, all_fetched), start=1):
+        if error is not None:
+            skipped.append((line[1], line[2], error))
+        else:
+            rows.append((row_number, line, start, destination, paths_for_line))
+        # Messung von Geocoding und Routing (auch für übersprungene Zeilen)
+        if fetch_measurements:
+            instrumentation.emit(fetch_measurements[row_number - 1], row=row_number, start=line[1], destination=line[2],
+                                 phase="fetch")
+
+    # Die Sektionen einer Strecke werden zusammen gesnappt und bepreist (siehe snap_and_price_sections und snap_route,
+    # bzw. price_route_integrated)
+    jobs = [(paths_for_line, int(line[0]), tire_settings, margin_percent, integrated_pricing)
+            for row_number, line, start, destination, paths_for_line in rows]
+
+    def process_serially():
+        for (row_number, line, start, destination, paths_for_line), job in zip(rows, jobs):
+            # Fortschrittsindikator:
+            print("")
+            print("Processing line {}/{}..................................".format(row_number, len(csv_i)),
+                  line[1], "->", line[2])
+            print("")
+            yield m.snap_and_price_sections(*job, show_progress=True)
+
+    # Bei mehr als einem Prozess werden die Zeilen parallel berechnet, die Ergebnisse kommen aber in derselben
+    # Reihenfolge zurück, sodass Ergebnis-CSV und Summen genau denen der seriellen Berechnung entsprechen
+    if process_workers > 1:
+        results = m.snap_and_price_in_process_pool(jobs, process_workers)
+    else:
+        results = process_serially()
+
+    for (row_number, line, start, destination, paths_for_line), (price_result, snap_max_distance, t, measurement) \
+            in zip(rows, results):
+        if process_workers > 1:
+            print("Processed line {}/{}".format(row_number, len(csv_i)), line[1], "->", line[2])
+
+        # Hinzufügen der Ergebnisse zu der Zeile und Speichern der befüllten Zeile:
+        result = ["->", start.get_coordinates(), destination.get_coordinates(), "", price_result[1][1],
+                  price_result[1][0],
+                  "", price_result[0][0], price_result[0][0] / price_result[1][1], "",
+                  snap_max_distance, t]
+        for i in result:
+            line.append(i)
+
+        instrumentation.emit(measurement, row=row_number, start=line[1], destination=line[2], phase="process")
+        if stage_columns:
+            # Geocoding und Routing der Zeile zusammen mit Snapping und Bepreisung
+            measurement.merge(fetch_measurements[row_number - 1])
+            line += [measurement.seconds(stage) for stage in m.INSTRUMENTATION_STAGES]
+            line += [measurement.counters.get(counter, 0) for counter in m.INSTRUMENTATION_COUNTERS]
+
+        result_writer.write(line)
+
+    # 'sums' enthält die Summen der Strecken, der Endkundenpreise und der Berechnungsdauer (inkl. fortgesetzter Zeilen)
+    sums = result_writer.sums
+
+    # Preis pro km nur, wenn überhaupt eine Strecke berechnet wurde (z.B. nicht, wenn alle Zeilen übersprungen wurden)
+    price_per_km = sums[1] / sums[0] if sums[0] else ""
+
+    # Hinzufügen einer leeren Zeile und einer Zeile mit den Summen (Strecke, Preis, Zeit) ans Ende
+    blank_columns = [""] * (len(csv_o_header) - 15)
+    result_writer.close([["", "", "", "", "", "", "", "", "", "", "", "", "", "", ""] + blank_columns,
+                         ["", "", "", "", "", "", "",
+                          str(sums[0]), "", "", str(sums[1]), str(price_per_km), "", "", str(sums[2])] + blank_columns])
+    if trace_path:
+        trace_sink.close()
+
+    print("Gesamtstrecke: {}, Gesamtpreis: {}, Gesamptpreis/km: {}, Berechnungszeit: {}"
+          .format(sums[0], sums[1], price_per_km, sums[2]))
+
+    for start_name, destination_name, error in skipped:
+        print("Übersprungen:", start_name, "->", destination_name, " | ", error)
+
+    # Orte, die mehrfach vorkommen, werden dank Geocoding-Cache nur einmal über die API abgefragt
+    print("Geocoding-Cache:", m.get_geocoding_cache().stats)
+
+
+if __name__ == "__main__":
+    process_csv()
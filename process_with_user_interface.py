@@ -24,31 +24,13 @@ timer = m.time.time()
 start = m.give_coordinate_for_location(input_start)
 destination = m.give_coordinate_for_location(input_destination)
 
-# Die Strecke von A nach B wurde in verschiedene Sektionen unterteilt, um nicht mit zu langen Strecken auf einmal
-# rechnen zu müssen. In wie viele Sektionen dabei unterteilt wird, ist von 'splitter' abhängig.
-# Splitter = 380 bedeutet, die Route wird in Sektionen unterteilt, wobei jede Sektion 380 Koordinaten umfassen soll.
-# Werden im Umfeld einer section keine Straßenzustände gefunden, so wird die section in einen Puffer aufgenommen,
-# der dann zusammen mit der nächsten Section behantelt wird. Falls hier dann Straßenzustände vorliegen, wird normal
-# fortgefahren, falls nicht, wiederholt sich das Ganze und der Puffer wird größer
+# Die Strecke von A nach B wird in Sektionen unterteilt zurückgegeben ('splitter' Koordinaten pro Sektion).
+# Alle Sektionen werden zusammen in einem Durchlauf gesnappt: Es werden alle Ratings im Korridor um die Route
+# abgefragt, nur für Routenpunkte ohne Rating im Korridor wird weiter entfernt gesucht (siehe snap_route)
 
 paths = m.find_path(start, destination, splitter=splitter)
-snapped_path = []
-snap_max_distance = 0
-counter = 0
-rectangles = []
-puffer = []
-for path in paths:
-    try:
-        snap_result = m.snap_ratings_to_route(puffer + path)
-        rectangles += snap_result[3]
-        snapped_path += snap_result[0]
-        if snap_result[2] > snap_max_distance:
-            snap_max_distance = snap_result[2]
-        puffer = []
-    except IndexError:
-        puffer += path
-    counter += 1
-    print(round((counter / len(paths) * 100), 0), "%", " | ", counter, " / ", len(paths))
+snapped_path, snap_statistics, rectangles = m.snap_route(paths)
+snap_max_distance = snap_statistics["max_distance"]
 
 price_result = m.price_rated_route(snapped_path, input_tire_count,
                                  tire_settings[0], tire_settings[1], tire_settings[2], margin_percent)
@@ -66,6 +48,7 @@ print("Endkundenpreis:                    ", price_result[0][0], "€")
 print("Endkundenpreis/km:                 ", price_result[0][0] / price_result[1][1], "€/km")
 print("")
 print("Max. Abstand zu Messpunkt:         ", snap_max_distance, "km")
+print("Strecke ohne Rating:               ", snap_statistics["unrated_distance"], "km")
 print("")
 print("Took                               ", m.time.time() - timer, " secounds")
 if debug:
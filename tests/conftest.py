@@ -0,0 +1,29 @@
+# coding: utf8
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# main.py und pricing_service.py liegen im Hauptordner des Repositories
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def standin_server():
+    # Startet lokale Stand-in-Server (ThreadingHTTPServer mit dem übergebenen Handler) in einem Thread und liefert
+    # jeweils die Basis-URL. Am Ende des Tests werden alle Server wieder beendet.
+    servers = []
+
+    def start(handler_class):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return "http://127.0.0.1:{}".format(server.server_address[1])
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,60 @@
+# coding: utf8
+import main as m
+
+
+class Clock:
+    # Ersetzt time.time in main.py, damit Einträge ohne Warten ablaufen
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_lru_eviction():
+    cache = m.Cache(memory_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # "b" wurde am längsten nicht genutzt
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.get("missing", "default") == "default"
+    assert cache.stats["memory_hits"] == 3 and cache.stats["misses"] == 2
+
+
+def test_disk_entries_survive_and_are_evicted_by_last_access(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(m.time, "time", clock)
+    path = str(tmp_path / "cache.sqlite")
+    cache = m.Cache(path, table="test", memory_entries=1, max_entries=2)
+    cache.set("a", [1, 2])
+    clock.now += 1
+    cache.set("b", {"x": 1})
+    clock.now += 1
+    # Aus der Datei, da im Arbeitsspeicher nur der letzte Eintrag liegt; "a" gilt damit als zuletzt genutzt
+    assert cache.get("a") == [1, 2] and cache.stats["disk_hits"] == 1
+    clock.now += 1
+    cache.set("c", "z")
+    assert cache.stats["evictions"] == 1
+
+    # Neue Instanz (z.B. nächster Programmstart) mit derselben Datei
+    reopened = m.Cache(path, table="test", memory_entries=10, max_entries=2)
+    assert reopened.get("a") == [1, 2] and reopened.get("c") == "z" and reopened.get("b") is None
+    reopened.clear()
+    assert m.Cache(path, table="test").get("a") is None
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(m.time, "time", clock)
+    for path in [None, str(tmp_path / "cache.sqlite")]:
+        cache = m.Cache(path, ttl_seconds=60)
+        cache.set("key", "value")
+        clock.now += 60
+        assert cache.get("key") == "value"
+        clock.now += 1
+        assert cache.get("key") is None
+        if path is not None:
+            assert cache.stats["expired"] == 1
+            assert m.Cache(path, ttl_seconds=60).get("key") is None
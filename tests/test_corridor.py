@@ -0,0 +1,43 @@
+# coding: utf8
+import math
+
+import numpy as np
+
+import main as m
+
+
+def brute_force_mask(latitudes, longitudes, route, corridor_km):
+    # Jeder Punkt mit jedem Routenpunkt, Distanz wie in Coordinate.calc_distance_to_other_point (vom Routenpunkt aus)
+    closest = np.full(len(latitudes), np.inf)
+    for lat, long in zip(route.lat.tolist(), route.long.tolist()):
+        distance_x = (long - longitudes) * (math.cos(math.radians(lat)) * 111.3)
+        distance_y = 111.3 * (lat - latitudes)
+        closest = np.minimum(closest, np.sqrt(distance_x * distance_x + distance_y * distance_y))
+    return closest <= corridor_km
+
+
+def test_corridor_contains_every_point_within_snapping_distance():
+    # Geschwungene, verdichtete Route in hoher Breite (Längengrad stark verzerrt) und zufällige Punkte, viele davon
+    # nahe am Rand des Korridors
+    rng = np.random.default_rng(3)
+    angles = np.linspace(0, 3, 12)
+    route = m.densify_route(m.RatedRoute(lat=62 + 0.05 * np.arange(12) + 0.02 * np.sin(angles),
+                                         long=10 + 0.08 * np.cos(angles * 2)), 0.11)
+    around = rng.integers(0, len(route), 3000)
+    latitudes = route.lat[around] + rng.normal(0, 0.012, 3000)
+    longitudes = route.long[around] + rng.normal(0, 0.025, 3000)
+
+    in_corridor = m.corridor_mask(latitudes, longitudes, route, m.RATING_CORRIDOR_KM)
+    within = brute_force_mask(latitudes, longitudes, route, m.RATING_CORRIDOR_KM)
+    assert within.sum() > 500 and (~within).sum() > 500
+    # Alles, was beim Snapping höchstens RATING_CORRIDOR_KM entfernt ist, liegt im Korridor; weiter außerhalb (mehr
+    # als die halbe Segmentlänge zusätzlich) liegt nichts
+    assert in_corridor[within].all()
+    assert not in_corridor[~brute_force_mask(latitudes, longitudes, route, m.RATING_CORRIDOR_KM + 0.06)].any()
+
+    # Nur Teilstücke: Punkte um den Rest der Route liegen nicht im Korridor
+    runs = (np.array([0]), np.array([len(route) // 2]))
+    in_first_half = m.corridor_mask(latitudes, longitudes, route, m.RATING_CORRIDOR_KM, runs)
+    assert np.array_equal(in_first_half & in_corridor, in_first_half)
+    assert in_first_half[brute_force_mask(latitudes, longitudes, route[:len(route) // 2 + 1],
+                                          m.RATING_CORRIDOR_KM)].all()
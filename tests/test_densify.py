@@ -0,0 +1,77 @@
+# coding: utf8
+import numpy as np
+
+import main as m
+
+
+def densify_by_interpoint(coordinates, maximum_point_distance):
+    # Wie Teil 2 des ursprünglichen find_path: 'interpoint' so oft, bis kein Abstand mehr zu lang ist
+    path = coordinates.copy()
+    while True:
+        path = m.interpoint(path, maximum_point_distance)
+        if all(a.calc_distance_to_other_point(b) <= maximum_point_distance for a, b in zip(path[:-1], path[1:])):
+            return path
+
+
+def split_by_loop(path, splitter):
+    # Teil 3 des ursprünglichen find_path
+    splitted, line = [], []
+    for i in path:
+        if len(line) < splitter:
+            line.append(i)
+        else:
+            splitted.append(line)
+            line = [i]
+    if len(splitted) < len(path) / splitter:
+        if len(line) == splitter or len(splitted) == 0:
+            splitted.append(line)
+        else:
+            splitted[-1].extend(line)
+    return splitted
+
+
+def make_route(seed=6):
+    # Wegpunkte wie von GraphHopper: unterschiedlich lange Abschnitte, einer über den Äquator, doppelte Punkte
+    rng = np.random.default_rng(seed)
+    lats = np.concatenate([[0.3, -0.2], 40 + np.cumsum(rng.uniform(-0.02, 0.03, 40))])
+    longs = np.concatenate([[10.0, 10.1], 10.2 + np.cumsum(rng.uniform(-0.01, 0.04, 40))])
+    lats[20], longs[20] = lats[19], longs[19]
+    return m.RatedRoute(lat=lats, long=longs)
+
+
+def test_densify_route_keeps_waypoints_and_distance_limit():
+    route = make_route()
+    for maximum_point_distance in [0.11, 0.5, 3.0]:
+        densified = m.densify_route(route, maximum_point_distance)
+        expected = densify_by_interpoint(route.to_coordinates(), maximum_point_distance)
+
+        # Kein Abstand zu lang, nie mehr Punkte als mit wiederholtem 'interpoint'
+        assert (densified.calc_segment_distances() <= maximum_point_distance).all()
+        assert len(route) < len(densified) <= len(expected)
+
+        # Alle Wegpunkte bleiben in ihrer Reihenfolge erhalten, dazwischen liegen die Zwischenpunkte gleichmäßig
+        # verteilt auf dem Abschnitt
+        positions = [0]
+        for lat, long in zip(route.lat[1:].tolist(), route.long[1:].tolist()):
+            positions.append(next(i for i in range(positions[-1] + 1, len(densified))
+                                  if densified.lat[i] == lat and densified.long[i] == long))
+        assert positions[-1] == len(densified) - 1
+        for start, end in zip(positions[:-1], positions[1:]):
+            for column in (densified.lat[start:end + 1], densified.long[start:end + 1]):
+                assert np.allclose(np.diff(column), (column[-1] - column[0]) / (end - start), rtol=0, atol=1e-12)
+
+
+def test_interpoint_on_rated_route_matches_coordinate_list():
+    route = make_route()
+    for maximum_point_distance in [0.11, 1.0]:
+        expected = m.interpoint(route.to_coordinates(), maximum_point_distance)
+        result = m.interpoint(route, maximum_point_distance)
+        assert [c.get_coordinates() for c in result] == [c.get_coordinates() for c in expected]
+
+
+def test_split_route_matches_original_splitting():
+    for length in [0, 1, 5, 379, 380, 381, 760, 1000, 1139, 1140]:
+        route = m.RatedRoute(lat=np.arange(length, dtype=float), long=np.zeros(length))
+        expected = split_by_loop(list(range(length)), 380)
+        assert [section.lat.astype(int).tolist() for section in m.split_route(route, 380)] == expected
+    assert len(m.split_route(make_route(), None)) == 1
@@ -0,0 +1,126 @@
+# coding: utf8
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import main as m
+
+# Orte des Stand-ins für GraphHopper
+CITIES = {"verona italy": (45.44, 10.99), "florence italy": (43.77, 11.25), "bologna italy": (44.49, 11.34)}
+
+
+class GraphHopperHandler(BaseHTTPRequestHandler):
+    # Stand-in für /geocode und /route, zählt die Anfragen je Pfad
+    protocol_version = "HTTP/1.1"
+    requests = {}
+    lock = threading.Lock()
+
+    def send_json(self, body):
+        data = json.dumps(body).encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        name = url.path.rsplit("/", 1)[-1]
+        with self.lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+        if name == "geocode":
+            location = " ".join(query["q"][0].lower().split())
+            if location not in CITIES:
+                self.send_json({"hits": []})
+                return
+            lat, long = CITIES[location]
+            self.send_json({"hits": [{"point": {"lat": lat, "lng": long}}]})
+        else:
+            (lat_a, long_a), (lat_b, long_b) = [map(float, point.split(",")) for point in query["point"]]
+            self.send_json({"paths": [{"points": {"coordinates": [
+                [long_a + (long_b - long_a) * i / 20, lat_a + (lat_b - lat_a) * i / 20] for i in range(21)]}}]})
+
+    def log_message(self, *arguments):
+        pass
+
+
+@pytest.fixture
+def graphhopper(tmp_path, monkeypatch, standin_server):
+    # main.py gegen den Stand-in, mit eigenen Caches in tmp_path
+    monkeypatch.chdir(tmp_path)
+    GraphHopperHandler.requests = {}
+    monkeypatch.setattr(m, "GRAPHHOPPER_URL", standin_server(GraphHopperHandler) + "/api/1")
+    monkeypatch.setattr(m, "get_graphhopper_api_key", lambda: "test")
+    for name in ["_geocoding_cache", "_route_cache"]:
+        monkeypatch.setattr(m, name, None)
+    return GraphHopperHandler.requests
+
+
+def test_geocoding_is_cached_in_memory_and_on_disk(graphhopper, monkeypatch):
+    first = m.give_coordinate_for_location("Verona Italy")
+    assert first.get_coordinates() == [45.44, 10.99]
+    # Gleicher Ort in anderer Schreibweise, aus dem Arbeitsspeicher
+    assert m.give_coordinate_for_location("  verona   ITALY ").get_coordinates() == [45.44, 10.99]
+    assert graphhopper == {"geocode": 1}
+
+    # Neuer Prozess (neuer Cache) mit derselben Datei
+    monkeypatch.setattr(m, "_geocoding_cache", None)
+    assert m.give_coordinate_for_location("Verona Italy").get_coordinates() == [45.44, 10.99]
+    assert m.get_geocoding_cache().stats["disk_hits"] == 1 and graphhopper == {"geocode": 1}
+
+    # Andere Sprache und ohne Cache wird wieder abgefragt
+    m.give_coordinate_for_location("Verona Italy", locale="de")
+    m.give_coordinate_for_location("Verona Italy", use_cache=False)
+    assert graphhopper == {"geocode": 3}
+
+
+def test_routes_are_cached_with_their_options(graphhopper, monkeypatch):
+    verona, florence = m.Coordinate(*CITIES["verona italy"]), m.Coordinate(*CITIES["florence italy"])
+    sections = m.find_path(verona, florence, splitter=380)
+    uncached = m.find_path(verona, florence, splitter=380, use_cache=False)
+    assert graphhopper == {"route": 2}
+    assert [section.get_coordinates().tolist() for section in sections] == \
+        [section.get_coordinates().tolist() for section in uncached]
+
+    # Gleiche Route aus dem Cache, auch mit anderer Verdichtung (aus den gespeicherten Wegpunkten) und nach einem
+    # Neustart; ein anderes Fahrzeug ist eine andere Route
+    assert [s.get_coordinates().tolist() for s in m.find_path(verona, florence, splitter=380)] == \
+        [s.get_coordinates().tolist() for s in sections]
+    raw = m.find_path(verona, florence, maximum_point_distance=None, splitter=None)[0]
+    assert len(raw) == 21
+    monkeypatch.setattr(m, "_route_cache", None)
+    dense = m.find_path(verona, florence, maximum_point_distance=0.5, splitter=None)[0]
+    assert (dense.calc_segment_distances() <= 0.5).all()
+    assert graphhopper == {"route": 2}
+    m.find_path(verona, florence, vehicle="bike")
+    assert graphhopper == {"route": 3}
+    # Der API-Key gehört nicht zum Schlüssel
+    assert m.route_cache_key(verona, florence, {"key": "a", "vehicle": "car"}) == \
+        m.route_cache_key(verona, florence, {"key": "b", "vehicle": "car"})
+
+
+def test_concurrent_fetch_matches_serial_lookups(graphhopper):
+    pairs = [("Verona Italy", "Florence Italy"), ("Bologna Italy", "Verona Italy"), ("Atlantis", "Verona Italy"),
+             ("Verona Italy", "Florence Italy"), ("Florence Italy", "Bologna Italy")]
+    results = m.fetch_routes_concurrently(pairs, max_workers=4, requests_per_second=1000)
+
+    # Jeder Ort und jede Route wird nur einmal abgefragt, Atlantis wird gesucht, aber nicht geroutet
+    assert graphhopper == {"geocode": 4, "route": 3}
+    assert [result[3] is None for result in results] == [True, True, False, True, True]
+    assert results[2][3].startswith("Geocoding fehlgeschlagen")
+
+    # Gleiche Reihenfolge und gleiche Sektionen wie nacheinander ohne Cache
+    for (start_name, destination_name), (start, destination, paths, _) in zip(pairs, results):
+        if start_name == "Atlantis":
+            continue
+        serial_start = m.give_coordinate_for_location(start_name, use_cache=False)
+        serial_destination = m.give_coordinate_for_location(destination_name, use_cache=False)
+        assert start.get_coordinates() == serial_start.get_coordinates()
+        assert destination.get_coordinates() == serial_destination.get_coordinates()
+        serial = m.find_path(serial_start, serial_destination, use_cache=False)
+        assert [section.get_coordinates().tolist() for section in paths] == \
+            [section.get_coordinates().tolist() for section in serial]
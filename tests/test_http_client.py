@@ -0,0 +1,102 @@
+# coding: utf8
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import main as m
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    # Stand-in-Server: antwortet 'failures' mal mit 503, danach mit 200, und merkt sich pro Anfrage den Port des
+    # Clients (eine Verbindung = ein Port) sowie die höchste Anzahl gleichzeitiger Anfragen
+    protocol_version = "HTTP/1.1"
+    failures = 0
+    delay = 0.0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests += 1
+            cls.ports.add(self.client_address[1])
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            failing = cls.requests <= cls.failures
+        time.sleep(cls.delay)
+        with cls.lock:
+            cls.in_flight -= 1
+
+        body = b"unavailable" if failing else b"ok"
+        self.send_response(503 if failing else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *arguments):
+        pass
+
+
+def make_handler(failures=0, delay=0.0):
+    return type("Handler", (CountingHandler,), {"failures": failures, "delay": delay, "requests": 0, "ports": set(),
+                                                 "in_flight": 0, "max_in_flight": 0, "lock": threading.Lock()})
+
+
+def test_retries_503(standin_server):
+    handler = make_handler(failures=2)
+    url = standin_server(handler)
+    client = m.HttpClient(timeout=(1, 5), max_retries=3, backoff_seconds=0.01)
+
+    response = client.get(url + "/route")
+
+    assert response.status_code == 200
+    assert handler.requests == 3
+
+
+def test_returns_last_response_after_max_retries(standin_server):
+    handler = make_handler(failures=10)
+    url = standin_server(handler)
+    client = m.HttpClient(timeout=(1, 5), max_retries=2, backoff_seconds=0.01)
+
+    assert client.get(url + "/route").status_code == 503
+    assert handler.requests == 3
+
+
+def test_keep_alive_reuses_connection(standin_server):
+    handler = make_handler()
+    url = standin_server(handler)
+    client = m.HttpClient(timeout=(1, 5))
+
+    for _ in range(5):
+        assert client.get(url + "/route").status_code == 200
+
+    assert handler.requests == 5
+    assert len(handler.ports) == 1
+
+
+def test_per_host_limit(standin_server):
+    handler = make_handler(delay=0.1)
+    url = standin_server(handler)
+    client = m.HttpClient(timeout=(1, 5), max_per_host=2)
+
+    threads = [threading.Thread(target=client.get, args=(url + "/route",)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert handler.requests == 6
+    assert handler.max_in_flight == 2
+
+
+def test_rate_limit_is_restored_after_block():
+    client = m.HttpClient()
+    client.set_rate_limit("http://example.org/route", 5)
+    configured = client._rate_limits["example.org"]
+
+    with client.rate_limit("http://example.org/route", 50):
+        assert client._rate_limits["example.org"].rate == 50
+    assert client._rate_limits["example.org"] is configured
+
+    with client.rate_limit("http://other.org/route", 50):
+        assert "other.org" in client._rate_limits
+    assert "other.org" not in client._rate_limits
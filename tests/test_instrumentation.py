@@ -0,0 +1,113 @@
+# coding: utf8
+import json
+import threading
+
+import pytest
+
+import main as m
+
+
+class Clock:
+    # Ersetzt time.perf_counter in main.py, damit die Abschnitte feste Dauern haben
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(m.time, "perf_counter", clock)
+    return clock
+
+
+def test_stages_add_up_to_the_total_time(clock):
+    instrumentation = m.Instrumentation()
+    instrumentation.enable()
+    with instrumentation.record() as measurement:
+        with instrumentation.stage("geocoding"):
+            clock.now += 1.0
+            with instrumentation.stage("http"):
+                clock.now += 2.0
+                instrumentation.count("http_requests")
+                instrumentation.count("http_bytes", 1234)
+            clock.now += 0.5
+        with instrumentation.stage("http"):
+            clock.now += 0.25
+    assert measurement.stages == {"geocoding": [1.5, 1], "http": [2.25, 2]}
+    assert sum(measurement.seconds(name) for name in measurement.stages) == 3.75
+    assert measurement.counters == {"http_requests": 1, "http_bytes": 1234}
+    assert measurement.calls("srs") == 0
+    assert measurement.as_dict()["stages"]["http"] == {"seconds": 2.25, "calls": 2}
+
+
+def test_nested_records_threads_and_disabled_measurement(clock):
+    instrumentation = m.Instrumentation()
+    # Ausgeschaltet wird nichts gemessen und nichts ausgegeben
+    received = []
+    instrumentation.add_sink(lambda measurement, context: received.append((measurement, context)))
+    with instrumentation.record() as measurement:
+        instrumentation.count("srs_rows", 5)
+    assert measurement is None
+    instrumentation.emit(measurement, row=1)
+    assert received == []
+
+    instrumentation.enable()
+    instrumentation.count("srs_rows", 5)
+    with instrumentation.record() as outer:
+        with instrumentation.record() as inner:
+            with instrumentation.stage("srs"):
+                clock.now += 1.0
+            instrumentation.count("srs_rows", 7)
+        # Ein anderer Thread zählt nicht in die Messung dieses Threads
+        thread = threading.Thread(target=instrumentation.count, args=("srs_rows", 100))
+        thread.start()
+        thread.join()
+    assert inner.counters == {"srs_rows": 7}
+    assert outer.stages == {"srs": [1.0, 1]} and outer.counters == {"srs_rows": 7}
+
+    instrumentation.emit(outer, row=3)
+    assert received == [(outer, {"row": 3})]
+
+
+def test_instrumented_functions_return_the_same_results(clock, monkeypatch):
+    monkeypatch.setattr(m, "_instrumentation", m.Instrumentation())
+
+    @m.instrumented("snapping")
+    def snap(values, offset=0):
+        clock.now += 0.5
+        return [value + offset for value in values]
+
+    assert snap([1, 2], offset=1) == [2, 3]
+    m.get_instrumentation().enable()
+    with m.get_instrumentation().record() as measurement:
+        assert snap([1, 2], offset=1) == [2, 3]
+        with pytest.raises(TypeError):
+            snap(None)
+    assert measurement.stages == {"snapping": [1.0, 2]}
+    assert snap.__name__ == "snap"
+
+
+def test_trace_sink_writes_one_line_per_stage(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    measurement = m.Measurement()
+    measurement.add_stage("srs", 0.5, calls=2)
+    measurement.add_stage("pricing", 0.25)
+    measurement.add_counter("srs_rows", 42)
+
+    sink = m.JsonLinesTraceSink(path)
+    sink(measurement, {"row": 1})
+    sink.close()
+    # Beim Fortsetzen werden weitere Zeilen angehängt
+    sink = m.JsonLinesTraceSink(path, append=True)
+    sink(m.Measurement(), {"row": 2})
+    sink.close()
+
+    with open(path, encoding="utf8") as file:
+        lines = [json.loads(line) for line in file]
+    assert lines == [{"row": 1, "stage": "srs", "seconds": 0.5, "calls": 2},
+                     {"row": 1, "stage": "pricing", "seconds": 0.25, "calls": 1},
+                     {"row": 1, "counters": {"srs_rows": 42}},
+                     {"row": 2, "counters": {}}]
@@ -0,0 +1,93 @@
+# coding: utf8
+import math
+
+import numpy as np
+import pytest
+
+import main as m
+
+# Rohe Routenpunkte (ohne Zwischenpunkte) einer Strecke von ca. 70 km in der Toskana
+ROUTE = m.RatedRoute(lat=[43.1, 43.13, 43.2, 43.22, 43.3, 43.31, 43.4, 43.45, 43.5, 43.62],
+                     long=[10.6, 10.68, 10.7, 10.81, 10.85, 10.95, 11.0, 11.1, 11.12, 11.2])
+
+
+@pytest.fixture
+def sites(tmp_path, monkeypatch):
+    # 4000 Ratings in bis zu ca. 300 m Abstand zur Route als SmartRoadSense-Datenbank
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(m, "RATING_RASTER_ENABLED", False)
+    monkeypatch.setattr(m, "_ql_cache", None)
+    rng = np.random.default_rng(6)
+    along = m.densify_route(ROUTE, 0.01)
+    picked = rng.integers(0, len(along), 4000)
+    latitudes = along.lat[picked] + rng.normal(0, 0.0015, 4000)
+    longitudes = along.long[picked] + rng.normal(0, 0.002, 4000)
+    ppes = rng.lognormal(-2.2, 0.9, 4000)
+    store_directory = str(tmp_path / "store")
+    m.write_database_srs_store(latitudes, longitudes, ppes, store_directory)
+    monkeypatch.setattr(m, "SRS_STORE_DIRECTORY", store_directory)
+    monkeypatch.setattr(m, "_standardizer", {"srs": np.quantile(ppes, m.STANDARDIZER_QUANTILES),
+                                             "ql": np.arange(1.0, 7.0)})
+    return latitudes, longitudes, m.standardize_ratings(ppes, "srs")
+
+
+def sampled_rating(route, latitudes, longitudes, ratings, samples=2000):
+    # Jedes Segment wird an 'samples' gleich verteilten Stellen auf das nächste Rating aller Punkte gesnappt (in km
+    # mit dem Breitengrad des Segmentanfangs wie in integrate_route_ratings), das Rating ist der Mittelwert
+    lengths = route.calc_segment_distances()
+    t = (np.arange(samples) + 0.5) / samples
+    weights, max_distance = 0.0, 0.0
+    for segment in range(len(lengths)):
+        factor = math.cos(math.radians(route.lat[segment])) * 111.3
+        site_x = (longitudes - route.long[segment]) * factor
+        site_y = (latitudes - route.lat[segment]) * 111.3
+        delta_x = (route.long[segment + 1] - route.long[segment]) * factor
+        delta_y = (route.lat[segment + 1] - route.lat[segment]) * 111.3
+        distances = np.hypot(site_x[None, :] - t[:, None] * delta_x, site_y[None, :] - t[:, None] * delta_y)
+        weights += lengths[segment] * ratings[distances.argmin(axis=1)].mean()
+        max_distance = max(max_distance, distances.min(axis=1).max())
+    return weights / lengths.sum(), lengths.sum(), max_distance
+
+
+def test_envelope_matches_the_lowest_line():
+    rng = np.random.default_rng(7)
+    t = np.linspace(0, 1, 1001)
+    for lines in [1, 2, 5, 40]:
+        # Mit gleichen Steigungen und Geraden durch denselben Punkt
+        slopes = np.round(rng.normal(0, 3, lines), 1)
+        offsets = np.round(rng.uniform(0, 2, lines), 1)
+        pieces = m.give_rating_envelope(slopes, offsets)
+        assert pieces[0][1] == 0.0 and pieces[-1][2] == 1.0
+        assert all(previous[2] == piece[1] for previous, piece in zip(pieces, pieces[1:]))
+
+        lowest = (slopes[None, :] * t[:, None] + offsets[None, :]).min(axis=1)
+        for index, t_from, t_to in pieces:
+            inside = (t >= t_from) & (t <= t_to)
+            assert np.allclose(slopes[index] * t[inside] + offsets[index], lowest[inside])
+
+
+def test_integrated_rating_matches_sampled_snapping(sites):
+    average_rating, total_distance, statistics = m.integrate_route_ratings(ROUTE)
+    expected_rating, expected_distance, expected_max_distance = sampled_rating(ROUTE, *sites)
+    assert total_distance == pytest.approx(expected_distance)
+    assert average_rating == pytest.approx(expected_rating, rel=2e-3)
+    assert statistics["max_distance"] == pytest.approx(expected_max_distance, abs=0.005)
+    assert statistics["unrated_distance"] == 0 and statistics["points"] == len(ROUTE)
+
+    # Ebenso für die Route als Liste von Sektionen und mit Zwischenpunkten (dieselben Stellen, nur der Breitengrad
+    # für die Umrechnung in km ändert sich je Segment)
+    sections = m.split_route(m.densify_route(ROUTE, 0.11), 380)
+    assert m.integrate_route_ratings(sections)[0] == pytest.approx(average_rating, rel=1e-4)
+
+
+def test_segments_without_ratings_count_only_to_the_length(sites):
+    # Die Route führt weit weg von allen Ratings, das letzte Segment hat auch im größten Suchradius keines
+    route = m.RatedRoute(lat=np.append(ROUTE.lat, [44.2, 44.3]), long=np.append(ROUTE.long, [11.9, 12.0]))
+    average_rating, total_distance, statistics = m.integrate_route_ratings(route, maximum_search_km=2)
+    lengths = route.calc_segment_distances()
+    assert total_distance == pytest.approx(lengths.sum())
+    assert statistics["unrated_distance"] == pytest.approx(lengths[-1])
+    assert 1 <= average_rating <= 6
+
+    with pytest.raises(IndexError):
+        m.integrate_route_ratings(m.RatedRoute(lat=[45.0, 45.1], long=[12.0, 12.1]), maximum_search_km=2)
@@ -0,0 +1,35 @@
+# coding: utf8
+import os
+import subprocess
+import sys
+
+import benchmark
+import main as m
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_after(code):
+    # Führt den Code in einem neuen Interpreter aus und gibt die danach geladenen Module aus LAZY_MODULES zurück
+    check = "import sys\n{}\nprint(','.join(name for name in {!r} if name in sys.modules))".format(
+        code, benchmark.LAZY_MODULES)
+    process = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, cwd=REPOSITORY,
+                             check=True)
+    return [name for name in process.stdout.strip().split(",") if name]
+
+
+def test_import_loads_no_heavy_modules():
+    assert loaded_after("import main") == []
+    assert loaded_after("import pricing_service") == []
+    # Erst der erste Zugriff lädt das Modul, und nur dieses
+    assert loaded_after("import main; main.pd.DataFrame") == ["pandas"]
+    assert loaded_after("import main; main.requests.Session") == ["requests"]
+
+
+def test_lazy_module_behaves_like_the_module():
+    import pandas
+    import requests
+
+    assert m.pd.read_csv is pandas.read_csv
+    assert m.requests.Session is requests.Session
+    assert repr(m.pd) == "<LazyModule 'pandas' (geladen)>"
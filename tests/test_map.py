@@ -0,0 +1,22 @@
+# coding: utf8
+import numpy as np
+
+import main as m
+
+
+def test_display_indices_stay_within_limit_for_alternating_ratings():
+    # Rating wechselt an jedem Punkt, dazwischen einige längere Abschnitte
+    ratings = np.tile([2.0, 5.0], 25000)
+    ratings[10000:10400] = 7.0
+    result = m.give_display_indices(ratings, maximum_points=1000)
+    assert len(result) <= 1.1 * 1000
+    assert np.array_equal(result, np.unique(result)) and result[-1] == len(ratings) - 1
+    # Der längste Abschnitt bleibt sichtbar
+    assert 10000 in result and 9999 in result
+
+
+def test_display_indices_keep_short_routes_and_sparse_changes():
+    ratings = np.repeat([1.0, 3.0, 2.0], [300, 1, 300])
+    assert np.array_equal(m.give_display_indices(ratings, maximum_points=5000), np.arange(601))
+    result = m.give_display_indices(np.repeat([1.0, 3.0, 2.0], [30000, 1, 30000]), maximum_points=1000)
+    assert len(result) <= 1000 and {29999, 30000, 30001} <= set(result.tolist())
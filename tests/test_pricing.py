@@ -0,0 +1,61 @@
+# coding: utf8
+import numpy as np
+import pytest
+
+import main as m
+
+
+def price_by_loop(rated_path, number_of_tires, tire_price=300, tire_best_range=75000, tire_worst_range=10000,
+                  margin_percent=0.3):
+    # Das ursprüngliche price_rated_route: Schleife über die Abschnitte der Liste von Coordinate-Objekten
+    temp_weight, total_distance = 0.0, 0.0
+    for a, b in zip(rated_path[:-1], rated_path[1:]):
+        d = a.calc_distance_to_other_point(b)
+        temp_weight += d * (a.get_rating() + b.get_rating()) / 2
+        total_distance += d
+    average_rating = temp_weight / total_distance
+    expected_lifetime = tire_best_range - (average_rating - 1) * (tire_best_range - tire_worst_range) * (1 / 6)
+    price_per_tire_without_margin = (total_distance / expected_lifetime) * tire_price
+    price_without_margin = price_per_tire_without_margin * number_of_tires
+    customer_end_price = price_without_margin / (1 - margin_percent)
+    return ([customer_end_price, price_without_margin, price_per_tire_without_margin], [average_rating, total_distance],
+            expected_lifetime)
+
+
+def make_routes(count=4, seed=7):
+    rng = np.random.default_rng(seed)
+    routes = []
+    for i in range(count):
+        points = int(rng.integers(2, 300))
+        routes.append(m.RatedRoute(lat=44 + np.cumsum(rng.uniform(-0.001, 0.002, points)),
+                                   long=11 + np.cumsum(rng.uniform(-0.001, 0.002, points)),
+                                   rating_standardised=rng.integers(1, 8, points)))
+    return routes
+
+
+def test_price_rated_route_matches_loop():
+    for route in make_routes():
+        for arguments in [(4,), (6, 250, 80000, 12000, 0.25)]:
+            result = m.price_rated_route(route, *arguments)
+            expected = price_by_loop(route.to_coordinates(), *arguments)
+            assert np.allclose(result[0], expected[0], rtol=1e-12)
+            assert np.allclose(result[1], expected[1], rtol=1e-12)
+            assert result[2] == pytest.approx(expected[2], rel=1e-12)
+            # Auch mit einer Liste von Coordinate-Objekten
+            assert m.price_rated_route(route.to_coordinates(), *arguments)[0] == result[0]
+
+
+def test_price_rated_routes_matches_single_routes():
+    routes = make_routes()
+    tire_settings = [[4, 300, 75000, 10000], [2, 180, 60000, 9000]]
+    margins = [0.3, 0.1]
+    table = m.price_rated_routes(routes, tire_settings, margins)
+    assert len(table) == len(routes) * len(tire_settings) * len(margins)
+    for row in table.itertuples():
+        expected = price_by_loop(routes[row.route].to_coordinates(), int(row.number_of_tires), row.tire_price,
+                                 row.tire_best_range, row.tire_worst_range, row.margin_percent)
+        assert [row.customer_end_price, row.price_without_margin, row.price_per_tire_without_margin] == \
+            pytest.approx(expected[0], rel=1e-12)
+        assert [row.average_rating, row.total_distance] == pytest.approx(expected[1], rel=1e-12)
+        assert row.expected_lifetime == pytest.approx(expected[2], rel=1e-12)
+    assert len(m.price_rated_routes([], tire_settings)) == 0
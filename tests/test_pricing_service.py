@@ -0,0 +1,159 @@
+# coding: utf8
+import http.client
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pytest
+
+import main as m
+import pricing_service as ps
+
+# Orte des Stand-ins für GraphHopper, "slow town" wird erst nach SLOW_SECONDS beantwortet (und nicht gefunden)
+CITIES = {"venice italy": (45.44, 12.33), "verona italy": (45.44, 10.99), "florence italy": (43.77, 11.25)}
+SLOW_SECONDS = 1.5
+
+
+class GraphHopperHandler(BaseHTTPRequestHandler):
+    # Stand-in für /geocode und /route der GraphHopper-API, merkt sich alle gesuchten Orte
+    protocol_version = "HTTP/1.1"
+    geocoded = []
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path.endswith("/geocode"):
+            name = " ".join(query["q"][0].lower().split())
+            self.geocoded.append(name)
+            if name == "slow town":
+                time.sleep(SLOW_SECONDS)
+            if name not in CITIES:
+                self.send_json(200, {"hits": []})
+                return
+            lat, long = CITIES[name]
+            self.send_json(200, {"hits": [{"point": {"lat": lat, "lng": long}}]})
+        elif url.path.endswith("/route"):
+            (lat_a, long_a), (lat_b, long_b) = [map(float, point.split(",")) for point in query["point"]]
+            self.send_json(200, {"paths": [{"points": {"coordinates": route_coordinates(lat_a, long_a,
+                                                                                          lat_b, long_b)}}]})
+        else:
+            self.send_json(404, {})
+
+    def log_message(self, format, *arguments):
+        pass
+
+
+def route_coordinates(lat_a, long_a, lat_b, long_b, points=60):
+    # [Längengrad, Breitengrad] wie in der GraphHopper-Antwort, leicht geschwungen
+    return [[long_a + (long_b - long_a) * i / points + 0.02 * math.sin(i / 5), lat_a + (lat_b - lat_a) * i / points]
+            for i in range(points + 1)]
+
+
+def post(address, body):
+    connection = http.client.HTTPConnection(*address, timeout=30)
+    try:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf8")
+        connection.request("POST", "/price", body=data, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode("utf8"))
+    finally:
+        connection.close()
+
+
+def get_stats(address):
+    connection = http.client.HTTPConnection(*address, timeout=30)
+    try:
+        connection.request("GET", "/stats")
+        return json.loads(connection.getresponse().read().decode("utf8"))
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def service_address(tmp_path, monkeypatch, standin_server):
+    # Preis-Dienst gegen den Stand-in, mit synthetischer SmartRoadSense-Datenbank entlang der Strecke
+    # Venedig - Verona und eigenen Caches in tmp_path
+    monkeypatch.chdir(tmp_path)
+    GraphHopperHandler.geocoded = []
+    monkeypatch.setattr(m, "GRAPHHOPPER_URL", standin_server(GraphHopperHandler) + "/api/1")
+    monkeypatch.setattr(m, "get_graphhopper_api_key", lambda: "test")
+    for name in ["_geocoding_cache", "_route_cache", "_ql_cache"]:
+        monkeypatch.setattr(m, name, None)
+    monkeypatch.setattr(m, "RATING_RASTER_ENABLED", False)
+
+    rng = np.random.default_rng(0)
+    route = np.array(route_coordinates(*CITIES["venice italy"], *CITIES["verona italy"], points=3000))
+    ppes = rng.lognormal(-2.2, 0.9, len(route))
+    store_directory = str(tmp_path / "store")
+    m.write_database_srs_store(route[:, 1] + rng.normal(0, 0.0003, len(route)),
+                               route[:, 0] + rng.normal(0, 0.0003, len(route)), ppes, store_directory)
+    monkeypatch.setattr(m, "SRS_STORE_DIRECTORY", store_directory)
+    monkeypatch.setattr(m, "_standardizer", {"srs": np.quantile(ppes, m.STANDARDIZER_QUANTILES),
+                                             "ql": np.arange(1.0, 7.0)})
+
+    service = ps.PricingService(tire_settings=[300, 75000, 10000], batch_wait_seconds=0.01,
+                                request_timeout_seconds=0.5)
+    service.warm_up()
+    service.start()
+    server = ps.make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+
+def test_responses(service_address):
+    status, body = post(service_address, {"start": "Venice Italy", "destination": "Verona Italy", "tires": 6})
+    assert status == 200
+    assert body["price"] > 0 and body["length_km"] > 100
+
+    assert post(service_address, {"start": "Venice Italy"})[0] == 400
+    assert post(service_address, b"{kein json")[0] == 400
+    assert post(service_address, {"start": "Venice Italy", "destination": "Atlantis"})[0] == 422
+
+    # Ungültige Anfragen (400 aus parse_price_request) und nicht gefundene Orte zählen als Fehler
+    assert get_stats(service_address)["requests_failed"] == 2
+
+
+def test_failures_are_counted_from_concurrent_threads(service_address):
+    threads = [threading.Thread(target=post, args=(service_address, {"start": "Venice Italy", "tires": 0}))
+               for _ in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert get_stats(service_address)["requests_failed"] == 40
+
+
+def test_timeout(service_address):
+    # Die erste Anfrage blockiert den Batch-Thread länger als die Wartezeit, die zweite steht solange in der
+    # Warteschlange und wird nach ihrer Zeitüberschreitung nicht mehr bepreist
+    slow = {}
+    slow_thread = threading.Thread(target=lambda: slow.update(
+        response=post(service_address, {"start": "Slow Town", "destination": "Verona Italy"})))
+    slow_thread.start()
+    time.sleep(0.2)
+    status, body = post(service_address, {"start": "Florence Italy", "destination": "Verona Italy"})
+    assert status == 504 and "error" in body
+    slow_thread.join()
+    assert slow["response"][0] == 504
+
+    # Nach dem langsamen Batch antwortet der Dienst wieder, die abgebrochene Anfrage wurde nie abgefragt
+    time.sleep(SLOW_SECONDS)
+    assert post(service_address, {"start": "Venice Italy", "destination": "Verona Italy"})[0] == 200
+    assert "florence italy" not in GraphHopperHandler.geocoded
+
+    assert get_stats(service_address)["requests_failed"] == 2
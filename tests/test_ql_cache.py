@@ -0,0 +1,93 @@
+# coding: utf8
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pytest
+
+import main as m
+
+# Synthetische Queensland-Datensätze bei Brisbane [Breitengrad, Längengrad, IRIRoughness], ein Teil mit dem
+# unplausiblen Wert -99
+RNG = np.random.default_rng(4)
+RECORDS = np.column_stack([RNG.uniform(-27.4, -27.05, 4000), RNG.uniform(152.9, 153.3, 4000),
+                           np.where(RNG.random(4000) < 0.1, -99.0, RNG.uniform(0.5, 6, 4000))])
+
+
+class QueenslandHandler(BaseHTTPRequestHandler):
+    # Stand-in für datastore_search_sql, beantwortet die SQL-Abfrage aus fetch_ql_area und zählt die Anfragen
+    protocol_version = "HTTP/1.1"
+    queries = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        sql = parse_qs(urlsplit(self.path).query)["sql"][0]
+        (lat_from, lat_to), (long_from, long_to) = [(float(low), float(high)) for low, high in
+                                                    re.findall(r"BETWEEN (\S+) AND ([^\s;]+)", sql)]
+        with self.lock:
+            self.queries.append(sql)
+        selected = RECORDS[(RECORDS[:, 0] >= lat_from) & (RECORDS[:, 0] <= lat_to) &
+                           (RECORDS[:, 1] >= long_from) & (RECORDS[:, 1] <= long_to)]
+        data = json.dumps({"result": {"records": [{"Latitude": str(lat), "Longitude": str(long),
+                                                   "IRIRoughness": str(iri)}
+                                                  for lat, long, iri in selected.tolist()]}}).encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *arguments):
+        pass
+
+
+@pytest.fixture
+def queensland(tmp_path, monkeypatch, standin_server):
+    monkeypatch.chdir(tmp_path)
+    QueenslandHandler.queries = []
+    monkeypatch.setattr(m, "QL_URL", standin_server(QueenslandHandler) + "/api/3/action/datastore_search_sql")
+    monkeypatch.setattr(m, "_ql_cache", None)
+    return QueenslandHandler.queries
+
+
+def sorted_area(arrays):
+    area = np.column_stack(arrays)
+    return area[np.lexsort(area.T[::-1])]
+
+
+def brute_force(lat_from, lat_to, long_from, long_to):
+    # Wie die bisherige give_rated_area_ql: alle Datensätze im Rechteck mit IRIRoughness über 0
+    area = RECORDS[(RECORDS[:, 0] >= lat_from) & (RECORDS[:, 0] <= lat_to) & (RECORDS[:, 1] >= long_from) &
+                   (RECORDS[:, 1] <= long_to) & (RECORDS[:, 2] > 0)]
+    return area[np.lexsort(area.T[::-1])]
+
+
+def test_tiles_are_fetched_once_and_match_the_direct_query(queensland, monkeypatch):
+    # 3 x 3 Kacheln, eine Abfrage je Kachelzeile
+    corner_a, corner_b = m.Coordinate(-27.35, 152.93), m.Coordinate(-27.12, 153.17)
+    cached = sorted_area(m.give_rated_area_ql_arrays(corner_a, corner_b))
+    assert len(queensland) == 3
+    assert np.array_equal(cached, brute_force(-27.35, -27.12, 152.93, 153.17))
+    assert np.array_equal(cached, sorted_area(m.give_rated_area_ql_arrays(corner_b, corner_a, use_cache=False)))
+    assert len(queensland) == 4
+
+    # Gleiches Rechteck aus dem Cache, auch nach einem Neustart; ein verschobenes Rechteck über zwei der Kachelzeilen
+    # fragt nur die neue Kachelspalte ab (eine Abfrage je Zeile)
+    monkeypatch.setattr(m, "_ql_cache", None)
+    assert np.array_equal(sorted_area(m.give_rated_area_ql_arrays(corner_a, corner_b)), cached)
+    assert len(queensland) == 4
+    shifted = sorted_area(m.give_rated_area_ql_arrays(m.Coordinate(-27.3, 153.05), m.Coordinate(-27.15, 153.28)))
+    assert np.array_equal(shifted, brute_force(-27.3, -27.15, 153.05, 153.28))
+    assert len(queensland) == 6
+
+
+def test_areas_outside_queensland_are_not_queried(queensland):
+    # Toskana und ein Rechteck knapp östlich von QL_EXTENT
+    for corner_a, corner_b in [(m.Coordinate(43.0, 11.0), m.Coordinate(43.5, 11.5)),
+                               (m.Coordinate(-27.3, 153.7), m.Coordinate(-27.1, 154.0))]:
+        for use_cache in [True, False]:
+            assert all(len(array) == 0 for array in m.give_rated_area_ql_arrays(corner_a, corner_b, use_cache))
+    assert queensland == []
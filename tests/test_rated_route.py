@@ -0,0 +1,72 @@
+# coding: utf8
+import numpy as np
+import pytest
+
+import main as m
+
+
+def make_coordinates():
+    # Liste von Coordinate-Objekten wie bisher: ohne Rating, mit rohem Rating und gesnappt mit allen Werten
+    return [
+        m.Coordinate(45.1, 11.2),
+        m.Coordinate(45.2, 11.25, 0.13, "srs"),
+        m.Coordinate(45.25, 11.3, 4.1, "ql", 4, True, 0.8, [45.26, 11.31]),
+        m.Coordinate(45.3, 11.4, 0.4, "srs", 6, True, 0.2, [45.3, 11.41])
+    ]
+
+
+def values(coordinates):
+    return [c.get_values() for c in coordinates]
+
+
+def test_round_trip_and_list_behaviour():
+    coordinates = make_coordinates()
+    route = m.RatedRoute.from_coordinates(coordinates)
+    assert len(route) == 4 and values(route) == values(coordinates)
+    assert values(route.to_coordinates()) == values(coordinates)
+    assert m.RatedRoute.from_path(route) is route and values(m.RatedRoute.from_path(coordinates)) == values(coordinates)
+
+    # Index, Ausschnitt, Aneinanderhängen (auch mit Listen) und Einfügen wie bei Listen
+    assert route[2].get_values() == coordinates[2].get_values()
+    assert values(route[1:3]) == values(coordinates[1:3])
+    assert values(route[::-1]) == values(coordinates[::-1])
+    assert values(route[:2] + coordinates[2:]) == values(coordinates)
+    assert values(coordinates[:1] + route[1:]) == values(coordinates)
+    assert values(m.RatedRoute.concatenate([route[:1], coordinates[1:3], route[3:]])) == values(coordinates)
+    assert values(route[[0, 3]].insert([1], route[1:3])) == values(coordinates)
+    assert len(m.RatedRoute.concatenate([])) == 0
+
+    # Kopien sind unabhängig
+    copy = route.copy()
+    copy.lat[0] = 0
+    assert route.lat[0] == 45.1
+    np.testing.assert_array_equal(route.get_coordinates(), [c.get_coordinates() for c in coordinates])
+
+
+def test_segment_distances_match_coordinate_distances():
+    rng = np.random.default_rng(5)
+    route = m.RatedRoute(lat=rng.uniform(-60, 60, 50), long=rng.uniform(-170, 170, 50))
+    expected = [a.calc_distance_to_other_point(b) for a, b in zip(route.to_coordinates()[:-1],
+                                                                  route.to_coordinates()[1:])]
+    assert np.allclose(route.calc_segment_distances(), expected, rtol=1e-12)
+    assert len(m.RatedRoute(lat=[1.0], long=[2.0]).calc_segment_distances()) == 0
+
+
+def test_plausibility_checks_and_ratings(monkeypatch):
+    with pytest.raises(AttributeError):
+        m.RatedRoute(lat=[1, 2], long=[1])
+    with pytest.raises(AttributeError):
+        m.RatedRoute(lat=[1], long=[1], rating_raw=[0.3])
+    with pytest.raises(AttributeError):
+        m.RatedRoute(lat=[1], long=[1], rating_is_snapped=[True])
+
+    # Fehlende standardisierte Ratings werden wie bei Coordinate.get_rating aus dem rohen Rating berechnet
+    monkeypatch.setattr(m, "_standardizer", {"srs": np.array([0.05, 0.12, 0.2, 0.31, 0.45, 0.6]),
+                                             "ql": np.arange(1.0, 7.0)})
+    coordinates = make_coordinates()[1:]
+    route = m.RatedRoute.from_coordinates(coordinates)
+    assert route.get_rating().tolist() == [c.get_rating() for c in coordinates] == [3, 4, 6]
+    raw, sources = route.get_rating(False, True)
+    assert raw.tolist() == [0.13, 4.1, 0.4] and sources.tolist() == ["srs", "ql", "srs"]
+    with pytest.raises(AttributeError):
+        m.RatedRoute.from_coordinates(make_coordinates()[:1]).get_rating()
@@ -0,0 +1,47 @@
+# coding: utf8
+import numpy as np
+import pytest
+
+import main as m
+
+
+def closest_by_loop(route_points, rating_coordinates):
+    # Vergleich mit allen Rating-Punkten wie in der ursprünglichen Schleife von snap_ratings_to_route: bei gleicher
+    # Distanz gewinnt der erste
+    result = []
+    for r in route_points:
+        closest = ()
+        for i, c in enumerate(rating_coordinates):
+            distance = r.calc_distance_to_other_point(c)
+            if closest == () or closest[0] > distance:
+                closest = (distance, i)
+        result.append(closest)
+    return np.array([i for _, i in result]), np.array([distance for distance, _ in result])
+
+
+def test_query_matches_comparison_with_all_points():
+    rng = np.random.default_rng(0)
+    # Gehäufte Rating-Punkte mit doppelten Positionen (gleiche Distanz) in hoher Breite, Routenpunkte auch weit
+    # außerhalb des Gitters
+    lats = np.round(rng.uniform(60.0, 60.2, 400), 3)
+    longs = np.round(rng.uniform(10.0, 10.4, 400), 3)
+    lats[200:220], longs[200:220] = lats[:20], longs[:20]
+    ratings = [m.Coordinate(lat, long) for lat, long in zip(lats.tolist(), longs.tolist())]
+    route_lats = np.concatenate([rng.uniform(59.9, 60.3, 150), lats[:20], [58.0, 62.5]])
+    route_longs = np.concatenate([rng.uniform(9.8, 10.6, 150), longs[:20], [10.2, 9.0]])
+    route = [m.Coordinate(lat, long) for lat, long in zip(route_lats.tolist(), route_longs.tolist())]
+
+    expected_indices, expected_distances = closest_by_loop(route, ratings)
+    for index in [m.RatingIndex(ratings), m.RatingIndex(ratings, cell_size_km=0.05),
+                  m.RatingIndex.from_arrays(lats, longs)]:
+        indices, distances = index.query(route_lats, route_longs)
+        assert np.array_equal(indices, expected_indices)
+        assert np.array_equal(distances, expected_distances)
+
+
+def test_single_point_and_empty_index():
+    index = m.RatingIndex([m.Coordinate(45.0, 11.0)])
+    indices, distances = index.query([45.0, 46.0], [11.0, 11.0])
+    assert indices.tolist() == [0, 0] and distances[0] == 0 and abs(distances[1] - 111.3) < 1e-9
+    with pytest.raises(IndexError):
+        m.RatingIndex([]).query([45.0], [11.0])
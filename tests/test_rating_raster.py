@@ -0,0 +1,30 @@
+# coding: utf8
+import numpy as np
+
+import main as m
+
+
+def write_store(store_directory, seed):
+    # 2000 synthetische SmartRoadSense-Datensätze in einer Kachel in der Toskana (außerhalb von Queensland)
+    rng = np.random.default_rng(seed)
+    latitudes = rng.uniform(43.01, 43.09, 2000)
+    longitudes = rng.uniform(11.01, 11.09, 2000)
+    ppes = rng.lognormal(-2.2, 0.9, 2000)
+    m.write_database_srs_store(latitudes, longitudes, ppes, store_directory)
+    return ppes
+
+
+def test_raster_is_ignored_after_store_rewrite_with_same_row_count(tmp_path, monkeypatch):
+    store_directory, raster_directory = str(tmp_path / "store"), str(tmp_path / "raster")
+    ppes = write_store(store_directory, seed=1)
+    monkeypatch.setattr(m, "SRS_STORE_DIRECTORY", store_directory)
+    monkeypatch.setattr(m, "_standardizer", {"srs": np.quantile(ppes, m.STANDARDIZER_QUANTILES),
+                                             "ql": np.arange(1.0, 7.0)})
+
+    metadata = m.build_rating_raster(raster_directory, store_directory, cells_per_tile=10)
+    assert metadata["srs_version"] == m.give_database_srs_version(store_directory)
+    assert m.load_rating_raster(raster_directory, store_directory) is not None
+
+    # Gleiche Anzahl an Datensätzen, aber andere Positionen und Werte
+    write_store(store_directory, seed=2)
+    assert m.load_rating_raster(raster_directory, store_directory) is None
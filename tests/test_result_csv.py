@@ -0,0 +1,71 @@
+# coding: utf8
+import pandas as pd
+import pytest
+
+import main as m
+
+HEADER = ["Reifenanzahl", "Start", "Ziel", "Streckenlänge", "Endkundenpreis"]
+# Eingabezeilen mit einer doppelten Strecke und ihren Ergebnissen
+INPUT = [[4, "Verona Italy", "Florence Italy"], [6, "Bologna Italy", "Verona Italy"],
+         [4, "Verona Italy", "Florence Italy"], [8, "Florence Italy", "Bologna Italy"],
+         [4, "Verona Italy", "Bologna Italy"]]
+RESULTS = [line + [230.5 + i, 61.25 * (i + 1)] for i, line in enumerate(INPUT)]
+FINAL_ROWS = [["", "", "", "", ""], ["", "", "", "1", "2"]]
+
+
+def read(path):
+    with open(path, encoding="utf8") as file:
+        return file.read()
+
+
+def test_rows_match_the_rewritten_dataframe(tmp_path):
+    # Bisher wurde die Ergebnis-CSV nach jeder Zeile mit pandas komplett neu geschrieben
+    path = str(tmp_path / "result.csv")
+    baseline = str(tmp_path / "baseline.csv")
+    with m.ResultCsvWriter(path, HEADER, sum_columns=["Streckenlänge", "Endkundenpreis"]) as writer:
+        for row in RESULTS:
+            writer.write(row)
+            pd.DataFrame(RESULTS[:writer.rows_written], columns=HEADER).to_csv(baseline, index=False)
+            assert read(path) == read(baseline)
+    assert writer.sums == pytest.approx([sum(row[3] for row in RESULTS), sum(row[4] for row in RESULTS)])
+
+
+def test_resume_after_interruption_gives_the_uninterrupted_file(tmp_path):
+    uninterrupted = str(tmp_path / "uninterrupted.csv")
+    writer = m.ResultCsvWriter(uninterrupted, HEADER, sum_columns=["Streckenlänge", "Endkundenpreis"])
+    for row in RESULTS:
+        writer.write(row)
+    writer.close(FINAL_ROWS)
+
+    # Abbruch nach drei Zeilen, mitten in der vierten
+    path = str(tmp_path / "result.csv")
+    writer = m.ResultCsvWriter(path, HEADER, sum_columns=["Streckenlänge", "Endkundenpreis"], fsync_every=1)
+    for row in RESULTS[:3]:
+        writer.write(row)
+    writer._file.write("8,Florence Ita")
+    writer._file.close()
+
+    writer = m.ResultCsvWriter(path, HEADER, sum_columns=["Streckenlänge", "Endkundenpreis"], resume=True)
+    assert writer.rows_resumed == 3
+    # Die doppelte Strecke ist zweimal erledigt, jede Eingabezeile wird nur einmal übersprungen
+    remaining = [i for i, line in enumerate(INPUT) if not writer.is_done(line)]
+    assert remaining == [3, 4]
+    for i in remaining:
+        writer.write(RESULTS[i])
+    assert writer.sums == pytest.approx([sum(row[3] for row in RESULTS), sum(row[4] for row in RESULTS)])
+    writer.close(FINAL_ROWS)
+    assert read(path) == read(uninterrupted)
+
+    # Ein fertiger Lauf wird ohne Leer- und Summenzeile fortgesetzt, alle Zeilen sind erledigt
+    writer = m.ResultCsvWriter(path, HEADER, sum_columns=["Streckenlänge", "Endkundenpreis"], resume=True)
+    assert writer.rows_resumed == len(RESULTS)
+    assert all(writer.is_done(line) for line in INPUT)
+    writer.close(FINAL_ROWS)
+    assert read(path) == read(uninterrupted)
+
+
+def test_resume_rejects_other_columns(tmp_path):
+    path = str(tmp_path / "result.csv")
+    m.ResultCsvWriter(path, ["Start", "Ziel"]).close()
+    with pytest.raises(ValueError):
+        m.ResultCsvWriter(path, HEADER, resume=True)
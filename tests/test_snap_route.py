@@ -0,0 +1,98 @@
+# coding: utf8
+import numpy as np
+import pytest
+
+import main as m
+
+
+def make_route(points=1201):
+    # Geschwungene Route von ca. 130 km in der Toskana, alle ca. 110 m ein Routenpunkt
+    t = np.linspace(0, 1, points)
+    return m.RatedRoute(lat=43.1 + 0.9 * t + 0.05 * np.sin(t * 9), long=10.6 + 1.2 * t)
+
+
+@pytest.fixture
+def with_store(tmp_path, monkeypatch):
+    # Schreibt die übergebenen Ratings als SmartRoadSense-Datenbank, ohne Raster und mit festen Quantilen
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(m, "RATING_RASTER_ENABLED", False)
+    monkeypatch.setattr(m, "_ql_cache", None)
+
+    def write(latitudes, longitudes, seed=0):
+        ppes = np.random.default_rng(seed).lognormal(-2.2, 0.9, len(latitudes))
+        store_directory = str(tmp_path / "store")
+        m.write_database_srs_store(latitudes, longitudes, ppes, store_directory)
+        monkeypatch.setattr(m, "SRS_STORE_DIRECTORY", store_directory)
+        monkeypatch.setattr(m, "_standardizer", {"srs": np.quantile(ppes, m.STANDARDIZER_QUANTILES),
+                                                 "ql": np.arange(1.0, 7.0)})
+        return ppes
+
+    return write
+
+
+def nearest_of_all(route, latitudes, longitudes):
+    # Nächstes Rating aus der ganzen Datenbank (ohne Korridor)
+    index = m.RatingIndex([m.Coordinate(lat, long) for lat, long in zip(latitudes.tolist(), longitudes.tolist())])
+    return index.query(route.lat, route.long)
+
+
+def test_sparse_route_without_ratings_in_first_section(with_store):
+    route = make_route()
+    rng = np.random.default_rng(1)
+    # Ratings nur entlang der zweiten Hälfte, die erste Sektion (380 Punkte, ca. 40 km) hat keines im Korridor
+    along = np.arange(600, len(route), 3)
+    latitudes = route.lat[along] + rng.normal(0, 0.003, len(along))
+    longitudes = route.long[along] + rng.normal(0, 0.003, len(along))
+    with_store(latitudes, longitudes)
+
+    sections = m.split_route(route, 380)
+    snapped, statistics, rectangles = m.snap_route(sections)
+
+    assert len(snapped) == len(route) and statistics["unrated_points"] == 0
+    assert statistics["unrated_distance"] == 0
+    assert statistics["search_rounds"] > 1 and statistics["max_distance"] > m.RATING_CORRIDOR_KM
+    indices, distances = nearest_of_all(route, latitudes, longitudes)
+    assert np.array_equal(snapped.snapped_lat, latitudes[indices])
+    assert np.allclose(snapped.snapping_distance, distances)
+
+
+def test_radius_expansion_stops_at_maximum_search_radius(with_store):
+    route = make_route()
+    rng = np.random.default_rng(2)
+    # Lücke von ca. 30 km in der Mitte der Route
+    along = np.concatenate([np.arange(0, 450, 4), np.arange(730, len(route), 4)])
+    latitudes = route.lat[along] + rng.normal(0, 0.002, len(along))
+    longitudes = route.long[along] + rng.normal(0, 0.002, len(along))
+    with_store(latitudes, longitudes)
+
+    snapped, statistics, rectangles = m.snap_route(route)
+    indices, distances = nearest_of_all(route, latitudes, longitudes)
+    assert len(snapped) == len(route) and statistics["search_rounds"] >= 4
+    assert np.array_equal(snapped.snapped_lat, latitudes[indices])
+    assert statistics["max_distance"] == pytest.approx(distances.max())
+
+    # Mit kleinerem größten Suchradius bleiben die Punkte in der Mitte der Lücke ohne Rating, und die Strecke dort
+    # wird gemeldet
+    snapped, statistics, rectangles = m.snap_route(route, maximum_search_km=6)
+    unrated = distances > 6
+    touching = unrated[:-1] | unrated[1:]
+    assert statistics["unrated_points"] == unrated.sum() > 0
+    assert len(snapped) == len(route) - unrated.sum()
+    assert statistics["unrated_distance"] == pytest.approx(route.calc_segment_distances()[touching].sum())
+    assert statistics["max_distance"] <= 6
+
+
+def test_snap_route_matches_snap_ratings_to_route_on_dense_data(with_store):
+    route = make_route()
+    rng = np.random.default_rng(3)
+    latitudes = np.repeat(route.lat, 2) + rng.normal(0, 0.003, 2 * len(route))
+    longitudes = np.repeat(route.long, 2) + rng.normal(0, 0.003, 2 * len(route))
+    with_store(latitudes, longitudes)
+
+    sections = m.split_route(route, 380)
+    snapped, statistics, rectangles = m.snap_route(sections)
+    expected = m.RatedRoute.concatenate([m.snap_ratings_to_route(section)[0] for section in sections])
+    assert statistics["search_rounds"] == 1 and statistics["unrated_points"] == 0
+    for name in ["lat", "long", "snapped_lat", "snapped_long", "snapping_distance", "rating_raw",
+                 "rating_standardised"]:
+        assert np.array_equal(getattr(snapped, name), getattr(expected, name)), name
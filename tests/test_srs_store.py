@@ -0,0 +1,78 @@
+# coding: utf8
+import numpy as np
+import pandas as pd
+
+import main as m
+
+
+def write_csv(path, rows=3000, seed=0):
+    # csv wie database_srs.csv: weitere Spalten, unplausible ppe-Werte und Punkte genau auf Kachelgrenzen
+    rng = np.random.default_rng(seed)
+    latitudes = np.round(rng.uniform(44.85, 45.25, rows), 2)
+    longitudes = np.round(rng.uniform(-0.15, 0.25, rows), 2)
+    ppes = rng.lognormal(-2.2, 0.9, rows)
+    ppes[::37] = 0
+    pd.DataFrame({"id": np.arange(rows), "latitude": latitudes, "longitude": longitudes, "ppe": ppes,
+                  "osm_id": np.arange(rows) * 3}).to_csv(path, index=False)
+
+
+def area_by_filter(csv_path, lat_from, lat_to, long_from, long_to):
+    # Wie das ursprüngliche give_rated_area_srs: ganze csv lesen, Rechteck (einschließlich Rand) filtern, ppe prüfen
+    data = pd.read_csv(csv_path)[["latitude", "longitude", "ppe"]]
+    data = data[(data.latitude >= lat_from) & (data.latitude <= lat_to) &
+                (data.longitude >= long_from) & (data.longitude <= long_to)]
+    return data[~(data.ppe < 0.0000001)].values
+
+
+AREAS = [
+    (-90, 90, -180, 180),
+    (44.9, 45.1, -0.1, 0.1),
+    (44.95, 45.0, 0.0, 0.05),
+    (45.0, 45.0, -0.2, 0.3),
+    (45.13, 45.17, 0.2, 0.2),
+    (10.0, 11.0, 10.0, 11.0),
+    (45.3, 46.0, -0.1, 0.1)
+]
+
+
+def test_binary_store_matches_csv_filter(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "internal").mkdir()
+    write_csv("internal/database_srs.csv")
+    store_directory = str(tmp_path / "store")
+
+    # Ohne binäre Datenbank wird sie beim ersten Laden aus der csv erstellt
+    store = m.load_database_srs(store_directory)
+    assert store["version"] == m.give_database_srs_version(store_directory)
+    for lat_from, lat_to, long_from, long_to in AREAS:
+        expected = area_by_filter("internal/database_srs.csv", lat_from, lat_to, long_from, long_to)
+        result = m.give_rated_area_srs_arrays(m.Coordinate(lat_to, long_from), m.Coordinate(lat_from, long_to),
+                                              store=store)
+        assert np.array_equal(np.stack(result, axis=1).reshape(-1, 3), expected.reshape(-1, 3))
+
+    monkeypatch.setattr(m, "SRS_STORE_DIRECTORY", store_directory)
+    coordinates = m.give_rated_area_srs(m.Coordinate(44.9, -0.1), m.Coordinate(45.1, 0.1))
+    expected = area_by_filter("internal/database_srs.csv", 44.9, 45.1, -0.1, 0.1)
+    assert [c.get_coordinates() + [c.get_rating(False)] for c in coordinates] == expected.tolist()
+    assert all(c.get_rating(False, True)[1] == "srs" for c in coordinates)
+
+
+def test_tile_query_matches_mask_over_all_points(tmp_path):
+    # Punkte auf und neben Kachelgrenzen (Vielfache von SRS_TILE_DEGREES), auf beiden Seiten des Nullmeridians und
+    # des Äquators, einige ohne Position
+    rng = np.random.default_rng(4)
+    latitudes = np.concatenate([np.round(rng.uniform(-0.35, 0.35, 2000), 1), rng.uniform(-0.35, 0.35, 2000)])
+    longitudes = np.concatenate([np.round(rng.uniform(-0.35, 0.35, 2000), 2), rng.uniform(-0.35, 0.35, 2000)])
+    latitudes[::101] = np.nan
+    m.write_database_srs_store(latitudes, longitudes, rng.lognormal(-2.2, 0.9, len(latitudes)), str(tmp_path))
+    store = m.load_database_srs(str(tmp_path))
+    assert len(store["tile_keys"]) > 20
+
+    areas = [(-0.2, 0.1, -0.1, 0.2), (0.0, 0.0, -0.3, 0.3), (-0.1, 0.1, 0.1, 0.1), (-1, 1, -1, 1)]
+    areas += [tuple(np.sort(rng.uniform(-0.4, 0.4, 2)).tolist() + np.sort(rng.uniform(-0.4, 0.4, 2)).tolist())
+              for _ in range(50)]
+    for lat_from, lat_to, long_from, long_to in areas:
+        expected = np.flatnonzero((latitudes >= lat_from) & (latitudes <= lat_to) &
+                                  (longitudes >= long_from) & (longitudes <= long_to))
+        selected = m.give_area_indices_srs(store, lat_from, lat_to, long_from, long_to)
+        assert np.array_equal(store["row_order"][selected], expected)
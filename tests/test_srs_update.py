@@ -0,0 +1,104 @@
+# coding: utf8
+import io
+import os
+import zipfile
+from http.server import BaseHTTPRequestHandler
+
+import numpy as np
+
+import main as m
+
+
+def make_zip(seed, rows=500):
+    # Zip-Datei wie der Download von SmartRoadSense: eine csv mit weiteren Spalten und einigen Einträgen ohne
+    # plausibles ppe
+    rng = np.random.default_rng(seed)
+    ppes = rng.lognormal(-2.2, 0.9, rows)
+    ppes[::50] = 0
+    lines = ["id,latitude,longitude,ppe,osm_id"]
+    lines += ["{},{},{},{},{}".format(i, lat, long, ppe, 7 * i) for i, (lat, long, ppe) in
+              enumerate(zip(rng.uniform(43, 44, rows).tolist(), rng.uniform(11, 12, rows).tolist(), ppes.tolist()))]
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        archive.writestr("open_data/open_data.csv", "\n".join(lines) + "\n")
+    return data.getvalue()
+
+
+class ZipHandler(BaseHTTPRequestHandler):
+    # Stand-in für SRS_DOWNLOAD_URL: liefert 'content' mit ETag, bei passendem If-None-Match 304, merkt sich die
+    # Statuscodes
+    protocol_version = "HTTP/1.1"
+    content = b""
+    etag = ""
+    statuses = []
+
+    def do_GET(self):
+        cls = type(self)
+        if cls.etag and self.headers.get("If-None-Match") == cls.etag:
+            cls.statuses.append(304)
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        cls.statuses.append(200)
+        self.send_response(200)
+        if cls.etag:
+            self.send_header("ETag", cls.etag)
+        self.send_header("Content-Length", str(len(cls.content)))
+        self.end_headers()
+        self.wfile.write(cls.content)
+
+    def log_message(self, *arguments):
+        pass
+
+
+def test_update_database_srs_downloads_only_changed_content(tmp_path, monkeypatch, standin_server):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(m, "SRS_CSV_CHUNK_ROWS", 128)
+    store_directory = str(tmp_path / "store")
+    url = standin_server(ZipHandler) + "/open_data.zip"
+    ZipHandler.content, ZipHandler.etag, ZipHandler.statuses = make_zip(seed=1), '"v1"', []
+
+    assert m.update_database_srs(url=url, store_directory=store_directory)
+    first_version = m.give_database_srs_version(store_directory)
+    store = m.load_database_srs(store_directory)
+    assert len(store["ppe"]) == 490 and (store["ppe"] > 0).all()
+
+    # Unverändert: 304, die Datenbank bleibt dieselbe
+    assert not m.update_database_srs(url=url, store_directory=store_directory)
+    assert ZipHandler.statuses == [200, 304]
+    assert m.give_database_srs_version(store_directory) == first_version
+
+    # Geänderter Inhalt: neue Version mit den neuen Datensätzen
+    ZipHandler.content, ZipHandler.etag = make_zip(seed=2, rows=700), '"v2"'
+    assert m.update_database_srs(url=url, store_directory=store_directory)
+    assert ZipHandler.statuses[-1] == 200
+    assert m.give_database_srs_version(store_directory) != first_version
+    assert len(m.load_database_srs(store_directory)["ppe"]) == 686
+
+    # Server ohne ETag mit gleichem Inhalt: wird heruntergeladen, aber über den Hash als unverändert erkannt
+    ZipHandler.etag = ""
+    version = m.give_database_srs_version(store_directory)
+    assert not m.update_database_srs(url=url, store_directory=store_directory)
+    assert m.give_database_srs_version(store_directory) == version
+
+    # Temporäre Dateien liegen nur neben der Datenbank und sind wieder gelöscht
+    assert not os.path.exists(tmp_path / "internal")
+    assert all(name.startswith("version_") or name in (m.SRS_STORE_POINTER, "metadata.json")
+               for name in os.listdir(store_directory))
+
+
+def test_convert_database_srs_matches_store_written_at_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(m, "SRS_CSV_CHUNK_ROWS", 64)
+    with zipfile.ZipFile(io.BytesIO(make_zip(seed=3))) as archive:
+        with archive.open("open_data/open_data.csv") as csv_file:
+            assert m.convert_database_srs(csv_file, str(tmp_path / "converted")) == 490
+        with archive.open("open_data/open_data.csv") as csv_file:
+            table = m.pd.read_csv(csv_file)
+    table = table[table.ppe >= 0.0000001]
+    m.write_database_srs_store(table.latitude.values, table.longitude.values, table.ppe.values,
+                               str(tmp_path / "direct"))
+
+    converted, direct = m.load_database_srs(str(tmp_path / "converted")), m.load_database_srs(str(tmp_path / "direct"))
+    for name in m.SRS_STORE_FILES:
+        assert np.array_equal(converted[name], direct[name])
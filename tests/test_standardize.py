@@ -0,0 +1,50 @@
+# coding: utf8
+import numpy as np
+import pandas as pd
+import pytest
+
+import main as m
+
+SRS_QUANTILES = [0.05, 0.12, 0.2, 0.31, 0.45, 0.6]
+QL_QUANTILES = [2.43, 3.49, 4.03, 4.53, 5.17, 5.63]
+
+
+@pytest.fixture
+def standardizer_csv(tmp_path, monkeypatch):
+    # database_standardizer.csv wie von update_database_standardizer geschrieben, noch nicht eingelesen
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "internal").mkdir()
+    pd.DataFrame({"quantile nr": range(1, 7), "srs_quantiles": SRS_QUANTILES, "ql_quantiles": QL_QUANTILES}).to_csv(
+        "internal/database_standardizer.csv")
+    monkeypatch.setattr(m, "_standardizer", None)
+    return "internal/database_standardizer.csv"
+
+
+def rating_by_sorting(csv_path, raw_rating, data_origin):
+    # Wie das ursprüngliche 'standardize': Rating mit 'quantile nr' -1 in die Tabelle einsortieren, Stelle + 1
+    name = data_origin + "_quantiles"
+    quantiles = pd.read_csv(csv_path)[["quantile nr", name]]
+    appended = pd.concat([quantiles, pd.DataFrame({"quantile nr": [-1.0], name: [float(raw_rating)]})],
+                         ignore_index=True).sort_values(by=name).reset_index(drop=True)
+    return appended[appended["quantile nr"] == -1].index[0] + 1
+
+
+def test_ratings_match_sorting_into_quantile_table(standardizer_csv):
+    for data_origin, quantiles in [("srs", SRS_QUANTILES), ("ql", QL_QUANTILES)]:
+        # Genau auf den Grenzwerten, knapp daneben, außerhalb aller Quantile und ohne Wert
+        raw_ratings = sorted(quantiles + [q - 1e-9 for q in quantiles] + [q + 1e-9 for q in quantiles] +
+                             [-1.0, 0.0, 100.0]) + [float("nan")]
+        expected = [rating_by_sorting(standardizer_csv, raw, data_origin) for raw in raw_ratings]
+        assert m.standardize_ratings(raw_ratings, data_origin).tolist() == expected
+        assert [m.standardize(m.Coordinate(45, 11, raw, data_origin)).get_rating() for raw in raw_ratings] == expected
+
+
+def test_mixed_sources_and_unknown_source(standardizer_csv):
+    raw_ratings = [0.2, 4.03, 0.6, 2.0, 5.7]
+    origins = ["srs", "ql", "srs", "ql", "ql"]
+    expected = [rating_by_sorting(standardizer_csv, raw, origin) for raw, origin in zip(raw_ratings, origins)]
+    assert m.standardize_ratings(raw_ratings, origins).tolist() == expected == [4, 4, 7, 1, 7]
+    with pytest.raises(AttributeError):
+        m.standardize_ratings([1.0], "xyz")
+    with pytest.raises(AttributeError):
+        m.standardize_ratings([1.0, 2.0], ["srs", "-1"])
@@ -0,0 +1,35 @@
+# coding: utf8
+import math
+
+import numpy as np
+import pandas as pd
+
+import main as m
+
+QUANTILES = m.STANDARDIZER_QUANTILES + [0.0, 0.001, 0.5, 0.999, 1.0]
+
+
+def chunked(values, chunk_size):
+    # Liefert die Werte bei jedem Aufruf erneut in Blöcken, darunter auch leere
+    def read_chunks():
+        yield np.empty(0)
+        for start in range(0, len(values), chunk_size):
+            yield values[start:start + chunk_size]
+    return read_chunks
+
+
+def test_quantiles_match_pandas():
+    rng = np.random.default_rng(5)
+    # Ratings wie in den Datenbanken, dazu Werte außerhalb der Histogrammgrenzen, viele gleiche Werte und NaN
+    values = np.concatenate([rng.lognormal(-2.2, 0.9, 20000), rng.uniform(0.5, 6, 5000), [0.0] * 50, [-1.5, 3e7],
+                             np.round(rng.uniform(0, 3, 3000), 1), [np.nan] * 100])
+    rng.shuffle(values)
+    for sample in [values, values[:1000], values[:150], values[:50]]:
+        expected = pd.Series(sample).quantile(QUANTILES).tolist()
+        for chunk_size in [1 if len(sample) <= 1000 else 997, 7, 4096]:
+            assert m.streaming_quantiles(chunked(sample, chunk_size), QUANTILES) == expected
+
+
+def test_without_values():
+    for values in [np.empty(0), np.array([np.nan, np.nan])]:
+        assert all(math.isnan(value) for value in m.streaming_quantiles(chunked(values, 5), QUANTILES))